@@ -0,0 +1,121 @@
+"""
+Persistent cache of AI provider answers in the ai_cache table.
+
+Entries are keyed by a sha256 over everything that determines the answer
+(provider, model, and the request content) and survive restarts. A small
+in-memory LRU sits in front so warm hits never touch SQLite. Entries expire
+after AI_CACHE_TTL_DAYS; beyond AI_CACHE_MAX_ENTRIES the oldest are dropped.
+"""
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from . import database
+from . import catalog_service
+
+AI_CACHE_TTL_DAYS = 30
+AI_CACHE_MAX_ENTRIES = 20000
+# Eviction runs on every this many writes (and at startup)
+_EVICT_EVERY = 100
+
+_session_factory = database.SessionLocal
+_memory = catalog_service.LRUCache(1024)
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def make_key(*parts) -> str:
+    """Cache key for the given parts (strings, numbers, None)."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _expired(created_at) -> bool:
+    return created_at < datetime.now() - timedelta(days=AI_CACHE_TTL_DAYS)
+
+
+def get(key: str):
+    """Cached value for key, or None when missing or expired."""
+    # Memory holds (value, created_at) so a long-running process expires entries like the table does
+    hit = _memory.get(key)
+    if hit is not None and not _expired(hit[1]):
+        return hit[0]
+    db = _session_factory()
+    try:
+        row = db.query(database.AICacheEntry.value, database.AICacheEntry.created_at).filter(
+            database.AICacheEntry.key == key
+        ).first()
+    except Exception as e:
+        print(f"AI cache read failed: {e}")
+        return None
+    finally:
+        db.close()
+    if row is None or _expired(row.created_at):
+        return None
+    value = json.loads(row.value)
+    _memory.put(key, (value, row.created_at))
+    return value
+
+
+def put(key: str, kind: str, value):
+    """Store a JSON-serialisable value under key."""
+    global _writes
+    created_at = datetime.now()
+    _memory.put(key, (value, created_at))
+    db = _session_factory()
+    try:
+        db.merge(database.AICacheEntry(key=key, kind=kind, value=json.dumps(value), created_at=created_at))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"AI cache write failed: {e}")
+        return
+    finally:
+        db.close()
+
+    with _writes_lock:
+        _writes += 1
+        due = _writes % _EVICT_EVERY == 0
+    if due:
+        evict()
+
+
+def evict():
+    """Drop expired entries, then the oldest ones beyond AI_CACHE_MAX_ENTRIES."""
+    db = _session_factory()
+    try:
+        entry = database.AICacheEntry
+        expired = db.query(entry).filter(
+            entry.created_at < datetime.now() - timedelta(days=AI_CACHE_TTL_DAYS)
+        ).delete(synchronize_session=False)
+        excess = db.query(entry).count() - AI_CACHE_MAX_ENTRIES
+        if excess > 0:
+            oldest = db.query(entry.key).order_by(entry.created_at).limit(excess).subquery()
+            db.query(entry).filter(entry.key.in_(oldest.select())).delete(synchronize_session=False)
+        db.commit()
+        return expired + max(excess, 0)
+    except Exception as e:
+        db.rollback()
+        print(f"AI cache eviction failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def clear():
+    """Remove every cached answer."""
+    _memory.clear()
+    db = _session_factory()
+    try:
+        db.query(database.AICacheEntry).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def stats() -> dict:
+    db = _session_factory()
+    try:
+        rows = db.query(database.AICacheEntry).count()
+    finally:
+        db.close()
+    return {"rows": rows, "memory": _memory.stats()}
@@ -1,18 +1,229 @@
+import asyncio
+import hashlib
 import json
 import re
+import threading
+import time
+from collections import deque, namedtuple
 from . import settings_service
-from . import database
+from . import catalog_service
+from . import ai_cache_service
 
 
-def parse_log_entry_with_ai(text: str, matters_data: list, provider: str, api_key: str) -> dict:
+# Matters offered to the model per entry: a shortlist from the local matcher,
+# widened once if the model cannot pick from it
+AI_SHORTLIST_SIZE = 25
+AI_SHORTLIST_WIDE = 250
+
+# Prompt size and latency of recent AI calls, see prompt_stats()
+_prompt_log = deque(maxlen=200)
+
+
+def matters_prompt_data(matters) -> list:
+    """The matter fields given to the model, as parse_log_entry_with_ai() expects them."""
+    return [
+        {"name": m.name, "external_id": m.external_id, "description": m.description, "client_name": m.client_name}
+        for m in matters
+    ]
+
+
+def parse_log_entry_with_shortlist(text: str, matcher, provider: str, api_key: str) -> dict:
+    """
+    parse_log_entry_with_ai() with only the most plausible matters in the prompt.
+    The local matcher picks the top AI_SHORTLIST_SIZE matters (exact hits first,
+    then closest fuzzy/trigram scores, then the newest matters). If the model answers with a null
+    matter, it is asked once more with AI_SHORTLIST_WIDE matters (the whole
+    catalog when that is smaller).
+    """
+    catalog_size = len(matcher)
+    result = {}
+    for limit in (AI_SHORTLIST_SIZE, AI_SHORTLIST_WIDE):
+        if catalog_size <= limit:
+            # Whole catalog: identical prefix for every entry until the catalog changes
+            prefix_key = ("catalog", catalog_service.version())
+            matters = matcher.matters
+        else:
+            matters, prefix_key = _shortlist(text, matcher, limit), None
+        result = parse_log_entry_with_ai(text, matters_prompt_data(matters), provider, api_key, prefix_key)
+        # {} means the call failed; widening would not help
+        if not result or result.get("matter_name") or catalog_size <= limit:
+            break
+    return result
+
+
+# --- Async path: deadline, hedging, circuit breaker ---
+# Total time /api/log waits for an AI answer before matching with NLP instead
+AI_DEADLINE_SECONDS = 5.0
+# Start the fallback provider if the primary has not answered by then
+AI_HEDGE_DELAY_SECONDS = 1.5
+# SDK-level timeout, so calls abandoned at the deadline do not linger in their threads
+AI_CALL_TIMEOUT_SECONDS = 20.0
+
+
+class CircuitBreaker:
+    """
+    Skips a provider for `cooldown_seconds` after `failure_threshold` failed
+    calls in a row. After the cool-down the circuit is half-open: exactly one
+    trial call is let through and every other caller is turned away until it
+    reports. Its failure re-opens the circuit, its success closes it. A trial
+    that never reports is replaced by a new one after another cool-down.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown_seconds=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._state = {}  # provider -> [consecutive failures, open until (monotonic), trial call running]
+        self._lock = threading.Lock()
+
+    def allow(self, provider: str) -> bool:
+        with self._lock:
+            state = self._state.get(provider)
+            if state is None or state[0] < self.failure_threshold:
+                return True  # closed
+            now = time.monotonic()
+            if now < state[1]:
+                return False  # open, or half-open with the trial call still running
+            # Half-open: this caller is the trial; the rest wait for its outcome
+            state[1] = now + self.cooldown_seconds
+            state[2] = True
+            return True
+
+    def record(self, provider: str, ok: bool):
+        with self._lock:
+            state = self._state.setdefault(provider, [0, 0.0, False])
+            state[2] = False
+            if ok:
+                state[0], state[1] = 0, 0.0
+            else:
+                state[0] += 1
+                if state[0] >= self.failure_threshold:
+                    state[1] = time.monotonic() + self.cooldown_seconds
+
+    def status(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                provider: {"failures": failures, "open": now < open_until and not trial, "half_open": trial}
+                for provider, (failures, open_until, trial) in self._state.items()
+            }
+
+
+breaker = CircuitBreaker()
+
+
+def configured_settings():
+    """Return (provider, api_key) when AI matching is enabled and configured, else None."""
+    ai_enabled = settings_service.get_setting("ai_enabled", "false") == "true"
+    ai_provider = settings_service.get_setting("ai_provider", "thefuzz")
+    api_key = settings_service.get_setting(f"ai_key_{ai_provider}", "") if ai_provider != "thefuzz" else ""
+    if ai_enabled and ai_provider != "thefuzz" and api_key:
+        return ai_provider, api_key
+    return None
+
+
+def fallback_settings(primary: str):
+    """(provider, api_key) of the configured hedge provider ("ai_fallback_provider" setting), or None."""
+    provider = settings_service.get_setting("ai_fallback_provider", "")
+    if not provider or provider == primary or provider not in _PROVIDER_CALLS:
+        return None
+    api_key = settings_service.get_setting(f"ai_key_{provider}", "")
+    return (provider, api_key) if api_key else None
+
+
+def _attempt(text, matcher, provider, api_key):
+    """One blocking provider round trip (run in a worker thread); feeds the circuit breaker."""
+    try:
+        result = parse_log_entry_with_shortlist(text, matcher, provider, api_key)
+    except Exception:
+        breaker.record(provider, False)  # a trial call must always report back
+        raise
+    # parse_log_entry_with_ai returns {} when the call failed
+    breaker.record(provider, bool(result))
+    return result or None
+
+
+async def parse_log_entry_async(text: str, matcher, provider: str, api_key: str, fallback=None,
+                                deadline: float = None, hedge_delay: float = None):
+    """
+    parse_log_entry_with_shortlist() with a deadline, for /api/log.
+
+    The provider call runs in a worker thread. If it has not answered after
+    hedge_delay seconds (or failed earlier), the same request goes to the
+    `fallback` (provider, api_key) as well, and the first usable answer wins.
+    Providers whose circuit is open are skipped. Returns None when no answer
+    arrived before the deadline; the caller then matches with NLP at once.
+    Calls still running at the deadline are left to finish in the background.
+    """
+    deadline = AI_DEADLINE_SECONDS if deadline is None else deadline
+    hedge_delay = AI_HEDGE_DELAY_SECONDS if hedge_delay is None else hedge_delay
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    hedge_at = loop.time() + hedge_delay
+
+    def start(target):
+        return asyncio.ensure_future(asyncio.to_thread(_attempt, text, matcher, *target))
+
+    pending = set()
+    if breaker.allow(provider):
+        pending.add(start((provider, api_key)))
+    hedge = fallback if fallback and fallback[0] != provider and breaker.allow(fallback[0]) else None
+
+    while pending or hedge:
+        if hedge and (not pending or loop.time() >= hedge_at):
+            pending.add(start(hedge))
+            hedge = None
+        now = loop.time()
+        if now >= end:
+            break
+        timeout = end - now if hedge is None else max(0.0, min(end, hedge_at) - now)
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None and task.result():
+                return task.result()
+    return None
+
+
+def _shortlist(text, matcher, limit):
+    """matcher.shortlist(), topped up with the newest matters when the text resembles too few."""
+    matters = matcher.shortlist(text, limit)
+    if len(matters) < limit:
+        seen = {m.id for m in matters}
+        for m in reversed(matcher.matters):
+            if len(matters) >= limit:
+                break
+            if m.id not in seen:
+                matters.append(m)
+    return matters
+
+
+def prompt_stats() -> dict:
+    """Prompt size and latency of the recent AI calls, for checking the shortlist reduction."""
+    calls = list(_prompt_log)
+    with _usage_lock:
+        tokens = {provider: dict(totals) for provider, totals in _usage_totals.items()}
+    if not calls:
+        return {"calls": 0, "recent": [], "tokens": tokens}
+    return {
+        "tokens": tokens,
+        "calls": len(calls),
+        "avg_prompt_chars": sum(c["prompt_chars"] for c in calls) / len(calls),
+        "avg_matters": sum(c["matters"] for c in calls) / len(calls),
+        "avg_latency_ms": sum(c["latency_ms"] for c in calls) / len(calls),
+        "recent": calls[-20:],
+    }
+
+
+def parse_log_entry_with_ai(text: str, matters_data: list, provider: str, api_key: str, prefix_key=None) -> dict:
     """
     Parse a time log entry using an AI provider.
 
     Args:
         text: The user's time entry text
         matters_data: List of dicts with keys: name, external_id, description, client_name
-        provider: "claude", "gemini", "openai", or "grok"
+        provider: "claude", "gemini", "openai", "grok" (or "stub", the offline test provider)
         api_key: The API key for the provider
+        prefix_key: Set when matters_data is the whole catalog (e.g. its catalog
+            version): the prompt prefix is then built once and reused as is
 
     Returns:
         {
@@ -23,27 +234,67 @@ def parse_log_entry_with_ai(text: str, matters_data: list, provider: str, api_ke
         }
     """
     try:
-        prompt = _build_prompt(text, matters_data)
-
-        if provider == "claude":
-            raw = _call_claude(prompt, api_key)
-        elif provider == "gemini":
-            raw = _call_gemini(prompt, api_key)
-        elif provider == "openai":
-            raw = _call_openai(prompt, api_key)
-        elif provider == "grok":
-            raw = _call_grok(prompt, api_key)
-        else:
+        prompt = _build_prompt_parts(text, matters_data, prefix_key)
+
+        if provider not in _PROVIDER_CALLS:
             return {}
 
-        return _parse_json_response(raw)
+        # Persistent cache: the prefix digest stands in for the catalog version,
+        # as it covers exactly the matters the model is shown and survives restarts
+        cache_key = None
+        if provider not in _UNCACHED_PROVIDERS:
+            cache_key = ai_cache_service.make_key(
+                "parse", provider, _MODELS.get(provider), catalog_service.normalize_text(text),
+                hashlib.sha256(prompt.prefix.encode("utf-8")).hexdigest()
+            )
+            cached = ai_cache_service.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+
+        start = time.perf_counter()
+        raw = _PROVIDER_CALLS[provider](prompt, api_key)
+        _prompt_log.append({
+            "provider": provider,
+            "matters": len(matters_data),
+            "prompt_chars": len(prompt.prefix) + len(prompt.suffix),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+        result = _parse_json_response(raw)
+        if result and cache_key is not None:
+            ai_cache_service.put(cache_key, "parse", result)
+        return result
     except Exception as e:
         print(f"AI Service Error ({provider}): {e}")
         return {}
 
 
-def _build_prompt(text: str, matters_data: list) -> str:
-    """Build the prompt for AI extraction with rich matter context."""
+# The prompt is split into a prefix that depends only on the matters offered
+# (instructions first, then the matter list) and a short per-entry suffix, so
+# providers can cache the prefix: explicitly via cache_control for Claude,
+# automatically for OpenAI, Grok and Gemini when the prefix is long enough.
+Prompt = namedtuple("Prompt", ["prefix", "suffix"])
+
+_PROMPT_HEADER = """You are a legal timesheet assistant. Extract structured information from the user's time entry.
+
+Return ONLY a valid JSON object with these fields (use null if you cannot determine a field):
+{"matter_name": "exact Name from the list below or null", "duration_minutes": 90, "date": "YYYY-MM-DD or null", "description": "clean, concise work description"}
+
+Rules:
+- matter_name MUST be an exact match of the Name field from the list, or null
+- Use the ID, Desc, and Client fields to help identify the correct matter but always return the exact Name
+- duration_minutes must be an integer >= 0, or null
+- date must be YYYY-MM-DD format or null
+- Return only JSON, no other text
+
+Available matters:
+"""
+
+# Last prefix built for a prefix_key (one entry: the current catalog version)
+_prefix_memo = {}
+
+
+def _build_prefix(matters_data: list) -> str:
     matters_lines = []
     for m in matters_data:
         parts = [f"Name: {m['name']}"]
@@ -54,80 +305,293 @@ def _build_prompt(text: str, matters_data: list) -> str:
         if m.get("client_name"):
             parts.append(f"Client: {m['client_name']}")
         matters_lines.append("- " + " | ".join(parts))
-    matters_list = "\n".join(matters_lines)
+    return _PROMPT_HEADER + "\n".join(matters_lines) + "\n"
 
-    return f"""You are a legal timesheet assistant. Extract structured information from this time entry.
 
-Available matters:
-{matters_list}
+def _build_prompt_parts(text: str, matters_data: list, prefix_key=None) -> Prompt:
+    """Build the prompt for AI extraction with rich matter context, as (prefix, suffix)."""
+    if prefix_key is None:
+        prefix = _build_prefix(matters_data)
+    else:
+        prefix = _prefix_memo.get(prefix_key)
+        if prefix is None:
+            prefix = _build_prefix(matters_data)
+            _prefix_memo.clear()
+            _prefix_memo[prefix_key] = prefix
+    return Prompt(prefix, f'\nUser entry: "{text}"')
 
-User entry: "{text}"
 
-Return ONLY a valid JSON object with these fields (use null if you cannot determine a field):
-{{"matter_name": "exact Name from the list above or null", "duration_minutes": 90, "date": "YYYY-MM-DD or null", "description": "clean, concise work description"}}
+def _build_prompt(text: str, matters_data: list) -> str:
+    """The whole prompt as one string."""
+    prompt = _build_prompt_parts(text, matters_data)
+    return prompt.prefix + prompt.suffix
 
-Rules:
-- matter_name MUST be an exact match of the Name field from the list, or null
-- Use the ID, Desc, and Client fields to help identify the correct matter but always return the exact Name
-- duration_minutes must be an integer >= 0, or null
-- date must be YYYY-MM-DD format or null
-- Return only JSON, no other text"""
+
+# --- Token usage instrumentation ---
+# Every call reports how many input tokens the provider served from its prompt
+# cache. Totals per provider are kept for prompt_stats(); extra observers can
+# subscribe with add_usage_hook(callback), called with one dict per call:
+# {"provider", "uncached_input_tokens", "cached_input_tokens", "cache_write_tokens"}.
+_usage_hooks = []
+_usage_totals = {}
+_usage_lock = threading.Lock()
 
 
-def _call_claude(prompt: str, api_key: str) -> str:
-    """Call Claude API."""
+def add_usage_hook(callback):
+    _usage_hooks.append(callback)
+
+
+def remove_usage_hook(callback):
+    if callback in _usage_hooks:
+        _usage_hooks.remove(callback)
+
+
+def _record_usage(provider, uncached, cached=0, cache_write=0):
+    usage = {
+        "provider": provider,
+        "uncached_input_tokens": uncached or 0,
+        "cached_input_tokens": cached or 0,
+        "cache_write_tokens": cache_write or 0,
+    }
+    with _usage_lock:
+        totals = _usage_totals.setdefault(provider, {"calls": 0, "uncached_input_tokens": 0, "cached_input_tokens": 0, "cache_write_tokens": 0})
+        totals["calls"] += 1
+        for key in ("uncached_input_tokens", "cached_input_tokens", "cache_write_tokens"):
+            totals[key] += usage[key]
+    for hook in list(_usage_hooks):
+        try:
+            hook(usage)
+        except Exception as e:
+            print(f"AI usage hook error: {e}")
+
+
+def _prompt_text(prompt) -> str:
+    return prompt if isinstance(prompt, str) else prompt.prefix + prompt.suffix
+
+
+# --- Provider clients ---
+# Answer length caps: a parse answer is one small JSON object, while a tags
+# answer lists up to 20 keywords for every matter in the batch
+ANSWER_MAX_TOKENS = 256
+TAGS_MAX_TOKENS_PER_MATTER = 200
+
+_MODELS = {
+    "claude": "claude-haiku-4-5-20251001",
+    "gemini": "gemini-3-flash-preview",
+    "openai": "gpt-4o-mini",
+    "grok": "grok-2-latest",
+    "stub": "stub",
+}
+
+# Answers of these providers are never written to the persistent ai_cache
+# (the stub is a test double; its answers must not land in the real database)
+_UNCACHED_PROVIDERS = {"stub"}
+
+# SDK clients are expensive to build (module import, client setup) and each one
+# owns an HTTP connection pool, so one client per (provider, api_key) is kept
+# and reused across calls for keep-alive and TLS session reuse. A changed key
+# replaces (and closes) the provider's old client; close_clients() runs on shutdown.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _new_claude_client(api_key):
     try:
         import anthropic
-        client = anthropic.Anthropic(api_key=api_key)
-        msg = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=256,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return msg.content[0].text
     except ImportError:
         raise ImportError("anthropic package not installed. Run: pip install anthropic")
+    return anthropic.Anthropic(api_key=api_key, timeout=AI_CALL_TIMEOUT_SECONDS)
 
 
-def _call_gemini(prompt: str, api_key: str) -> str:
-    """Call Gemini API."""
+def _new_gemini_client(api_key):
     try:
         from google import genai
-        client = genai.Client(api_key=api_key)
-        response = client.models.generate_content(model="gemini-3-flash-preview", contents=prompt)
-        return response.text
     except ImportError:
         raise ImportError("google-genai package not installed. Run: pip install google-genai")
+    from google.genai import types
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=int(AI_CALL_TIMEOUT_SECONDS * 1000)))
 
 
-def _call_openai(prompt: str, api_key: str) -> str:
-    """Call OpenAI API."""
+def _new_openai_client(api_key, base_url=None):
     try:
         from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=256
-        )
-        return resp.choices[0].message.content
     except ImportError:
         raise ImportError("openai package not installed. Run: pip install openai")
+    if base_url:
+        return OpenAI(api_key=api_key, base_url=base_url, timeout=AI_CALL_TIMEOUT_SECONDS)
+    return OpenAI(api_key=api_key, timeout=AI_CALL_TIMEOUT_SECONDS)
 
 
-def _call_grok(prompt: str, api_key: str) -> str:
-    """Call Grok API (xAI) using OpenAI-compatible endpoint."""
+def _new_grok_client(api_key):
+    return _new_openai_client(api_key, base_url="https://api.x.ai/v1")
+
+
+class StubClient:
+    """
+    Offline stand-in for a provider SDK client ("stub" provider), used to test
+    client reuse and AI code paths without network access. Construction sleeps
+    connect_delay (SDK import + TLS handshake), every call sleeps call_delay.
+    Answers with the first listed matter name found in the user entry.
+    """
+    connect_delay = 0.05
+    call_delay = 0.005
+    tags_answer = "stub, keywords"
+
+    def __init__(self, api_key):
+        time.sleep(self.connect_delay)
+        self.api_key = api_key
+        self.calls = 0
+        self.closed = False
+        self.last_prefix = None
+
+    def complete(self, prompt):
+        if self.closed:
+            raise RuntimeError("Stub client is closed")
+        self.calls += 1
+        time.sleep(self.call_delay)
+        entry = re.search(r'User entry: "(.*)"', prompt)
+        if not entry:
+            # A tags prompt: the same keywords for every matter asked about
+            ids = re.findall(r'^Matter ID: (\d+)$', prompt, re.MULTILINE)
+            return json.dumps({matter_id: self.tags_answer for matter_id in ids})
+        entry_lower = entry.group(1).lower()
+        names = re.findall(r'^- Name: (.+?)(?: \| |$)', prompt, re.MULTILINE)
+        matter_name = next((name for name in names if name.lower() in entry_lower), None)
+        return json.dumps({"matter_name": matter_name, "duration_minutes": None, "date": None, "description": entry.group(1)})
+
+    def close(self):
+        self.closed = True
+
+
+_CLIENT_FACTORIES = {
+    "claude": _new_claude_client,
+    "gemini": _new_gemini_client,
+    "openai": _new_openai_client,
+    "grok": _new_grok_client,
+    "stub": StubClient,
+}
+
+
+def _get_client(provider: str, api_key: str):
+    """Return the pooled client for (provider, api_key), creating it on first use."""
+    with _clients_lock:
+        client = _clients.get((provider, api_key))
+        if client is None:
+            # The key for this provider changed in settings: retire the old client
+            for key in [k for k in _clients if k[0] == provider]:
+                _close_client(_clients.pop(key))
+            client = _CLIENT_FACTORIES[provider](api_key)
+            _clients[(provider, api_key)] = client
+        return client
+
+
+def _close_client(client):
+    close = getattr(client, "close", None)
+    if close is None:
+        return
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key, base_url="https://api.x.ai/v1")
-        resp = client.chat.completions.create(
-            model="grok-2-latest",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=256
-        )
-        return resp.choices[0].message.content
-    except ImportError:
-        raise ImportError("openai package not installed. Run: pip install openai")
+        close()
+    except Exception as e:
+        print(f"Error closing AI client: {e}")
+
+
+def close_clients():
+    """Close every pooled provider client. Called when the server exits."""
+    with _clients_lock:
+        for client in _clients.values():
+            _close_client(client)
+        _clients.clear()
+
+
+def _call_claude(prompt, api_key: str, max_tokens: int = ANSWER_MAX_TOKENS) -> str:
+    """Call Claude API. A Prompt's prefix is marked for prompt caching."""
+    client = _get_client("claude", api_key)
+    if isinstance(prompt, str):
+        content = prompt
+    else:
+        content = [
+            {"type": "text", "text": prompt.prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt.suffix},
+        ]
+    msg = client.messages.create(
+        model=_MODELS["claude"],
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": content}]
+    )
+    usage = getattr(msg, "usage", None)
+    if usage is not None:
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        _record_usage("claude", (usage.input_tokens or 0) + cache_write,
+                      getattr(usage, "cache_read_input_tokens", 0), cache_write)
+    return msg.content[0].text
+
+
+def _call_gemini(prompt, api_key: str, max_tokens: int = ANSWER_MAX_TOKENS) -> str:
+    """Call Gemini API. Its answer is not capped (max_tokens is accepted for a uniform signature)."""
+    client = _get_client("gemini", api_key)
+    response = client.models.generate_content(model=_MODELS["gemini"], contents=_prompt_text(prompt))
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        # Implicit caching: the shared prefix is reused automatically
+        cached = getattr(usage, "cached_content_token_count", 0) or 0
+        _record_usage("gemini", (usage.prompt_token_count or 0) - cached, cached)
+    return response.text
+
+
+def _call_openai(prompt, api_key: str, max_tokens: int = ANSWER_MAX_TOKENS) -> str:
+    """Call OpenAI API."""
+    client = _get_client("openai", api_key)
+    resp = client.chat.completions.create(
+        model=_MODELS["openai"],
+        messages=[{"role": "user", "content": _prompt_text(prompt)}],
+        max_tokens=max_tokens
+    )
+    _record_openai_usage("openai", resp)
+    return resp.choices[0].message.content
+
+
+def _call_grok(prompt, api_key: str, max_tokens: int = ANSWER_MAX_TOKENS) -> str:
+    """Call Grok API (xAI) using OpenAI-compatible endpoint."""
+    client = _get_client("grok", api_key)
+    resp = client.chat.completions.create(
+        model=_MODELS["grok"],
+        messages=[{"role": "user", "content": _prompt_text(prompt)}],
+        max_tokens=max_tokens
+    )
+    _record_openai_usage("grok", resp)
+    return resp.choices[0].message.content
+
+
+def _record_openai_usage(provider, resp):
+    """OpenAI-compatible APIs cache long prompt prefixes automatically and report the hits."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    _record_usage(provider, (usage.prompt_tokens or 0) - cached, cached)
+
+
+def _call_stub(prompt, api_key: str, max_tokens: int = ANSWER_MAX_TOKENS) -> str:
+    """Call the offline stub provider. Like a real model, its answer is cut off at max_tokens."""
+    client = _get_client("stub", api_key)
+    raw = client.complete(_prompt_text(prompt))[:max_tokens * 4]
+    # Mimic a provider cache: a prefix identical to the previous call's is a hit
+    prefix = "" if isinstance(prompt, str) else prompt.prefix
+    suffix = _prompt_text(prompt)[len(prefix):]
+    hit = bool(prefix) and prefix == client.last_prefix
+    client.last_prefix = prefix
+    _record_usage("stub", len(suffix) // 4 + (0 if hit else len(prefix) // 4), len(prefix) // 4 if hit else 0)
+    return raw
+
+
+_PROVIDER_CALLS = {
+    "claude": _call_claude,
+    "gemini": _call_gemini,
+    "openai": _call_openai,
+    "grok": _call_grok,
+    "stub": _call_stub,
+}
 
 
 def _parse_json_response(raw: str) -> dict:
@@ -150,59 +614,89 @@ def _parse_json_response(raw: str) -> dict:
     return {}
 
 
-def generate_matter_tags(matter_id: int):
-    """
-    Generate semantic AI tags for a specific matter and save them to the database.
-    This is intended to be run as a background task.
-    """
-    try:
-        db = database.SessionLocal()
-        try:
-            matter = db.query(database.Matter).filter(database.Matter.id == matter_id).first()
-            if not matter:
-                # Matter might have been deleted right after creation
-                return
-            
-            ai_enabled = settings_service.get_setting("ai_enabled", "false") == "true"
-            ai_provider = settings_service.get_setting("ai_provider", "thefuzz")
-            api_key = settings_service.get_setting(f"ai_key_{ai_provider}", "")
-            
-            if not ai_enabled or not api_key or ai_provider == "thefuzz":
-                return # AI not configured
-                
-            prompt = f"""You are a highly efficient legal search assistant. 
-Generate a comprehensive comma-separated list of highly relevant keywords, synonyms, alternative names, practice areas, and associated concepts that would help a user search for the following client matter.
-
-Matter Name: {matter.name}
-Client Name: {matter.client_name or 'Unknown'}
-Description/Context: {matter.description or 'No description provided'}
+_TAGS_PROMPT_HEADER = """You are a highly efficient legal search assistant. 
+Generate a comprehensive comma-separated list of highly relevant keywords, synonyms, alternative names, practice areas, and associated concepts that would help a user search for each of the following client matters.
+"""
 
+_TAGS_PROMPT_RULES = """
 Rules:
-1. Provide ONLY the comma-separated keywords. No introduction, no formatting, no bullet points.
+1. Respond ONLY with a JSON object mapping each Matter ID to its comma-separated keywords. No introduction, no markdown.
 2. Include alternative spellings, broad categories, and specific concepts.
-3. Keep it under 20 keywords.
+3. Keep it under 20 keywords per matter.
 
 Example output: 
-employment, litigation, dispute, HR, human resources, lawsuit, termination
+{"12": "employment, litigation, dispute, HR, human resources, lawsuit, termination"}
 """
-            raw_response = ""
-            if ai_provider == "claude":
-                raw_response = _call_claude(prompt, api_key)
-            elif ai_provider == "gemini":
-                raw_response = _call_gemini(prompt, api_key)
-            elif ai_provider == "openai":
-                raw_response = _call_openai(prompt, api_key)
-            elif ai_provider == "grok":
-                raw_response = _call_grok(prompt, api_key)
-
-            if raw_response:
-                clean_tags = raw_response.strip()
-                matter.ai_tags = clean_tags
-                db.commit()
-                print(f"Successfully generated AI tags for Matter {matter_id}: {clean_tags}")
-
-        finally:
-            db.close()
-            
-    except Exception as e:
-        print(f"Error generating AI tags in background task for matter {matter_id}: {e}")
+
+
+def _build_tags_prompt(matters) -> str:
+    blocks = [
+        f"""
+Matter ID: {m.id}
+Matter Name: {m.name}
+Client Name: {m.client_name or 'Unknown'}
+Description/Context: {m.description or 'No description provided'}
+"""
+        for m in matters
+    ]
+    return _TAGS_PROMPT_HEADER + "".join(blocks) + _TAGS_PROMPT_RULES
+
+
+def _parse_tags_response(raw: str, matters) -> dict:
+    """{matter_id: tags} from a tags answer; matters it leaves out are missing."""
+    try:
+        match = re.search(r'\{.*\}', raw or "", re.DOTALL)
+        data = json.loads(match.group()) if match else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        # A plain keyword list is a usable answer when only one matter was asked about
+        if len(matters) == 1 and raw and raw.strip() and "{" not in raw:
+            return {matters[0].id: raw.strip()}
+        return {}
+
+    tags = {}
+    for m in matters:
+        value = data.get(str(m.id))
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if isinstance(value, str) and value.strip():
+            tags[m.id] = value.strip()
+    return tags
+
+
+def generate_tags_batch(matters, provider: str, api_key: str) -> dict:
+    """
+    Generate semantic AI tags for several matters with one provider call.
+    matters: objects with id, name, client_name and description.
+    Returns {matter_id: tags} for the matters the model answered for (cached
+    answers are reused per matter content). Provider errors are raised so the
+    caller can retry.
+    """
+    tags = {}
+    cache_keys = {}
+    todo = []
+    for m in matters:
+        if provider not in _UNCACHED_PROVIDERS:
+            # Keyed by the matter content, so an unchanged matter (e.g. re-scanned) reuses its tags
+            cache_keys[m.id] = ai_cache_service.make_key(
+                "tags", provider, _MODELS.get(provider), m.name, m.client_name, m.description
+            )
+            cached = ai_cache_service.get(cache_keys[m.id])
+            if cached:
+                tags[m.id] = cached
+                continue
+        todo.append(m)
+
+    if todo:
+        if provider not in _PROVIDER_CALLS:
+            raise ValueError(f"Unknown AI provider: {provider}")
+        # Room for every matter's keywords, or the JSON object is cut off mid-way
+        raw_response = _PROVIDER_CALLS[provider](_build_tags_prompt(todo), api_key,
+                                                 max_tokens=TAGS_MAX_TOKENS_PER_MATTER * len(todo))
+        for matter_id, value in _parse_tags_response(raw_response, todo).items():
+            tags[matter_id] = value
+            if matter_id in cache_keys:
+                ai_cache_service.put(cache_keys[matter_id], "tags", value)
+    return tags
+
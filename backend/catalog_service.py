@@ -0,0 +1,340 @@
+import threading
+from collections import OrderedDict
+from . import database
+from . import nlp_service
+from . import matcher_pool
+from . import settings_service
+
+# Process-wide snapshot of the matter catalog, and the matcher built from it.
+# Both are kept in sync incrementally by matter_saved() / matter_deleted();
+# invalidate() forces a full rebuild on the next request.
+_lock = threading.Lock()
+_snapshot = None
+_matcher = None
+# Bumped on every matter mutation; part of every cache key below
+_version = 0
+
+
+_FIELDS = (
+    "id", "name", "external_id", "description", "company_name", "client_name",
+    "client_email", "status_flag", "is_closed", "source_email_id", "created_at", "ai_tags",
+)
+
+_COLUMNS = tuple(getattr(database.Matter, field) for field in _FIELDS)
+
+
+class MatterRecord:
+    """
+    Read-only copy of one matters row. Shared between requests (and by the
+    matcher), so it must never be modified; edits go through the database and
+    matter_saved(), which swaps in a new record.
+    """
+    __slots__ = _FIELDS + ("name_lower",)
+
+    def __init__(self, row):
+        for field, value in zip(_FIELDS, row):
+            object.__setattr__(self, field, value)
+        object.__setattr__(self, "name_lower", (self.name or "").lower())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MatterRecord is read-only")
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in _FIELDS}
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the whole catalog at one catalog version: matters ordered
+    by id, plus an id lookup. A mutation produces a new snapshot, so a request
+    can keep using the one it started with.
+    """
+    __slots__ = ("version", "matters", "_index")
+
+    def __init__(self, version, matters):
+        self.version = version
+        self.matters = tuple(matters)
+        self._index = {m.id: i for i, m in enumerate(self.matters)}
+
+    def __len__(self):
+        return len(self.matters)
+
+    def __iter__(self):
+        return iter(self.matters)
+
+    def get(self, matter_id):
+        """The MatterRecord with this id, or None."""
+        i = self._index.get(matter_id)
+        return None if i is None else self.matters[i]
+
+    def open_matters(self):
+        return [m for m in self.matters if not m.is_closed]
+
+    def patched(self, version, record=None, removed_id=None):
+        """A copy with `record` inserted or replaced and/or `removed_id` dropped."""
+        matters = list(self.matters)
+        if removed_id is not None and removed_id in self._index:
+            del matters[self._index[removed_id]]
+        if record is not None:
+            i = self._index.get(record.id)
+            if i is not None and removed_id is None:
+                matters[i] = record
+            else:
+                matters.append(record)
+                if len(matters) > 1 and matters[-2].id > record.id:
+                    matters.sort(key=lambda m: m.id)
+        return CatalogSnapshot(version, matters)
+
+
+def _load_records(db, matter_id=None):
+    """Read matters straight into MatterRecords (column query, no ORM objects)."""
+    query = db.query(*_COLUMNS)
+    if matter_id is not None:
+        query = query.filter(database.Matter.id == matter_id)
+    return [MatterRecord(row) for row in query.order_by(database.Matter.id)]
+
+
+def _build_matcher(matters):
+    """
+    Use the sharded process pool when enabled ("matcher_processes" setting > 0)
+    and the catalog is big enough to be worth the IPC; otherwise match in-process.
+    """
+    try:
+        processes = int(settings_service.get_setting("matcher_processes", "0"))
+    except ValueError:
+        processes = 0
+    if processes > 0 and len(matters) >= matcher_pool.PARALLEL_MIN_MATTERS:
+        try:
+            return matcher_pool.ShardedMatterMatcher(matters, processes)
+        except Exception as e:
+            print(f"Could not start matcher pool, matching in-process: {e}")
+    return nlp_service.MatterMatcher(matters)
+
+
+def version():
+    """Current catalog version. Changes whenever a matter is added, edited or deleted."""
+    return _version
+
+
+def _bump():
+    # Called after the snapshot and matcher were updated, so a result cached
+    # under the new version was always computed against the new catalog
+    global _version
+    _version += 1
+
+
+def _get_snapshot(db):
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = CatalogSnapshot(_version, _load_records(db))
+    return _snapshot
+
+
+def get_snapshot(db):
+    """Return the current catalog snapshot, loading it from the database if needed."""
+    with _lock:
+        return _get_snapshot(db)
+
+
+def get_matcher(db):
+    """Return the cached matcher, building it from the snapshot if needed."""
+    global _matcher
+    with _lock:
+        if _matcher is None:
+            _matcher = _build_matcher(_get_snapshot(db).matters)
+        return _matcher
+
+
+def invalidate():
+    """Drop the cached snapshot and matcher; the next request rebuilds them from the database."""
+    global _matcher, _snapshot
+    with _lock:
+        # Not closed here: requests still matching against it hold a reference,
+        # and a sharded pool stops its workers once the last one lets go
+        _matcher = None
+        _snapshot = None
+        _bump()
+
+
+def shutdown():
+    """Stop matcher worker processes, if any. Called when the server exits."""
+    with _lock:
+        matcher = _matcher
+    invalidate()
+    _close(matcher)
+
+
+def _close(matcher):
+    if isinstance(matcher, matcher_pool.ShardedMatterMatcher):
+        matcher.close()
+
+
+def matter_saved(db, matter_id: int):
+    """Re-index a matter after it was created or edited. Call after the commit."""
+    global _snapshot
+    with _lock:
+        if _snapshot is not None or _matcher is not None:
+            records = _load_records(db, matter_id)
+            if not records:
+                _remove(matter_id)
+            else:
+                if _snapshot is not None:
+                    _snapshot = _snapshot.patched(_version + 1, record=records[0])
+                if _matcher is not None:
+                    _matcher.update(records[0])
+        _bump()
+
+
+def matter_deleted(matter_id: int):
+    """Drop a deleted matter from the snapshot and the index."""
+    with _lock:
+        _remove(matter_id)
+        _bump()
+
+
+def _remove(matter_id):
+    global _snapshot
+    if _snapshot is not None:
+        _snapshot = _snapshot.patched(_version + 1, removed_id=matter_id)
+    if _matcher is not None:
+        _matcher.remove(matter_id)
+
+
+# --- Result caches ---
+# Users resubmit the same entries (daily recurring work, or the same text again
+# with a matter_id after disambiguation). Matching and AI parse results are
+# cached per normalized text and catalog version, so a catalog change can never
+# serve a stale result; old-version entries simply age out of the LRU.
+
+class LRUCache:
+    """Thread-safe least-recently-used cache holding at most `maxsize` entries."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+MATCH_CACHE_SIZE = 2048
+AI_PARSE_CACHE_SIZE = 512
+
+_match_cache = LRUCache(MATCH_CACHE_SIZE)
+_ai_parse_cache = LRUCache(AI_PARSE_CACHE_SIZE)
+
+
+def normalize_text(text):
+    """Cache key form of an entry: surrounding and repeated whitespace removed."""
+    return " ".join(text.split())
+
+
+def _normalize_with_offsets(text):
+    """
+    normalize_text(text), plus the offset in text of every normalized character
+    and of its end, so ranges found in the normalized form map back to the entry.
+    """
+    chars, offsets = [], []
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            continue
+        if offsets and offsets[-1] != i - 1:
+            # One space stands for the whole run of whitespace before this word
+            chars.append(" ")
+            offsets.append(offsets[-1] + 1)
+        chars.append(ch)
+        offsets.append(i)
+    offsets.append(offsets[-1] + 1 if offsets else 0)
+    return "".join(chars), offsets
+
+
+def match_spans(text, matter, stage):
+    """
+    nlp_service.match_spans() for a match_scored() result: computed on the
+    normalized text the matcher saw, returned as (start, end) offsets into text.
+    """
+    normalized, offsets = _normalize_with_offsets(text)
+    return [(offsets[start], offsets[end - 1] + 1)
+            for start, end in nlp_service.match_spans(normalized, matter, stage) if end > start]
+
+
+def match_scored(matcher, text, threshold=60, top_k=None):
+    """
+    matcher.match_scored() on the normalized text, served from the LRU cache
+    when the same text was matched against the same catalog version before.
+    """
+    text = normalize_text(text)
+    key = (text, threshold, top_k, _version)
+    result = _match_cache.get(key)
+    if result is None:
+        stage, scored = matcher.match_scored(text, threshold, top_k)
+        result = (stage, tuple(scored))
+        _match_cache.put(key, result)
+    stage, scored = result
+    return stage, list(scored)
+
+
+def match(matcher, text, threshold=60, top_k=None):
+    """Cached equivalent of matcher.match()."""
+    _stage, scored = match_scored(matcher, text, threshold, top_k)
+    return [m for m, _score in scored]
+
+
+def cached_ai_parse(text, provider, parse):
+    """
+    Return the AI parse result for text, calling parse() only on a cache miss.
+    Failed calls (exceptions, or an empty result) are not cached.
+    """
+    key = (normalize_text(text), provider, _version)
+    result = _ai_parse_cache.get(key)
+    if result is None:
+        result = parse()
+        if result:
+            _ai_parse_cache.put(key, result)
+    return dict(result) if result is not None else None
+
+
+async def cached_ai_parse_async(text, provider, parse):
+    """cached_ai_parse() for a coroutine function parse(); None (no answer in time) is not cached."""
+    key = (normalize_text(text), provider, _version)
+    result = _ai_parse_cache.get(key)
+    if result is None:
+        result = await parse()
+        if result:
+            _ai_parse_cache.put(key, result)
+    return dict(result) if result is not None else None
+
+
+def cache_stats():
+    """Hit/miss counters of the result caches."""
+    return {
+        "catalog_version": _version,
+        "match": _match_cache.stats(),
+        "ai_parse": _ai_parse_cache.stats(),
+    }
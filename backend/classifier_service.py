@@ -0,0 +1,308 @@
+"""
+Local text -> matter classifier learned from past time logs.
+
+Every TimeLog row is a labelled example (description -> matter). The model is
+multinomial naive Bayes over word unigrams and bigrams, kept as per-token
+count postings plus NumPy per-matter totals. Learning a log only adds its
+token counts, so new logs are folded in incrementally: get_classifier() reads
+the rows with an id above the last one it saw. Edits and deletes of logs it
+has already learned (PUT /api/logs, merges, revision accept/revert) are
+caught by a Session flush hook: the stored matter and description are
+unlearned once the transaction commits, and the current row is learned again.
+Matter metadata (name,
+description, client, company, ai_tags) is added as a profile per matter so
+matters without history still get a score.
+
+In /api/log it sits between the rule-based matcher and the AI call: when the
+rules leave several candidates (or none), a prediction with probability of at
+least CLASSIFIER_MIN_CONFIDENCE resolves the entry without asking the AI.
+"""
+import re
+import threading
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from . import database
+from . import catalog_service
+from . import nlp_service
+
+CLASSIFIER_MIN_CONFIDENCE = 0.9
+# A matter needs this many logged examples before the classifier picks it on its own
+CLASSIFIER_MIN_EXAMPLES = 3
+# Additive (Lidstone) smoothing of the token counts
+_ALPHA = 0.1
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or re the to with "
+    "h hr hrs hour hours m min mins minute minutes".split()
+)
+
+
+def words(text: str) -> list:
+    """Lower-cased content words. Short numbers (durations, dates) are dropped; ids of 3+ digits are kept."""
+    return [
+        w for w in _TOKEN_RE.findall((text or "").lower())
+        if len(w) > 1 and w not in _STOPWORDS and (not w[0].isdigit() or (w.isdigit() and len(w) >= 3))
+    ]
+
+
+def tokenize(text: str) -> list:
+    """words() plus adjacent word pairs."""
+    unigrams = words(text)
+    return unigrams + [f"{a} {b}" for a, b in zip(unigrams, unigrams[1:])]
+
+
+class MatterClassifier:
+    """Incremental multinomial naive Bayes. Not thread-safe; the module functions lock around it."""
+
+    def __init__(self):
+        self.postings = {}  # token -> {row: count}
+        self.matter_ids = []  # row -> matter id
+        self.rows = {}  # matter id -> row
+        self.totals = np.zeros(64)  # token count per row
+        self.examples = np.zeros(64)  # logged examples per row
+        self.profiles = {}  # matter id -> (profile text, tokens)
+
+    def _row(self, matter_id: int) -> int:
+        row = self.rows.get(matter_id)
+        if row is None:
+            row = len(self.matter_ids)
+            self.rows[matter_id] = row
+            self.matter_ids.append(matter_id)
+            if row == len(self.totals):
+                self.totals = np.concatenate([self.totals, np.zeros(row)])
+                self.examples = np.concatenate([self.examples, np.zeros(row)])
+        return row
+
+    def _add(self, row: int, tokens, sign: int):
+        for token in tokens:
+            counts = self.postings.setdefault(token, {})
+            counts[row] = counts.get(row, 0) + sign
+            if not counts[row]:
+                del counts[row]
+                if not counts:
+                    del self.postings[token]  # keeps the vocabulary size exact after unlearning
+        self.totals[row] += sign * len(tokens)
+
+    def learn(self, matter_id: int, text: str):
+        """Add one logged example."""
+        tokens = tokenize(text)
+        if tokens:
+            row = self._row(matter_id)
+            self._add(row, tokens, 1)
+            self.examples[row] += 1
+
+    def unlearn(self, matter_id: int, text: str):
+        """Remove one example added by learn()."""
+        tokens = tokenize(text)
+        row = self.rows.get(matter_id)
+        if tokens and row is not None:
+            self._add(row, tokens, -1)
+            self.examples[row] -= 1
+
+    def set_profile(self, matter_id: int, text: str):
+        """Replace the metadata profile of a matter (no-op when unchanged)."""
+        old = self.profiles.get(matter_id)
+        if old and old[0] == text:
+            return
+        row = self._row(matter_id)
+        if old:
+            self._add(row, old[1], -1)
+        tokens = tokenize(text)
+        self._add(row, tokens, 1)
+        self.profiles[matter_id] = (text, tokens)
+
+    def predict(self, text: str, candidate_ids=None) -> list:
+        """[(matter_id, probability, examples)] best first, over candidate_ids (default: every known matter)."""
+        tokens = [t for t in tokenize(text) if t in self.postings]
+        if not tokens:
+            return []
+        if candidate_ids is None:
+            rows = np.arange(len(self.matter_ids))
+        else:
+            rows = np.array([self.rows[i] for i in candidate_ids if i in self.rows], dtype=int)
+        if not len(rows):
+            return []
+
+        counts = np.zeros((len(self.matter_ids), len(tokens)))
+        for j, token in enumerate(tokens):
+            posting = self.postings[token]
+            counts[list(posting), j] = list(posting.values())
+        counts = counts[rows]
+
+        vocab_size = len(self.postings)
+        scores = (
+            np.log(counts + _ALPHA).sum(axis=1)
+            - len(tokens) * np.log(self.totals[rows] + _ALPHA * vocab_size)
+            + np.log(self.examples[rows] + 1)
+        )
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        order = np.argsort(-probabilities)
+        return [
+            (self.matter_ids[rows[i]], float(probabilities[i]), int(self.examples[rows[i]]))
+            for i in order
+        ]
+
+
+_lock = threading.Lock()
+_model = None
+_last_log_id = 0
+_catalog_version = None
+# log id -> (matter_id, description) as last learned, for logs edited or deleted since
+_changed = {}
+_stats = {"predictions": 0, "resolved": 0}
+
+
+def _profile_text(matter) -> str:
+    return " ".join(filter(None, (matter.name, matter.description, matter.client_name, matter.company_name, matter.ai_tags)))
+
+
+@event.listens_for(Session, "before_flush")
+def _note_changed_logs(session, _flush_context, _instances):
+    """Keep the stored values of TimeLogs this flush edits or deletes, until the transaction ends."""
+    ids = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, database.TimeLog) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj))
+    ]
+    pending = session.info.setdefault("classifier_changed", {})
+    ids = [log_id for log_id in ids if log_id not in pending]  # an earlier flush already has the committed values
+    if not ids:
+        return
+    rows = session.connection().execute(
+        select(database.TimeLog.id, database.TimeLog.matter_id, database.TimeLog.description)
+        .where(database.TimeLog.id.in_(ids))
+    )
+    for log_id, matter_id, description in rows:
+        pending[log_id] = (matter_id, description)
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_changed_logs(session):
+    pending = session.info.pop("classifier_changed", None)
+    if pending:
+        with _lock:
+            for log_id, values in pending.items():
+                _changed.setdefault(log_id, values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_logs(session):
+    session.info.pop("classifier_changed", None)
+
+
+def _apply_changes(db):
+    """Unlearn the old values of edited or deleted logs and learn their current rows. Caller holds _lock."""
+    learned = {log_id: values for log_id, values in _changed.items() if log_id <= _last_log_id}
+    _changed.clear()
+    if not learned:
+        return  # logs not learned yet are read with their current values by _refresh
+    for matter_id, description in learned.values():
+        _model.unlearn(matter_id, description)
+    rows = db.query(database.TimeLog.matter_id, database.TimeLog.description).filter(
+        database.TimeLog.id.in_(list(learned))
+    )
+    for matter_id, description in rows:
+        _model.learn(matter_id, description)
+
+
+def _refresh(db):
+    """Fold in logs added or changed since the last call and matter edits since the last catalog version. Caller holds _lock."""
+    global _model, _last_log_id, _catalog_version
+    max_id = db.query(func.max(database.TimeLog.id)).scalar() or 0
+    if _model is None or max_id < _last_log_id:
+        # First use, or the logs were reset and ids start over
+        _model, _last_log_id, _catalog_version = MatterClassifier(), 0, None
+        _changed.clear()
+    _apply_changes(db)
+    if max_id > _last_log_id:
+        rows = db.query(database.TimeLog.matter_id, database.TimeLog.description).filter(
+            database.TimeLog.id > _last_log_id, database.TimeLog.id <= max_id
+        )
+        for matter_id, description in rows:
+            _model.learn(matter_id, description)
+        _last_log_id = max_id
+
+    version = catalog_service.version()  # read before the snapshot, see catalog_service._bump
+    if version != _catalog_version:
+        for matter in catalog_service.get_snapshot(db):
+            _model.set_profile(matter.id, _profile_text(matter))
+        _catalog_version = version
+    return _model
+
+
+def get_classifier(db) -> MatterClassifier:
+    """The shared classifier, trained on every log so far."""
+    with _lock:
+        return _refresh(db)
+
+
+def predict(db, text: str, candidate_ids=None) -> list:
+    """
+    [(matter_id, probability, examples)] for an entry, best first.
+    candidate_ids limits the choice; by default every open matter is a candidate.
+    """
+    if candidate_ids is None:
+        candidate_ids = [m.id for m in catalog_service.get_snapshot(db).open_matters()]
+    with _lock:
+        return _refresh(db).predict(nlp_service.clean_description(text), candidate_ids)
+
+
+def classify(db, text: str, candidate_ids=None):
+    """(matter_id, probability) when the classifier is confident, else None."""
+    ranked = predict(db, text, candidate_ids)
+    result = None
+    if ranked:
+        matter_id, probability, examples = ranked[0]
+        if probability >= CLASSIFIER_MIN_CONFIDENCE and examples >= CLASSIFIER_MIN_EXAMPLES:
+            result = matter_id, probability
+    with _lock:
+        _stats["predictions"] += 1
+        _stats["resolved"] += result is not None
+    return result
+
+
+def matter_deleted(db, matter_id: int):
+    """
+    Note a matter's logs before they are bulk deleted (query().delete() skips
+    _note_changed_logs), so they are unlearned once db commits.
+    """
+    pending = db.info.setdefault("classifier_changed", {})
+    rows = db.execute(
+        select(database.TimeLog.id, database.TimeLog.matter_id, database.TimeLog.description)
+        .where(database.TimeLog.matter_id == matter_id)
+    )
+    for log_id, log_matter_id, description in rows:
+        pending.setdefault(log_id, (log_matter_id, description))
+
+
+def reset():
+    """Forget the model; the next use retrains from the database."""
+    global _model
+    with _lock:
+        _model = None
+        _changed.clear()
+
+
+def warm():
+    """Train the model ahead of the first entry; run in a background thread at startup."""
+    db = database.SessionLocal()
+    try:
+        get_classifier(db)
+    except Exception as e:
+        print(f"Classifier warm-up failed: {e}")
+    finally:
+        db.close()
+
+
+def stats() -> dict:
+    with _lock:
+        model = _model
+        return {
+            "last_log_id": _last_log_id,
+            "matters": len(model.matter_ids) if model else 0,
+            "vocabulary": len(model.postings) if model else 0,
+            **_stats,
+        }
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from . import database
 from . import settings_service
+from . import catalog_service
 
 def get_weekly_stats(db: Session):
     """Calculate total minutes and units for Monday - Friday of the current week."""
@@ -20,25 +22,36 @@ def get_weekly_stats(db: Session):
     
     friday_end = monday + timedelta(days=4, hours=23, minutes=59, seconds=59)
     
-    # Get logs from this Mon to Fri
-    logs = db.query(database.TimeLog).filter(
-        database.TimeLog.log_date >= monday,
-        database.TimeLog.log_date <= friday_end
-    ).all()
-    
-    for log in logs:
-        # 0 = Mon, 4 = Fri
-        day_idx = log.log_date.weekday()
-        if 0 <= day_idx <= 4:
-            stats[day_idx]["minutes"] += log.duration_minutes
-            stats[day_idx]["units"] += log.units
+    # Totals per day from this Mon to Fri, from the daily_totals rollup
+    day_index = {database.day_key(monday + timedelta(days=i)): i for i in range(5)}
+    totals = db.query(
+        database.DailyTotal.log_day,
+        func.sum(database.DailyTotal.minutes),
+        func.sum(database.DailyTotal.units),
+    ).filter(
+        database.DailyTotal.log_day >= database.day_key(monday),
+        database.DailyTotal.log_day <= database.day_key(friday_end)
+    ).group_by(database.DailyTotal.log_day)
+
+    for log_day, minutes, units in totals:
+        day_idx = day_index.get(log_day)
+        if day_idx is not None:
+            stats[day_idx]["minutes"] += minutes or 0
+            stats[day_idx]["units"] += units or 0
             
     return stats
 
 def get_dynamic_reminders(db: Session):
     """Generate dynamic sticky notes for idle, new, and urgent matters."""
     import json
-    matters = db.query(database.Matter).filter(database.Matter.is_closed == False).all()
+    matters = catalog_service.get_snapshot(db).open_matters()
+    # Log count and latest log date per matter in one query (instead of loading m.time_logs for each)
+    log_stats = {
+        matter_id: (count, latest)
+        for matter_id, count, latest in db.query(
+            database.TimeLog.matter_id, func.count(database.TimeLog.id), func.max(database.TimeLog.log_date)
+        ).group_by(database.TimeLog.matter_id)
+    }
     now = datetime.now()
     reminders = []
     
@@ -64,10 +77,10 @@ def get_dynamic_reminders(db: Session):
             })
             continue # Prioritize urgent over idle/new
             
-        logs = m.time_logs
+        log_count, latest_log_date = log_stats.get(m.id, (0, None))
         
         # New Scanned Matters (0 logs, has source_email_id)
-        if not logs and m.source_email_id:
+        if not log_count and m.source_email_id:
             ext_id_str = f" [{m.external_id}]" if m.external_id else ""
             note_id = f"dynamic_new_{m.id}"
             ov = overrides.get(note_id, {})
@@ -84,8 +97,7 @@ def get_dynamic_reminders(db: Session):
             continue
             
         # Idle Matters (Yellow flag, no logs in > 3 days)
-        if m.status_flag == "yellow" and logs:
-            latest_log_date = max(log.log_date for log in logs)
+        if m.status_flag == "yellow" and log_count:
             if (now - latest_log_date).days > 3:
                 note_id = f"dynamic_idle_{m.id}"
                 ov = overrides.get(note_id, {})
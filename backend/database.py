@@ -1,10 +1,109 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, event, inspect, delete, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
+import os
 
 DATABASE_URL = "sqlite:///./timesheet.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Pragmas applied to every new SQLite connection. "tuned" uses WAL so the daily
+# backup, exports and /api/log writes no longer block each other; "legacy" is
+# what the app ran with before (SQLite defaults: rollback journal, fsync on every
+# commit, and the sqlite3 module's 5 s lock timeout), kept for comparison and for
+# databases on filesystems without shared memory support.
+ENGINE_PROFILES = {
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # with WAL: fsync at checkpoints, not on every commit
+        "mmap_size": 268435456,  # 256 MB of the file read through the page cache
+        "cache_size": -65536,  # 64 MB (negative values are KiB)
+        "busy_timeout": 5000,  # ms to wait for a lock instead of failing with "database is locked"
+        "temp_store": "MEMORY",
+    },
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -2000,
+        "busy_timeout": 5000,
+        "temp_store": "DEFAULT",
+    },
+}
+# Profile of the app's engine; TIMESHEET_DB_PROFILE=legacy selects the old settings.
+# ensure_profile() falls back to "legacy" at startup when WAL is refused.
+ENGINE_PROFILE = os.environ.get("TIMESHEET_DB_PROFILE", "tuned")
+if ENGINE_PROFILE not in ENGINE_PROFILES:
+    print(f"Unknown TIMESHEET_DB_PROFILE {ENGINE_PROFILE!r}, using 'tuned'")
+    ENGINE_PROFILE = "tuned"
+
+# PRAGMA results are reported as numbers or lowercase names
+_PRAGMA_VALUES = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+}
+
+
+def apply_profile(dbapi_connection, profile: dict):
+    """Run the profile's PRAGMA statements on a raw DB-API connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in profile.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def attach_profile(target_engine, name: str = None):
+    """
+    Apply an engine profile to every connection the engine's pool opens.
+    Without a name, connections get ENGINE_PROFILE as it is when they open.
+    """
+    @event.listens_for(target_engine, "connect")
+    def _on_connect(dbapi_connection, _connection_record):
+        apply_profile(dbapi_connection, ENGINE_PROFILES[name or ENGINE_PROFILE])
+
+    return target_engine
+
+
+def check_profile(target_engine=None, name: str = None) -> dict:
+    """
+    Read back the pragmas of a live connection and compare them with the profile.
+    Returns {pragma: {"expected": ..., "actual": ..., "ok": bool}}.
+    """
+    profile = ENGINE_PROFILES[name or ENGINE_PROFILE]
+    report = {}
+    with (target_engine or engine).connect() as connection:
+        for pragma, expected in profile.items():
+            actual = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            wanted = _PRAGMA_VALUES.get(pragma, {}).get(str(expected).upper(), expected)
+            if isinstance(actual, str):
+                ok = actual.lower() == str(wanted).lower()
+            else:
+                ok = actual == wanted
+            report[pragma] = {"expected": expected, "actual": actual, "ok": ok}
+    return report
+
+
+def ensure_profile(target_engine=None) -> dict:
+    """
+    check_profile() for an engine attached without a profile name (the app's).
+    When SQLite refused WAL (e.g. a database on a network drive), ENGINE_PROFILE
+    falls back to "legacy" and the pool is reopened with it. Returns the report
+    of the profile in effect.
+    """
+    global ENGINE_PROFILE
+    target_engine = target_engine or engine
+    report = check_profile(target_engine)
+    if ENGINE_PROFILES[ENGINE_PROFILE]["journal_mode"] == "WAL" and not report["journal_mode"]["ok"]:
+        print(f"SQLite refused WAL (journal_mode is {report['journal_mode']['actual']}): "
+              f"falling back from profile {ENGINE_PROFILE} to legacy")
+        ENGINE_PROFILE = "legacy"
+        target_engine.dispose()
+        report = check_profile(target_engine)
+    return report
+
+
+engine = attach_profile(create_engine(DATABASE_URL, connect_args={"check_same_thread": False}))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -27,8 +126,23 @@ class Matter(Base):
 
     time_logs = relationship("TimeLog", back_populates="matter")
 
+def day_key(value: datetime):
+    """Integer YYYYMMDD day bucket of a datetime (the time_logs.log_day column)."""
+    if value is None:
+        return None
+    return value.year * 10000 + value.month * 100 + value.day
+
 class TimeLog(Base):
     __tablename__ = "time_logs"
+    # Range filters on log_date and per-matter history are answered from these indexes
+    # (created for existing databases by migrate_db_log_day)
+    __table_args__ = (
+        Index("ix_time_logs_log_date", "log_date"),
+        Index("ix_time_logs_matter_id_log_date", "matter_id", "log_date"),
+        Index("ix_time_logs_log_day", "log_day"),
+        # Covers the per-matter totals of /api/summary (sums and latest created_at without table lookups)
+        Index("ix_time_logs_matter_id_created_at", "matter_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     matter_id = Column(Integer, ForeignKey("matters.id"))
@@ -42,6 +156,138 @@ class TimeLog(Base):
     # New field for time units
     units = Column(Integer, default=0)
 
+    # log_date's day as YYYYMMDD, kept in step on every ORM write, for grouping by day in SQL
+    log_day = Column(Integer)
+
+@event.listens_for(TimeLog, "before_insert")
+@event.listens_for(TimeLog, "before_update")
+def _set_log_day(_mapper, _connection, target):
+    if target.log_date is None:
+        target.log_date = datetime.now()
+    target.log_day = day_key(target.log_date)
+
+# PRAGMA foreign_keys stays off (as in every release so far), so ON DELETE CASCADE
+# below is not enforced: /api/reset and DELETE /api/matters/{id} delete the
+# dependent rows themselves.
+
+class DailyTotal(Base):
+    # Per matter and day sums of time_logs, kept in step by the TimeLog hooks below
+    # (see rollup_service for rebuild and verification)
+    __tablename__ = "daily_totals"
+
+    matter_id = Column(Integer, ForeignKey("matters.id", ondelete="CASCADE"), primary_key=True)
+    log_day = Column(Integer, primary_key=True, index=True) # YYYYMMDD
+    minutes = Column(Integer, default=0)
+    units = Column(Integer, default=0)
+    count = Column(Integer, default=0)
+
+def _add_to_daily_total(connection, matter_id, log_day, minutes, units, count):
+    if matter_id is None or log_day is None:
+        return
+    table = DailyTotal.__table__
+    upsert = sqlite_insert(table).values(
+        matter_id=matter_id, log_day=log_day, minutes=minutes, units=units, count=count
+    )
+    connection.execute(upsert.on_conflict_do_update(
+        index_elements=[table.c.matter_id, table.c.log_day],
+        set_={
+            "minutes": table.c.minutes + upsert.excluded.minutes,
+            "units": table.c.units + upsert.excluded.units,
+            "count": table.c.count + upsert.excluded.count,
+        },
+    ))
+    if count < 0:
+        connection.execute(delete(table).where(
+            table.c.matter_id == matter_id, table.c.log_day == log_day, table.c.count <= 0
+        ))
+
+_ROLLUP_FIELDS = ("matter_id", "log_day", "duration_minutes", "units")
+
+def _stored_rollup_values(connection, log_id):
+    """(matter_id, log_day, minutes, units) of a log as stored, before this flush changes it."""
+    table = TimeLog.__table__
+    row = connection.execute(
+        table.select().with_only_columns(*(table.c[name] for name in _ROLLUP_FIELDS)).where(table.c.id == log_id)
+    ).first()
+    if row is None:
+        return None
+    matter_id, log_day, minutes, units = row
+    return matter_id, log_day, minutes or 0, units or 0
+
+def _rollup_values(target):
+    return target.matter_id, target.log_day, target.duration_minutes or 0, target.units or 0
+
+@event.listens_for(TimeLog, "after_insert")
+def _rollup_insert(_mapper, connection, target):
+    matter_id, log_day, minutes, units = _rollup_values(target)
+    _add_to_daily_total(connection, matter_id, log_day, minutes, units, 1)
+
+@event.listens_for(TimeLog, "before_update")
+def _rollup_update(_mapper, connection, target):
+    # Runs after _set_log_day (registered first), so target.log_day is already the new day
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in _ROLLUP_FIELDS):
+        return
+    old = _stored_rollup_values(connection, target.id)
+    new = _rollup_values(target)
+    if old is not None and old != new:
+        _add_to_daily_total(connection, old[0], old[1], -old[2], -old[3], -1)
+        _add_to_daily_total(connection, new[0], new[1], new[2], new[3], 1)
+
+@event.listens_for(TimeLog, "before_delete")
+def _rollup_delete(_mapper, connection, target):
+    old = _stored_rollup_values(connection, target.id)
+    if old is not None:
+        _add_to_daily_total(connection, old[0], old[1], -old[2], -old[3], -1)
+
+class LogRevision(Base):
+    # A background change to a time log (e.g. AI refinement of a speculative log),
+    # kept with the previous values so the user can accept or revert it
+    __tablename__ = "log_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    log_id = Column(Integer, ForeignKey("time_logs.id"), index=True)
+    source = Column(String, default="ai")
+    status = Column(String, default="pending") # pending, accepted, reverted
+    old_matter_id = Column(Integer)
+    old_duration_minutes = Column(Integer)
+    old_description = Column(Text)
+    new_matter_id = Column(Integer)
+    new_duration_minutes = Column(Integer)
+    new_description = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    resolved_at = Column(DateTime, nullable=True)
+
+class AICacheEntry(Base):
+    # Persistent cache of AI provider answers (see ai_cache_service)
+    __tablename__ = "ai_cache"
+
+    key = Column(String, primary_key=True) # sha256 of provider, model and the request content
+    kind = Column(String) # "parse" or "tags"
+    value = Column(Text) # JSON
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+class TagJob(Base):
+    # Matters waiting for AI tags (see tag_queue_service); kept across restarts
+    __tablename__ = "tag_jobs"
+
+    matter_id = Column(Integer, ForeignKey("matters.id", ondelete="CASCADE"), primary_key=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.now, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+class DisambiguationEntry(Base):
+    # Matters the user picked for an ambiguous phrasing (see disambiguation_service)
+    __tablename__ = "disambiguation_memory"
+    __table_args__ = (UniqueConstraint("phrase_key", "matter_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    phrase_key = Column(String, index=True) # normalized key words of the entry
+    matter_id = Column(Integer, ForeignKey("matters.id", ondelete="CASCADE"))
+    weight = Column(Float, default=0.0) # decayed count of times this matter was picked
+    last_used_at = Column(DateTime, default=datetime.now)
+
 class UserSetting(Base):
     # DEPRECATED: Settings are now stored in settings.json.
     # This table is kept for migration purposes only.
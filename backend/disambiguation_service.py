@@ -0,0 +1,126 @@
+"""
+Disambiguation memory: which matter the user picked when /api/log could not decide.
+
+When an entry comes back with a 409 and the user resends it with a matter_id,
+remember() stores (phrase key -> matter) in the disambiguation_memory table.
+The phrase key is the entry's content words, sorted, without durations and
+date words, so "estoppel review 1h yesterday" and "Review estoppel, 30m" share
+a key. recall() is consulted before fuzzy matching and answers when one open
+matter clearly dominates the key's history.
+
+Weights decay with a half-life of MEMORY_HALF_LIFE_DAYS, so old choices fade
+and a new habit takes over. evict() drops faded entries, entries for closed
+or deleted matters, and the weakest ones beyond MEMORY_MAX_ENTRIES.
+"""
+from datetime import datetime
+from . import database
+from . import catalog_service
+from . import classifier_service
+from . import nlp_service
+
+MEMORY_HALF_LIFE_DAYS = 60
+MEMORY_MAX_ENTRIES = 5000
+# Entries decayed below this weight are forgotten
+MEMORY_MIN_WEIGHT = 0.1
+# The remembered matter must outweigh the runner-up for the same phrase by this factor
+MEMORY_DOMINANCE = 2.0
+# Eviction runs on every this many writes (and at startup)
+_EVICT_EVERY = 200
+
+_DATE_WORDS = frozenset(
+    "today yesterday tomorrow monday tuesday wednesday thursday friday saturday sunday "
+    "jan feb mar apr may jun jul aug sep sept oct nov dec january february march april june july "
+    "august september october november december".split()
+)
+_writes = 0
+
+
+def phrase_key(text: str):
+    """Normalized key for an entry, or None when it has no content words."""
+    key_words = sorted(
+        set(classifier_service.words(nlp_service.clean_description(text))) - _DATE_WORDS
+    )
+    return " ".join(key_words) or None
+
+
+def _decayed(weight: float, last_used_at: datetime, now: datetime) -> float:
+    age_days = max((now - last_used_at).total_seconds(), 0) / 86400
+    return weight * 0.5 ** (age_days / MEMORY_HALF_LIFE_DAYS)
+
+
+def remember(db, text: str, matter_id: int):
+    """Record that the user picked matter_id for this entry. The caller commits."""
+    global _writes
+    key = phrase_key(text)
+    if key is None:
+        return
+    now = datetime.now()
+    entry = db.query(database.DisambiguationEntry).filter(
+        database.DisambiguationEntry.phrase_key == key,
+        database.DisambiguationEntry.matter_id == matter_id,
+    ).first()
+    if entry is None:
+        db.add(database.DisambiguationEntry(phrase_key=key, matter_id=matter_id, weight=1.0, last_used_at=now))
+        # SessionLocal does not autoflush: without this, a second entry of the same batch
+        # would not find the row above and insert a duplicate (phrase_key, matter_id)
+        db.flush()
+    else:
+        entry.weight = _decayed(entry.weight, entry.last_used_at, now) + 1.0
+        entry.last_used_at = now
+
+    _writes += 1
+    if _writes % _EVICT_EVERY == 0:
+        evict(db)
+
+
+def recall(db, text: str):
+    """The open matter remembered for this entry's phrasing, or None."""
+    key = phrase_key(text)
+    if key is None:
+        return None
+    now = datetime.now()
+    snapshot = catalog_service.get_snapshot(db)
+    scored = []
+    for entry in db.query(database.DisambiguationEntry).filter(database.DisambiguationEntry.phrase_key == key):
+        matter = snapshot.get(entry.matter_id)
+        if matter is not None and not matter.is_closed:
+            scored.append((_decayed(entry.weight, entry.last_used_at, now), entry.matter_id))
+    if not scored:
+        return None
+    scored.sort(reverse=True)
+    best_weight, best_id = scored[0]
+    if best_weight < MEMORY_MIN_WEIGHT:
+        return None
+    if len(scored) > 1 and best_weight < MEMORY_DOMINANCE * scored[1][0]:
+        return None  # the user has picked different matters for this phrasing
+    return best_id
+
+
+def evict(db) -> int:
+    """Drop faded entries, entries of closed or deleted matters, and the weakest beyond MEMORY_MAX_ENTRIES. The caller commits."""
+    now = datetime.now()
+    snapshot = catalog_service.get_snapshot(db)
+    keep = []
+    removed = 0
+    for entry in db.query(database.DisambiguationEntry).all():
+        matter = snapshot.get(entry.matter_id)
+        weight = _decayed(entry.weight, entry.last_used_at, now)
+        if matter is None or matter.is_closed or weight < MEMORY_MIN_WEIGHT:
+            db.delete(entry)
+            removed += 1
+        else:
+            keep.append((weight, entry.last_used_at, entry))
+    if len(keep) > MEMORY_MAX_ENTRIES:
+        keep.sort(key=lambda item: (item[0], item[1]))
+        for _weight, _used, entry in keep[:len(keep) - MEMORY_MAX_ENTRIES]:
+            db.delete(entry)
+            removed += 1
+    return removed
+
+
+def stats(db) -> dict:
+    return {
+        "entries": db.query(database.DisambiguationEntry).count(),
+        "max_entries": MEMORY_MAX_ENTRIES,
+        "half_life_days": MEMORY_HALF_LIFE_DAYS,
+    }
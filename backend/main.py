@@ -1,20 +1,24 @@
 from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
-from typing import Optional
+from typing import Optional, List
 import re
 import csv
 import io
 import os
 import signal
 import asyncio
+import threading
 from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 from . import database
 from . import migrate_db
 from . import migrate_db_closed
 from . import migrate_db_company
 from . import migrate_db_ai_tags
+from . import migrate_db_log_day
 from . import backup_service
+from . import ai_cache_service
 
 from . import settings_service
 database.init_db()
@@ -49,14 +53,44 @@ def startup_event():
         migrate_db_closed.add_is_closed_column()
         migrate_db_company.migrate_company_column()
         migrate_db_ai_tags.add_ai_tags_column()
+        migrate_db_log_day.add_log_day_column()
         settings_service.migrate_plaintext_keys()
+        ai_cache_service.evict()
+        disambiguation_service.evict(db)
+        rollup_service.ensure(db)
+        db.commit()
     except Exception as e:
         print(f"Startup migration warning: {e}")
     finally:
         db.close()
-        
+
+    # Report the SQLite pragmas actually in effect (WAL is refused on e.g. network drives,
+    # in which case the legacy profile is used instead)
+    try:
+        report = database.ensure_profile()
+        print("SQLite profile " + database.ENGINE_PROFILE + ": " +
+              ", ".join(f"{name}={item['actual']}" for name, item in report.items()))
+        for name, item in report.items():
+            if not item["ok"]:
+                print(f"SQLite profile warning: {name} is {item['actual']}, expected {item['expected']}")
+    except Exception as e:
+        print(f"SQLite profile check failed: {e}")
+
     # Start the continuous backup loop
     asyncio.create_task(_backup_loop())
+    # Tag generation workers; resume jobs left over from the last run
+    tag_queue_service.start()
+    # Load the saved matter search index (or build it) without delaying startup
+    threading.Thread(target=search_service.warm, name="search-index-warmup", daemon=True).start()
+    # Train the entry classifier on past logs before the first /api/log needs it
+    threading.Thread(target=classifier_service.warm, name="classifier-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    tag_queue_service.stop()
+    search_service.save()
+    catalog_service.shutdown()
+    ai_service.close_clients()
 
 
 from . import outlook_service
@@ -66,6 +100,14 @@ from . import nlp_service
 from . import ai_service
 from . import dashboard_service
 from . import update_service
+from . import catalog_service
+from . import revision_service
+from . import tag_queue_service
+from . import classifier_service
+from . import disambiguation_service
+from . import search_service
+from . import summary_service
+from . import rollup_service
 from pydantic import BaseModel
 
 class SettingsRequest(BaseModel):
@@ -202,52 +244,61 @@ def delete_background():
 
 @app.post("/api/reset")
 def reset_database(db: Session = Depends(database.get_db)):
+    # SQLite does not enforce the foreign keys (no PRAGMA foreign_keys), so rows
+    # that point at logs or matters are deleted here rather than by ON DELETE CASCADE
+    db.query(database.LogRevision).delete()
     # Clear TimeLogs first due to foreign key constraints
     db.query(database.TimeLog).delete()
+    rollup_service.reset(db)
+    db.query(database.DisambiguationEntry).delete()
+    db.query(database.TagJob).delete()
     # Then clear Matters
     db.query(database.Matter).delete()
     db.commit()
+    catalog_service.invalidate()
+    classifier_service.reset()
     return {"message": "Database reset successfully"}
 
 
 
 @app.get("/api/matters")
 def get_matters(db: Session = Depends(database.get_db)):
-    matters = db.query(database.Matter).all()
-    
-    results = []
-    for m in matters:
-        matter_dict = {
-            "id": m.id,
-            "name": m.name,
-            "external_id": m.external_id,
-            "description": m.description,
-            "company_name": m.company_name,
-            "client_name": m.client_name,
-            "client_email": m.client_email,
-            "status_flag": m.status_flag,
-            "is_closed": m.is_closed,
-            "source_email_id": m.source_email_id,
-            "created_at": m.created_at,
-            "ai_tags": m.ai_tags
-        }
-        results.append(matter_dict)
-    return results
+    # Served from the shared catalog snapshot; no ORM objects are built
+    return [m.to_dict() for m in catalog_service.get_snapshot(db)]
+
+@app.get("/api/matters/search")
+def search_matters(q: str, limit: int = 20, include_closed: bool = False, db: Session = Depends(database.get_db)):
+    """Rank matters by similarity of name, description, client, company and AI tags to the query."""
+    limit = max(1, min(limit, 200))
+    results = search_service.search(db, q, limit, include_closed)
+    return [{**m.to_dict(), "score": round(score, 4)} for m, score in results]
+
+@app.get("/api/matters/{matter_id}/records")
+def get_matter_records(matter_id: int, limit: int = summary_service.RECORDS_PAGE_DEFAULT, cursor: Optional[str] = None,
+                       start: Optional[str] = None, end: Optional[str] = None, db: Session = Depends(database.get_db)):
+    """A page of a matter's time logs, newest first. start/end are inclusive YYYY-MM-DD dates."""
+    if catalog_service.get_snapshot(db).get(matter_id) is None:
+        raise HTTPException(status_code=404, detail="Matter not found")
+    limit = max(1, min(limit, summary_service.RECORDS_PAGE_MAX))
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d") if start else None
+        end_date = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else None
+        if cursor:
+            summary_service.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or cursor")
+    return summary_service.matter_records_page(db, matter_id, limit, cursor, start_date, end_date)
 
 @app.get("/api/logs/daily")
 def get_daily_logs(date: str, db: Session = Depends(database.get_db)):
     """Fetch all logs for a specific YYYY-MM-DD date."""
     try:
-        from datetime import datetime, time
         # Parse the date string
-        target_date = datetime.strptime(date, "%Y-%m-%d").date()
-        start_time = datetime.combine(target_date, time.min)
-        end_time = datetime.combine(target_date, time.max)
+        target_date = datetime.strptime(date, "%Y-%m-%d")
 
         logs = db.query(database.TimeLog).filter(
-            database.TimeLog.log_date >= start_time,
-            database.TimeLog.log_date <= end_time
-        ).all()
+            database.TimeLog.log_day == database.day_key(target_date)
+        ).order_by(database.TimeLog.id).all()
 
         results = []
         for l in logs:
@@ -287,7 +338,7 @@ class MatterUpdateRequest(BaseModel):
     is_closed: Optional[bool] = None
 
 @app.post("/api/matters/manual")
-def add_matter_manual(request: MatterManualRequest, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+def add_matter_manual(request: MatterManualRequest, db: Session = Depends(database.get_db)):
     # Check if matter with same name exists
     existing = db.query(database.Matter).filter(database.Matter.name == request.name).first()
     if existing:
@@ -306,7 +357,8 @@ def add_matter_manual(request: MatterManualRequest, background_tasks: Background
     db.add(new_matter)
     db.commit()
     db.refresh(new_matter)
-    background_tasks.add_task(ai_service.generate_matter_tags, new_matter.id)
+    catalog_service.matter_saved(db, new_matter.id)
+    tag_queue_service.enqueue(db, [new_matter.id])
     return {"message": "Matter added successfully", "matter": new_matter}
 
 @app.put("/api/matters/{matter_id}")
@@ -334,6 +386,7 @@ def update_matter(matter_id: int, request: MatterUpdateRequest, db: Session = De
         
     db.commit()
     db.refresh(matter)
+    catalog_service.matter_saved(db, matter.id)
     return {"message": "Matter updated successfully", "matter": matter}
 
 @app.delete("/api/matters/{matter_id}")
@@ -342,9 +395,16 @@ def delete_matter(matter_id: int, db: Session = Depends(database.get_db)):
     if not matter:
         raise HTTPException(status_code=404, detail="Matter not found")
         
+    # Dependent rows go explicitly: SQLite does not enforce the foreign keys' ON DELETE CASCADE here
+    revision_service.matter_deleted(db, matter_id)
+    classifier_service.matter_deleted(db, matter_id)
     db.query(database.TimeLog).filter(database.TimeLog.matter_id == matter_id).delete()
+    rollup_service.matter_deleted(db, matter_id)
+    db.query(database.DisambiguationEntry).filter(database.DisambiguationEntry.matter_id == matter_id).delete()
+    db.query(database.TagJob).filter(database.TagJob.matter_id == matter_id).delete()
     db.delete(matter)
     db.commit()
+    catalog_service.matter_deleted(matter_id)
     return {"message": "Matter permanently deleted"}
 
 @app.get("/api/dashboard")
@@ -394,12 +454,14 @@ def trigger_update():
     return {"message": "Update initiated. Server is shutting down."}
 
 @app.post("/api/scan")
-def scan_outlook(background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+def scan_outlook(db: Session = Depends(database.get_db)):
     try:
         settings = settings_service.get_user_identifiers()
         found_matters = outlook_service.get_outlook_matters(settings, limit=50, scan_depth=2000)
         count = 0
         added_matters = []
+        new_ids = []
+        touched_ids = []
         
         for m in found_matters:
             # Check by External ID first (primary key for scans), then Name
@@ -427,7 +489,8 @@ def scan_outlook(background_tasks: BackgroundTasks, db: Session = Depends(databa
                 db.add(new_matter)
                 db.commit()
                 db.refresh(new_matter)
-                background_tasks.add_task(ai_service.generate_matter_tags, new_matter.id)
+                catalog_service.matter_saved(db, new_matter.id)
+                new_ids.append(new_matter.id)
                 added_matters.append(m['name'])
                 count += 1
             else:
@@ -438,15 +501,31 @@ def scan_outlook(background_tasks: BackgroundTasks, db: Session = Depends(databa
                     existing.client_email = m['client_email']
                 if not existing.source_email_id and m.get('source_email_id'):
                     existing.source_email_id = m['source_email_id']
+                touched_ids.append(existing.id)
         
         db.commit()
+        for matter_id in touched_ids:
+            catalog_service.matter_saved(db, matter_id)
+        # One queue entry per new matter; the queue batches them into a few AI calls
+        tag_queue_service.enqueue(db, new_ids)
         return {
             "message": f"Scan completed. Added {count} new matters.",
             "added_matters": added_matters
         }
     except Exception as e:
+        # Matters may have been committed before the failure
+        catalog_service.invalidate()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Longest candidate list returned with a 409 when only fuzzy matches were found
+MAX_FUZZY_CANDIDATES = 10
+# Speculative logging: a lone fuzzy match needs at least this score to be logged before the AI answers
+SPECULATIVE_MIN_SCORE = 90
+# AI lookups /api/log/batch runs at once; the batch's other ambiguous lines wait for a slot.
+# Kept below the smallest default executor (5 threads) the provider calls run in,
+# so a started lookup never spends its deadline queued behind the others
+BATCH_AI_CONCURRENCY = 4
+
 class LogRequest(BaseModel):
     text: str
     date: Optional[str] = None # Optional date string from UI
@@ -457,56 +536,94 @@ class LogUpdate(BaseModel):
     duration_minutes: Optional[int] = None
     log_date: Optional[str] = None # ISO format
 
-@app.post("/api/log")
-def log_time(request: LogRequest, db: Session = Depends(database.get_db)):
+def _ai_settings():
+    """Return (provider, api_key) when AI matching is enabled and configured, else None."""
+    return ai_service.configured_settings()
+
+def _resolve_locally(text: str, matcher, db: Session):
+    """
+    Local tiers between the exact rules and the AI. Unless the rules found exactly
+    one matter by id or name, the disambiguation memory (the matter picked last
+    time for the same phrasing) is asked first. Then, when the rules left several
+    candidates or none, a confident prediction from the classifier picks the matter.
+    """
+    stage, scored = catalog_service.match_scored(matcher, text, top_k=MAX_FUZZY_CANDIDATES)
+    if len(scored) == 1 and stage != nlp_service.STAGE_FUZZY:
+        return None
+    snapshot = catalog_service.get_snapshot(db)
+    remembered = disambiguation_service.recall(db, text)
+    if remembered is not None:
+        return snapshot.get(remembered)
+    if len(scored) == 1:
+        return None
+    result = classifier_service.classify(db, text, [m.id for m, _score in scored] or None)
+    if result is None:
+        return None
+    return snapshot.get(result[0])
+
+def _speculative_match(text: str, matcher):
+    """The lone local match confident enough to be logged before the AI answers, or None."""
+    stage, scored = catalog_service.match_scored(matcher, text, top_k=MAX_FUZZY_CANDIDATES)
+    if len(scored) == 1 and (stage != nlp_service.STAGE_FUZZY or scored[0][1] >= SPECULATIVE_MIN_SCORE):
+        return scored[0][0]
+    return None
+
+async def _ai_candidates(text: str, matcher, ai_settings, duration: int, log_date: datetime):
+    """
+    Ask the AI for the matter. Returns (candidates, duration, log_date); the
+    candidates come from NLP when the AI misses its deadline or errors.
+    """
+    ai_provider, api_key = ai_settings
+    try:
+        ai_result = await catalog_service.cached_ai_parse_async(
+            text, ai_provider,
+            lambda: ai_service.parse_log_entry_async(
+                text, matcher, ai_provider, api_key, fallback=ai_service.fallback_settings(ai_provider)
+            )
+        )
+    except Exception as e:
+        # AI errored: fall back to NLP before popup
+        print(f"AI service error in /api/log, falling back to NLP: {e}")
+        ai_result = None
+    if ai_result is None:
+        # No answer before the deadline (or every provider failed): use NLP right away
+        candidates = await run_in_threadpool(catalog_service.match, matcher, text, top_k=MAX_FUZZY_CANDIDATES)
+        return candidates, duration, log_date
+
+    ai_match = None
+    if ai_result.get("matter_name"):
+        ai_match = next((m for m in matcher.matters if m.name == ai_result["matter_name"]), None)
+    if ai_match is None:
+        return [], duration, log_date
+    if duration == 0 and ai_result.get("duration_minutes"):
+        duration = ai_result["duration_minutes"]
+    if not log_date and ai_result.get("date"):
+        try:
+            log_date = datetime.fromisoformat(ai_result["date"])
+        except (ValueError, TypeError):
+            pass
+    return [ai_match], duration, log_date
+
+def _prepare_locally(request: LogRequest, matcher, ai_settings, db: Session):
+    """
+    The blocking part of _prepare_log: parse the entry and run every tier that
+    does not need the AI (SQL, fuzzy scoring, the classifier). Runs in a worker thread.
+    Returns (result, parsed). result is _prepare_log's (status_code, content, new_log)
+    when the entry is settled without the AI; otherwise it is None and parsed is
+    (entry, duration, log_date) for the AI step.
+    """
     text = request.text
-    # 1. Extract duration
-    duration = nlp_service.extract_duration(text)
+    # 1. Parse duration, date and description in one pass
+    entry = nlp_service.LogEntryParser().parse(text)
+    duration = entry.duration
     
     # Allow duration via request if not in text (future extensibility), but primarily check text first
     if duration == 0:
-         return JSONResponse(status_code=400, content={"detail": "Missing duration", "code": "ERR_MISSING_DURATION"})
-    
-    # 0. Check for explicit matter_id (Disambiguation case)
-    if request.matter_id:
-        matched_matter = db.query(database.Matter).filter(database.Matter.id == request.matter_id).first()
-        if not matched_matter:
-             raise HTTPException(status_code=404, detail="Selected matter not found")
-             
-        # Skip NLP matching if explicit ID provided
-        log_date = nlp_service.extract_date(text)
-        if not log_date and request.date:
-             try:
-                 log_date = datetime.fromisoformat(request.date)
-             except ValueError:
-                 pass
-        if not log_date:
-             log_date = datetime.now()
-             
-        units = time_service.calculate_units(duration)
-        # Strip "Worked on [Matter Name]" prefix, duration, and punctuation
-        clean_desc = nlp_service.clean_description(text, matched_matter.name)
-        new_log = database.TimeLog(
-            matter_id=matched_matter.id,
-            duration_minutes=duration,
-            units=units,
-            description=clean_desc,
-            log_date=log_date
-        )
-        db.add(new_log)
-        db.commit()
-        return {
-            "message": "Time logged successfully",
-            "matter": matched_matter.name,
-            "duration": duration,
-            "units": units,
-            "description": text,
-            "date": log_date.strftime("%Y-%m-%d %H:%M")
-        }
+        return (400, {"detail": "Missing duration", "code": "ERR_MISSING_DURATION"}, None), None
 
     # 1.5 Extract date
     # Try text extraction first
-    log_date = nlp_service.extract_date(text)
+    log_date = entry.date
     
     # If not in text, try request body
     if not log_date and request.date:
@@ -519,72 +636,54 @@ def log_time(request: LogRequest, db: Session = Depends(database.get_db)):
     if not log_date:
         log_date = datetime.now()
 
-    # 2. Match matter
-    matters = db.query(database.Matter).all()
-    matched_matter = None
-
-    ai_enabled = settings_service.get_setting("ai_enabled", "false") == "true"
-    ai_provider = settings_service.get_setting("ai_provider", "thefuzz")
-    api_key = settings_service.get_setting(f"ai_key_{ai_provider}", "") if ai_provider != "thefuzz" else ""
-
-    if ai_enabled and ai_provider != "thefuzz" and api_key:
-        # AI first: if key is configured, let AI identify the matter
-        candidates = []
-        try:
-            matters_data = [
-                {"name": m.name, "external_id": m.external_id, "description": m.description, "client_name": m.client_name}
-                for m in matters
-            ]
-            ai_result = ai_service.parse_log_entry_with_ai(text, matters_data, ai_provider, api_key)
-            if ai_result.get("matter_name"):
-                ai_match = next((m for m in matters if m.name == ai_result["matter_name"]), None)
-                if ai_match:
-                    if duration == 0 and ai_result.get("duration_minutes"):
-                        duration = ai_result["duration_minutes"]
-                    if not log_date and ai_result.get("date"):
-                        try:
-                            log_date = datetime.fromisoformat(ai_result["date"])
-                        except (ValueError, TypeError):
-                            pass
-                    candidates = [ai_match]
-        except Exception as e:
-            # AI errored: fall back to NLP before popup
-            print(f"AI service error in /api/log, falling back to NLP: {e}")
-            candidates = nlp_service.match_matter(text, matters)
+    # 0. Check for explicit matter_id (Disambiguation case)
+    speculative = False
+    if request.matter_id:
+        # Skip NLP matching if explicit ID provided
+        matched_matter = catalog_service.get_snapshot(db).get(request.matter_id)
+        if not matched_matter:
+            return (404, {"detail": "Selected matter not found"}, None), None
     else:
+        # 2. Match matter
+        matched_matter = None
+        if ai_settings and revision_service.speculative_enabled():
+            # Local-first: log a confident local match now and let the AI check it after the commit
+            matched_matter = _speculative_match(text, matcher)
+            speculative = matched_matter is not None
+        if matched_matter is None:
+            matched_matter = _resolve_locally(text, matcher, db)
+
+    if matched_matter is not None:
+        return _new_log(text, entry, duration, log_date, matched_matter, speculative), None
+    if not ai_settings:
         # No AI key: use NLP only
-        candidates = nlp_service.match_matter(text, matters)
+        candidates = catalog_service.match(matcher, text, top_k=MAX_FUZZY_CANDIDATES)
+        return _from_candidates(text, entry, duration, log_date, candidates), None
+    return None, (entry, duration, log_date)
 
+def _from_candidates(text: str, entry, duration: int, log_date: datetime, candidates):
+    """_prepare_log's result for the matters left by the AI or NLP: a log for one, a 409 otherwise."""
     if not candidates:
-        # No candidates found
         # Return 409 with empty candidates list to prompt creation or manual selection
-        return JSONResponse(
-            status_code=409,
-            content={
-                "detail": "Could not identify the matter. Please select one.",
-                "candidates": []
-            }
-        )
-    elif len(candidates) == 1:
-        # One high-confidence match
-        matched_matter = candidates[0]
-    else:
-        # Multiple candidates
-        # Return 409 with list of candidates
+        return 409, {
+            "detail": "Could not identify the matter. Please select one.",
+            "candidates": []
+        }, None
+    if len(candidates) > 1:
         candidate_list = [{"id": m.id, "name": m.name, "description": m.description or ""} for m in candidates]
-        return JSONResponse(
-            status_code=409,
-            content={
-                "detail": "Multiple matters matched. Please select one.",
-                "candidates": candidate_list
-            }
-        )
-            
+        return 409, {
+            "detail": "Multiple matters matched. Please select one.",
+            "candidates": candidate_list
+        }, None
+    # One high-confidence match
+    return _new_log(text, entry, duration, log_date, candidates[0], False)
+
+def _new_log(text: str, entry, duration: int, log_date: datetime, matched_matter, speculative: bool):
     # 3. Create TimeLog
     units = time_service.calculate_units(duration)
     
     # Strip "Worked on [Matter Name]" prefix, duration, and punctuation
-    clean_desc = nlp_service.clean_description(text, matched_matter.name)
+    clean_desc = entry.description(matched_matter.name)
     new_log = database.TimeLog(
         matter_id=matched_matter.id,
         duration_minutes=duration,
@@ -592,10 +691,7 @@ def log_time(request: LogRequest, db: Session = Depends(database.get_db)):
         description=clean_desc,
         log_date=log_date
     )
-    db.add(new_log)
-    db.commit()
-    
-    return {
+    content = {
         "message": "Time logged successfully",
         "matter": matched_matter.name,
         "duration": duration,
@@ -603,6 +699,220 @@ def log_time(request: LogRequest, db: Session = Depends(database.get_db)):
         "description": text,
         "date": log_date.strftime("%Y-%m-%d %H:%M")
     }
+    if speculative:
+        # The caller schedules revision_service.refine_log() once the log has an id
+        content["refining"] = True
+    return 200, content, new_log
+
+async def _prepare_log(request: LogRequest, matcher, ai_settings, db: Session):
+    """
+    Parse one entry and resolve its matter, without writing anything.
+    ai_settings: result of _ai_settings().
+    Returns (status_code, content, new_log). new_log is an unsaved TimeLog when
+    status_code is 200, otherwise None and content holds the error body.
+    Only the wait for the AI runs on the event loop; the rest is in worker threads.
+    """
+    result, parsed = await run_in_threadpool(_prepare_locally, request, matcher, ai_settings, db)
+    if result is not None:
+        return result
+    return await _prepare_with_ai(request.text, matcher, ai_settings, parsed)
+
+async def _prepare_with_ai(text: str, matcher, ai_settings, parsed):
+    """_prepare_log's result for an entry _prepare_locally left to the AI."""
+    entry, duration, log_date = parsed
+    # AI first: if key is configured, let AI identify the matter
+    candidates, duration, log_date = await _ai_candidates(text, matcher, ai_settings, duration, log_date)
+    return _from_candidates(text, entry, duration, log_date, candidates)
+
+def _prepare_batch_locally(entries, matcher, ai_settings, db: Session):
+    """_prepare_locally for every entry of a batch, in one worker thread."""
+    return [_prepare_locally(entry, matcher, ai_settings, db) for entry in entries]
+
+def _log_context(db: Session):
+    """(matcher, ai_settings) for /api/log and /api/log/batch. Blocking: runs in a worker thread."""
+    return catalog_service.get_matcher(db), _ai_settings()
+
+def _save_logs(db: Session, new_logs, picked):
+    """
+    Commit the new logs and remember the (text, matter_id) pairs the user picked
+    after a 409 for the same phrasing. Blocking: runs in a worker thread.
+    """
+    for text, matter_id in picked:
+        disambiguation_service.remember(db, text, matter_id)
+    db.add_all(new_logs)
+    db.commit()
+    return [log.id for log in new_logs]
+
+@app.post("/api/log")
+async def log_time(request: LogRequest, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+    # async so that waiting on the AI provider does not hold a threadpool worker;
+    # the database and matching work is handed to worker threads
+    matcher, ai_settings = await run_in_threadpool(_log_context, db)
+
+    status_code, content, new_log = await _prepare_log(request, matcher, ai_settings, db)
+    if new_log is None:
+        return JSONResponse(status_code=status_code, content=content)
+
+    picked = [(request.text, request.matter_id)] if request.matter_id else []
+    content["log_id"], = await run_in_threadpool(_save_logs, db, [new_log], picked)
+    if content.get("refining"):
+        background_tasks.add_task(revision_service.refine_log, new_log.id, request.text, *ai_settings)
+    return content
+
+class LogBatchRequest(BaseModel):
+    entries: List[LogRequest]
+
+@app.post("/api/log/batch")
+async def log_time_batch(request: LogBatchRequest, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
+    """
+    Log many entries at once (e.g. a whole day pasted in).
+    The matter catalog and settings are loaded once, every line is parsed and
+    matched locally in one worker thread, the lines left to the AI are looked up
+    concurrently, and every resolved entry is committed in a single transaction. Each line gets its own result with the
+    status /api/log would have returned, including 409 candidate lists.
+    """
+    matcher, ai_settings = await run_in_threadpool(_log_context, db)
+    prepared = await run_in_threadpool(_prepare_batch_locally, request.entries, matcher, ai_settings, db)
+
+    # Lines the local tiers could not settle wait on the AI together, not one after another
+    ai_slots = asyncio.Semaphore(BATCH_AI_CONCURRENCY)
+
+    async def settle(entry, result, parsed):
+        if result is not None:
+            return result
+        async with ai_slots:
+            return await _prepare_with_ai(entry.text, matcher, ai_settings, parsed)
+
+    outcomes = await asyncio.gather(*(settle(entry, result, parsed)
+                                      for entry, (result, parsed) in zip(request.entries, prepared)))
+
+    results = []
+    new_logs = []
+    picked = []
+    for index, (entry, (status_code, content, new_log)) in enumerate(zip(request.entries, outcomes)):
+        result = {"index": index, "text": entry.text, "status": status_code, **content}
+        if new_log is not None:
+            new_logs.append((new_log, result))
+            if entry.matter_id:
+                picked.append((entry.text, entry.matter_id))
+        results.append(result)
+
+    if new_logs:
+        log_ids = await run_in_threadpool(_save_logs, db, [log for log, _ in new_logs], picked)
+        for log_id, (log, result) in zip(log_ids, new_logs):
+            result["log_id"] = log_id
+            if result.get("refining"):
+                background_tasks.add_task(revision_service.refine_log, log_id, result["text"], *ai_settings)
+
+    return {
+        "logged": len(new_logs),
+        "pending": len(results) - len(new_logs),
+        "results": results
+    }
+
+@app.get("/api/logs/revisions")
+def get_log_revisions(status: str = "pending", db: Session = Depends(database.get_db)):
+    """Changes the background AI check made to speculatively logged entries."""
+    return revision_service.list_revisions(db, status)
+
+def _resolve_revision(revision_id: int, accept: bool, db: Session):
+    try:
+        revision = revision_service.resolve_revision(db, revision_id, accept)
+    except revision_service.RevisionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"message": f"Revision {revision.status}", "id": revision.id, "log_id": revision.log_id}
+
+@app.post("/api/logs/revisions/{revision_id}/accept")
+def accept_log_revision(revision_id: int, db: Session = Depends(database.get_db)):
+    return _resolve_revision(revision_id, True, db)
+
+@app.post("/api/logs/revisions/{revision_id}/revert")
+def revert_log_revision(revision_id: int, db: Session = Depends(database.get_db)):
+    return _resolve_revision(revision_id, False, db)
+
+class LogPreviewRequest(BaseModel):
+    text: str
+    date: Optional[str] = None
+
+_STAGE_NAMES = {
+    nlp_service.STAGE_ID: "id",
+    nlp_service.STAGE_NAME: "name",
+    nlp_service.STAGE_WORDS: "words",
+    nlp_service.STAGE_FUZZY: "fuzzy",
+}
+
+@app.post("/api/log/preview")
+def preview_log(request: LogPreviewRequest, db: Session = Depends(database.get_db)):
+    """
+    Read-only dry run of /api/log for as-you-type feedback: parses duration and
+    date and ranks candidate matters with the cached matcher. Nothing is written
+    and the AI provider is never called, so this is cheap enough to run on
+    debounced keystrokes. Spans are [start, end] character offsets into text.
+    """
+    text = request.text
+    entry = nlp_service.LogEntryParser().parse(text)
+
+    log_date = entry.date
+    if not log_date and request.date:
+        try:
+            log_date = datetime.fromisoformat(request.date)
+        except ValueError:
+            pass
+
+    matcher = catalog_service.get_matcher(db)
+    # Shares the match cache with /api/log, so submitting a previewed entry is a cache hit
+    stage, scored = catalog_service.match_scored(matcher, text, top_k=MAX_FUZZY_CANDIDATES) if text.strip() else (None, [])
+    candidates = [
+        {
+            "id": m.id,
+            "name": m.name,
+            "description": m.description or "",
+            "score": score,
+            "spans": catalog_service.match_spans(text, m, stage)
+        }
+        for m, score in scored
+    ]
+
+    date_span = entry.spans["date"]
+    return {
+        "duration": entry.duration,
+        "units": time_service.calculate_units(entry.duration) if entry.duration else 0,
+        "date": log_date.strftime("%Y-%m-%d") if log_date else None,
+        "description": entry.description(candidates[0]["name"] if len(candidates) == 1 else None),
+        "stage": _STAGE_NAMES.get(stage),
+        "matched": len(candidates) == 1,
+        "candidates": candidates,
+        "spans": {
+            "duration": [list(span) for span in entry.spans["duration"]],
+            "date": list(date_span) if date_span else None,
+            "matter": candidates[0]["spans"] if candidates else []
+        }
+    }
+
+@app.get("/api/cache/stats")
+def get_cache_stats(db: Session = Depends(database.get_db)):
+    """Hit/miss counters of the match and AI parse result caches, and the disambiguation memory size."""
+    stats = catalog_service.cache_stats()
+    stats["ai_store"] = ai_cache_service.stats()
+    stats["disambiguation"] = disambiguation_service.stats(db)
+    return stats
+
+@app.get("/api/tags/queue")
+def get_tag_queue_status():
+    """Depth and progress of the background AI tag generation queue."""
+    return tag_queue_service.status()
+
+@app.get("/api/ai/stats")
+def get_ai_stats():
+    """Prompt size and latency of recent AI calls, and the provider circuit breaker state."""
+    stats = ai_service.prompt_stats()
+    stats["circuits"] = ai_service.breaker.status()
+    stats["classifier"] = classifier_service.stats()
+    return stats
 
 @app.delete("/api/logs/{log_id}")
 def delete_log(log_id: int, db: Session = Depends(database.get_db)):
@@ -635,7 +945,7 @@ def merge_logs(request: MergeRequest, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="All logs must belong to the same matter")
 
     # Validation: Same local date
-    dates = set([log.log_date.strftime("%Y-%m-%d") for log in logs])
+    dates = set([log.log_day for log in logs])
     if len(dates) > 1:
         raise HTTPException(status_code=400, detail="All logs must belong to the same date")
 
@@ -783,83 +1093,6 @@ def export_logs(db: Session = Depends(database.get_db)):
 
 @app.get("/api/summary")
 def get_summary(db: Session = Depends(database.get_db)):
-    from sqlalchemy import func
-    from datetime import datetime, timedelta
-
-    # 1. Fetch all matters and logs with join
-    logs = db.query(database.TimeLog).join(database.Matter).all()
-    
-    # 2. Daily, Weekly, and Monthly filters
-    now = datetime.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=now.weekday()) # Monday
-    
-    this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if now.month == 1:
-        last_month_start = now.replace(year=now.year - 1, month=12, day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        last_month_start = now.replace(month=now.month - 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_month_end = this_month_start - timedelta(seconds=1)
-
-    daily_logs = [l for l in logs if l.log_date >= today_start]
-    weekly_logs = [l for l in logs if l.log_date >= week_start]
-    month_logs = [l for l in logs if l.log_date >= this_month_start]
-    prev_month_logs = [l for l in logs if l.log_date >= last_month_start and l.log_date <= last_month_end]
-    
-    # 3. Group by matter
-    matters = db.query(database.Matter).all()
-    matter_summary = {}
-    
-    for m in matters:
-        matter_logs = [l for l in logs if l.matter_id == m.id]
-            
-        matter_summary[m.id] = {
-            "id": m.id,
-            "name": m.name,
-            "external_id": m.external_id,
-            "client_name": m.client_name,
-            "status_flag": m.status_flag or "yellow",
-            "is_closed": getattr(m, 'is_closed', False),
-            "total_minutes": sum(l.duration_minutes for l in matter_logs),
-            "total_units": sum(l.units for l in matter_logs),
-            "last_logged_at": max(l.created_at for l in matter_logs).strftime("%Y-%m-%d %H:%M:%S") if matter_logs else None,
-            "records": [
-                {
-                    "id": l.id,
-                    "date": l.log_date.strftime("%Y-%m-%d %H:%M"),
-                    "logged_at": l.created_at.strftime("%Y-%m-%d %H:%M:%S") if l.created_at else None,
-                    "minutes": l.duration_minutes,
-                    "units": l.units,
-                    "description": l.description
-                } for l in sorted(matter_logs, key=lambda x: x.log_date, reverse=True)
-            ]
-        }
-
-    # Sort results: matters with logs first (by last_logged_at), then others
-    def sort_key(m):
-        return (m["last_logged_at"] is not None, m["last_logged_at"])
-
-    return {
-        "by_matter": sorted(matter_summary.values(), key=sort_key, reverse=True),
-        "reports": {
-            "today": {
-                "minutes": sum(l.duration_minutes for l in daily_logs),
-                "units": sum(l.units for l in daily_logs)
-            },
-            "this_week": {
-                "minutes": sum(l.duration_minutes for l in weekly_logs),
-                "units": sum(l.units for l in weekly_logs)
-            },
-            "this_month": {
-                "minutes": sum(l.duration_minutes for l in month_logs),
-                "units": sum(l.units for l in month_logs)
-            },
-            "last_month": {
-                "minutes": sum(l.duration_minutes for l in prev_month_logs),
-                "units": sum(l.units for l in prev_month_logs)
-            }
-        },
-        "grand_total_units": sum(l.units for l in logs)
-    }
+    return summary_service.get_summary(db)
 
 app.mount("/", StaticFiles(directory="frontend", html=True), name="static")
@@ -0,0 +1,166 @@
+"""
+Optional multi-process matching for very large matter catalogs.
+
+The catalog is sharded by matter id across worker processes. Each worker keeps
+its own resident MatterMatcher, so a query only ships the entry text; results
+from all shards are merged in single-process order. The ID, name and word
+stages agree with a single matcher. The fuzzy stage can differ: each shard
+prefilters with its own trigram IDF and keeps its own PREFILTER_CANDIDATES,
+so a large catalog is scored over a different candidate set.
+"""
+import multiprocessing
+import threading
+import weakref
+from collections import namedtuple
+from . import nlp_service
+
+# Below this many matters the in-process matcher is faster than the IPC round trip
+PARALLEL_MIN_MATTERS = 20000
+
+# Picklable copy of the matter fields the matcher needs
+ShardMatter = namedtuple("ShardMatter", ["id", "name", "external_id", "description", "ai_tags"])
+
+
+def _to_shard_matter(m):
+    return ShardMatter(m.id, m.name, m.external_id, m.description, getattr(m, "ai_tags", None))
+
+
+def _shard_main(conn):
+    """Worker loop: owns one shard of the catalog and answers match requests."""
+    matcher = nlp_service.MatterMatcher()
+    while True:
+        op, payload = conn.recv()
+        if op == "match":
+            text, threshold, top_k = payload
+            stage, scored = matcher.match_scored(text, threshold, top_k)
+            conn.send((stage, [(m.id, score) for m, score in scored]))
+        elif op == "shortlist":
+            text, limit = payload
+            conn.send([(m.id, rank) for m, rank in matcher.shortlist_ranked(text, limit)])
+        elif op == "load":
+            for m in payload:
+                matcher.add(m)
+        elif op == "update":
+            matcher.update(payload)
+        elif op == "remove":
+            matcher.remove(payload)
+        elif op == "close":
+            break
+    conn.close()
+
+
+def _stop_shards(shards):
+    """Stop the worker processes; run by close() or once the pool is garbage collected."""
+    for worker, conn in shards:
+        try:
+            conn.send(("close", None))
+            conn.close()
+        except OSError:
+            pass
+        worker.join(timeout=5)
+    shards.clear()
+
+
+class ShardedMatterMatcher:
+    """
+    Drop-in replacement for nlp_service.MatterMatcher that fans every query out
+    to `processes` worker processes and merges their top-k results.
+
+    The workers stop on close(), or when the last reference to the pool goes
+    away, so a replaced pool keeps serving the requests still holding it.
+    """
+
+    def __init__(self, matters, processes):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._shards = []
+        self._finalizer = weakref.finalize(self, _stop_shards, self._shards)
+        ctx = multiprocessing.get_context("spawn")
+        for _ in range(processes):
+            parent_conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(target=_shard_main, args=(child_conn,), daemon=True)
+            worker.start()
+            child_conn.close()
+            self._shards.append((worker, parent_conn))
+
+        batches = [[] for _ in self._shards]
+        for m in matters:
+            self._records[m.id] = m
+            batches[self._shard_of(m.id)].append(_to_shard_matter(m))
+        for (_worker, conn), batch in zip(self._shards, batches):
+            conn.send(("load", batch))
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def matters(self):
+        """Live matters in catalog order."""
+        return [self._records[matter_id] for matter_id in sorted(self._records)]
+
+    def _shard_of(self, matter_id):
+        return matter_id % len(self._shards)
+
+    # --- Index maintenance (forwarded to the owning shard) ---
+
+    def add(self, matter):
+        self.update(matter)
+
+    def update(self, matter):
+        with self._lock:
+            self._records[matter.id] = matter
+            self._shards[self._shard_of(matter.id)][1].send(("update", _to_shard_matter(matter)))
+
+    def remove(self, matter_id):
+        with self._lock:
+            if self._records.pop(matter_id, None) is not None:
+                self._shards[self._shard_of(matter_id)][1].send(("remove", matter_id))
+
+    # --- Matching ---
+
+    def match(self, text, threshold=60, top_k=None):
+        _stage, scored = self.match_scored(text, threshold, top_k)
+        return [m for m, _score in scored]
+
+    def match_scored(self, text, threshold=60, top_k=None):
+        with self._lock:
+            if not self._shards:
+                raise RuntimeError("Matcher pool is closed")
+            for _worker, conn in self._shards:
+                conn.send(("match", (text, threshold, top_k)))
+            results = [conn.recv() for _worker, conn in self._shards]
+
+            # The highest-priority stage that matched anywhere wins, as in a single matcher
+            stages = [stage for stage, _scored in results if stage is not None]
+            if not stages:
+                return None, []
+            stage = min(stages)
+            hits = [hit for shard_stage, scored in results if shard_stage == stage for hit in scored]
+
+            if stage == nlp_service.STAGE_FUZZY:
+                hits.sort(key=lambda hit: (-hit[1], hit[0]))
+                if top_k is not None:
+                    hits = hits[:top_k]
+            else:
+                hits.sort(key=lambda hit: hit[0])
+                if stage == nlp_service.STAGE_ID:
+                    hits = hits[:1]
+            return stage, [(self._records[matter_id], score) for matter_id, score in hits]
+
+    def shortlist(self, text, limit):
+        """
+        Merged shortlists of all shards. Each shard ranks its own exact-stage hits
+        first, so below the best candidate the order can differ from a single matcher.
+        """
+        with self._lock:
+            if not self._shards:
+                raise RuntimeError("Matcher pool is closed")
+            for _worker, conn in self._shards:
+                conn.send(("shortlist", (text, limit)))
+            ranked = [hit for _worker, conn in self._shards for hit in conn.recv()]
+            ranked.sort(key=lambda hit: (hit[1], hit[0]))
+            return [self._records[matter_id] for matter_id, _rank in ranked[:limit]]
+
+    def close(self):
+        with self._lock:
+            self._finalizer()
@@ -0,0 +1,64 @@
+import sqlite3
+import os
+
+DB_PATH = "./timesheet.db"
+
+# Same names as the Index objects on database.TimeLog, so fresh and migrated databases match
+INDEXES = {
+    "ix_time_logs_log_date": "CREATE INDEX IF NOT EXISTS ix_time_logs_log_date ON time_logs (log_date)",
+    "ix_time_logs_matter_id_log_date": "CREATE INDEX IF NOT EXISTS ix_time_logs_matter_id_log_date ON time_logs (matter_id, log_date)",
+    "ix_time_logs_log_day": "CREATE INDEX IF NOT EXISTS ix_time_logs_log_day ON time_logs (log_day)",
+    "ix_time_logs_matter_id_created_at": "CREATE INDEX IF NOT EXISTS ix_time_logs_matter_id_created_at "
+                                         "ON time_logs (matter_id, created_at)",
+}
+
+# Superseded: summed minutes and units per matter when totals were read from time_logs
+OBSOLETE_INDEXES = ["ix_time_logs_matter_totals"]
+
+# log_date is stored as "YYYY-MM-DD HH:MM:SS[.ffffff]"
+BACKFILL_SQL = (
+    "UPDATE time_logs SET log_day = CAST(strftime('%Y%m%d', log_date) AS INTEGER) "
+    "WHERE log_day IS NULL AND log_date IS NOT NULL"
+)
+
+
+def add_log_day_column(db_path: str = DB_PATH):
+    """Adds the log_day column and the log_date indexes to time_logs, and fills log_day for old rows."""
+    if not os.path.exists(db_path):
+        print("Database file not found. Skipping log_day migration.")
+        return
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(time_logs)")
+        columns = [info[1] for info in cursor.fetchall()]
+        if not columns:
+            print("time_logs table not found. Skipping log_day migration.")
+            return
+
+        if "log_day" not in columns:
+            print("Adding 'log_day' column to time_logs table...")
+            cursor.execute("ALTER TABLE time_logs ADD COLUMN log_day INTEGER")
+
+        for sql in INDEXES.values():
+            cursor.execute(sql)
+        for name in OBSOLETE_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+        # Rows written before the column existed (cheap when there are none: uses ix_time_logs_log_day)
+        cursor.execute(BACKFILL_SQL)
+        if cursor.rowcount:
+            print(f"Filled log_day for {cursor.rowcount} time logs.")
+        conn.commit()
+
+    except sqlite3.Error as e:
+        print(f"Error migrating database (log_day): {e}")
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    add_log_day_column()
@@ -1,187 +1,639 @@
 from thefuzz import process, fuzz
+from thefuzz import utils as fuzz_utils
+from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+import numpy as np
 import re
+import threading
+
+_WORD_RE = re.compile(r'\w+')
+
+
+class _AhoCorasick:
+    """
+    Multi-pattern substring automaton.
+    find_all() reports every keyword contained in a text with a single scan,
+    so the cost depends on the text length rather than the number of keywords.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for kw in keywords:
+            if kw:
+                self._insert(kw)
+        self._link()
+
+    def _insert(self, kw):
+        node = 0
+        for ch in kw:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = (kw,)
+
+    def _link(self):
+        from collections import deque
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+# Character histogram buckets used to bound partial_ratio before computing it
+_CHAR_BUCKETS = 128
+
+
+def _char_histogram(s):
+    codes = np.frombuffer(s.encode("utf-32-le"), dtype=np.uint32)
+    return np.bincount(codes % _CHAR_BUCKETS, minlength=_CHAR_BUCKETS).astype(np.int32)
+
+
+# Catalogs larger than this only fuzzy-score the matters sharing the most
+# character trigrams with the entry
+PREFILTER_CANDIDATES = 200
+# Upper bound on trigram postings visited per query, rarest trigrams first
+_TRIGRAM_POSTING_BUDGET = 50000
+
+
+def _trigrams(s):
+    """Character trigrams of the lowered, space-padded text (works for unspaced Thai too)."""
+    s = " " + " ".join(s.lower().split()) + " "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _prefilter_text(m):
+    return " ".join(filter(None, (m.name, m.description, getattr(m, "ai_tags", None))))
+
+
+# Matching stages, in priority order
+STAGE_ID = 0        # explicit external ID
+STAGE_NAME = 1      # matter name contained in the entry
+STAGE_WORDS = 1.5   # every word of the matter name contained in the entry
+STAGE_FUZZY = 2     # fuzzy score above threshold
+
+
+def _is_short_word(word):
+    """Short ASCII words must appear as whole words; anything else (Thai, longer words) as a substring."""
+    return word.isalnum() and len(word) <= 3 and word.isascii()
+
+
+class MatterMatcher:
+    """
+    Precompiled index over a matter catalog.
+    Build it once from the matters and call match() for every entry; results are
+    identical to scanning the list with the staged rules of match_matter().
+    The index is kept up to date with add(), update() and remove().
+    matters: objects with 'id', 'name', 'description' and 'external_id' attributes.
+    """
+
+    def __init__(self, matters=()):
+        self._lock = threading.RLock()
+        # Slot per matter, in catalog order. Removed matters leave a None slot.
+        self._matters = []
+        self._slot_of = {}
+        # Stage 0: word-like IDs are looked up against the tokens of the text,
+        # anything else (e.g. "A-12") goes through one combined alternation.
+        self._word_ids = {}
+        self._other_ids = {}
+        # Stage 1: lowered names fed to a multi-pattern automaton
+        self._names = {}
+        self._empty_names = set()
+        # Stage 1.5: posting lists from name word -> slots, plus the number of
+        # distinct words each name needs to be fully contained
+        self._short_words = {}
+        self._long_words = {}
+        self._word_arrays = {}
+        self._required = np.zeros(0, dtype=np.int64)
+        # Stage 2: "name description" choice strings, their thefuzz-processed
+        # form for token_set_ratio, and a character histogram per row for the
+        # partial_ratio upper bound
+        self._search_strs = []
+        self._processed_strs = []
+        self._char_counts = np.zeros((0, _CHAR_BUCKETS), dtype=np.int32)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        # Stage 2 prefilter: trigram of name/description/ai_tags -> slots
+        self._trigram_postings = {}
+        self._trigram_arrays = {}
+
+        self._dirty = True
+        for m in matters:
+            self._insert(m)
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    @property
+    def matters(self):
+        """Live matters in catalog order."""
+        return [m for m in self._matters if m is not None]
+
+    # --- Index maintenance ---
+
+    def add(self, matter):
+        with self._lock:
+            self._insert(matter)
+
+    def update(self, matter):
+        """Re-index a matter in place (keeps its catalog position), or add it if unknown."""
+        with self._lock:
+            slot = self._slot_of.get(matter.id)
+            if slot is None:
+                self._insert(matter)
+            else:
+                self._unindex(slot)
+                self._index(slot, matter)
+
+    def remove(self, matter_id):
+        with self._lock:
+            slot = self._slot_of.pop(matter_id, None)
+            if slot is not None:
+                self._unindex(slot)
+                self._matters[slot] = None
+                self._required[slot] = 0
+                self._search_strs[slot] = None
+                self._processed_strs[slot] = None
+                self._alive[slot] = False
+
+    def _insert(self, matter):
+        slot = len(self._matters)
+        self._matters.append(None)
+        self._search_strs.append(None)
+        self._processed_strs.append(None)
+        if slot >= len(self._alive):
+            capacity = max(64, 2 * len(self._alive))
+            self._char_counts = np.resize(self._char_counts, (capacity, _CHAR_BUCKETS))
+            self._lengths = np.resize(self._lengths, capacity)
+            self._required = np.resize(self._required, capacity)
+            self._alive = np.resize(self._alive, capacity)
+            self._required[slot:] = 0
+            self._alive[slot:] = False
+        self._slot_of[matter.id] = slot
+        self._index(slot, matter)
+
+    def _index(self, slot, m):
+        self._matters[slot] = m
+
+        if m.external_id:
+            postings = self._word_ids if _WORD_RE.fullmatch(m.external_id) else self._other_ids
+            self._add_posting(postings, m.external_id, slot)
+
+        name_lower = (m.name or "").lower()
+        if name_lower:
+            self._add_posting(self._names, name_lower, slot)
+        elif m.name is not None:
+            self._empty_names.add(slot)
+
+        name_words = set(_WORD_RE.findall(name_lower))
+        for word in name_words:
+            self._add_posting(self._short_words if _is_short_word(word) else self._long_words, word, slot)
+        self._required[slot] = len(name_words)
+
+        search_str = f"{m.name} {m.description}"
+        self._search_strs[slot] = search_str
+        self._processed_strs[slot] = fuzz_utils.full_process(search_str, force_ascii=True)
+        self._char_counts[slot] = _char_histogram(search_str)
+        self._lengths[slot] = len(search_str)
+        self._alive[slot] = True
+
+        for gram in _trigrams(_prefilter_text(m)):
+            self._trigram_postings.setdefault(gram, []).append(slot)
+            self._trigram_arrays.pop(gram, None)
+
+    def _unindex(self, slot):
+        m = self._matters[slot]
+
+        if m.external_id:
+            postings = self._word_ids if _WORD_RE.fullmatch(m.external_id) else self._other_ids
+            self._remove_posting(postings, m.external_id, slot)
+
+        name_lower = (m.name or "").lower()
+        if name_lower:
+            self._remove_posting(self._names, name_lower, slot)
+        self._empty_names.discard(slot)
+
+        for word in set(_WORD_RE.findall(name_lower)):
+            self._remove_posting(self._short_words if _is_short_word(word) else self._long_words, word, slot)
+
+        for gram in _trigrams(_prefilter_text(m)):
+            postings = self._trigram_postings[gram]
+            postings.remove(slot)
+            if not postings:
+                del self._trigram_postings[gram]
+            self._trigram_arrays.pop(gram, None)
+
+    def _add_posting(self, postings, key, slot):
+        if key not in postings:
+            postings[key] = set()
+            self._dirty = True
+        postings[key].add(slot)
+        self._word_arrays.pop(key, None)
+
+    def _remove_posting(self, postings, key, slot):
+        slots = postings.get(key)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del postings[key]
+                self._dirty = True
+            self._word_arrays.pop(key, None)
+
+    def _word_array(self, postings, word):
+        array = self._word_arrays.get(word)
+        if array is None:
+            array = np.fromiter(postings[word], dtype=np.int64, count=len(postings[word]))
+            self._word_arrays[word] = array
+        return array
+
+    def _compile(self):
+        """Rebuild the automata and the ID alternation after the key sets changed."""
+        self._other_id_patterns = {
+            ext_id: re.compile(r'\b' + re.escape(ext_id) + r'\b') for ext_id in self._other_ids
+        }
+        self._other_ids_gate = None
+        if self._other_ids:
+            alternation = '|'.join(re.escape(ext_id) for ext_id in sorted(self._other_ids, key=len, reverse=True))
+            self._other_ids_gate = re.compile(r'\b(?:' + alternation + r')\b')
+        self._name_automaton = _AhoCorasick(self._names)
+        self._word_automaton = _AhoCorasick(self._long_words)
+        self._dirty = False
+
+    # --- Matching ---
+
+    def match(self, text, threshold=60, top_k=None):
+        """
+        Find the best matching matters for the given text.
+        top_k: keep only the k best fuzzy (Stage 2) candidates
+        Returns: list of matter objects [best_match, second_best, ...], empty list if none
+        """
+        _stage, scored = self.match_scored(text, threshold, top_k)
+        return [m for m, _score in scored]
+
+    def shortlist(self, text, limit):
+        """
+        Up to `limit` plausible matters for the text, best first, e.g. to keep an
+        AI prompt small: the exact stage hits (ID, name, name words) followed by
+        the closest fuzzy candidates, with no score threshold.
+        """
+        return [m for m, _rank in self.shortlist_ranked(text, limit)]
+
+    def shortlist_ranked(self, text, limit):
+        """shortlist() as [(matter, rank)]; rank is (stage, -score) and sorts best first."""
+        with self._lock:
+            stage, scored = self.match_scored(text, top_k=limit)
+            ranked = []
+            if stage is not None and stage != STAGE_FUZZY:
+                ranked = [(m, (stage, 0)) for m, _score in scored[:limit]]
+            if len(ranked) < limit and self._slot_of:
+                seen = {m.id for m, _rank in ranked}
+                for m, score in self._fuzzy_match(text, 1, limit + len(ranked)):
+                    if m.id not in seen:
+                        ranked.append((m, (STAGE_FUZZY, -score)))
+            return ranked[:limit]
+
+    def match_scored(self, text, threshold=60, top_k=None):
+        """
+        Same as match(), but also reports which stage produced the result.
+        Returns: (stage, [(matter, score), ...]) where stage is one of the STAGE_*
+        constants (None when nothing matched) and score is only set for STAGE_FUZZY.
+        """
+        with self._lock:
+            if not self._slot_of:
+                return None, []
+            if self._dirty:
+                self._compile()
+
+            # Stage 0: Explicit ID Match (Top Priority)
+            hits = []
+            for token in set(_WORD_RE.findall(text)):
+                hits.extend(self._word_ids.get(token, ()))
+            if self._other_ids_gate is not None and self._other_ids_gate.search(text):
+                for ext_id, pattern in self._other_id_patterns.items():
+                    if pattern.search(text):
+                        hits.extend(self._other_ids[ext_id])
+            if hits:
+                return STAGE_ID, [(self._matters[min(hits)], None)]
+
+            # Stage 1: Exact Substring Match (Priority)
+            text_lower = text.lower()
+            slots = set(self._empty_names)
+            for name in self._name_automaton.find_all(text_lower):
+                slots.update(self._names[name])
+            if slots:
+                return STAGE_NAME, [(self._matters[slot], None) for slot in sorted(slots)]
+
+            # Stage 1.5: Word Set Containment
+            # Only the postings of words present in the text are visited: short
+            # English words must be whole words, Thai or longer words substrings.
+            arrays = [
+                self._word_array(self._short_words, word)
+                for word in set(_WORD_RE.findall(text_lower)) if word in self._short_words
+            ]
+            arrays.extend(
+                self._word_array(self._long_words, word) for word in self._word_automaton.find_all(text_lower)
+            )
+            if arrays:
+                found = np.bincount(np.concatenate(arrays), minlength=len(self._matters))
+                required = self._required[:len(self._matters)]
+                slots = np.flatnonzero((found == required) & (required > 0))
+                if len(slots):
+                    return STAGE_WORDS, [(self._matters[slot], None) for slot in slots]
+
+            # Stage 2: Fuzzy Match (Fallback)
+            scored = self._fuzzy_match(text, threshold, top_k)
+            return (STAGE_FUZZY if scored else None), scored
+
+    def _fuzzy_match(self, text, threshold, top_k):
+        """
+        Score every matter at once with rapidfuzz's batched cdist.
+        Scores equal thefuzz's max(token_set_ratio, partial_ratio) per matter;
+        partial_ratio is only computed where a character-overlap bound says it
+        could still reach the threshold and beat the token set score.
+        """
+        if len(self._slot_of) > PREFILTER_CANDIDATES:
+            slots = self._trigram_candidates(text, PREFILTER_CANDIDATES)
+        else:
+            slots = np.flatnonzero(self._alive[:len(self._matters)])
+        if not len(slots):
+            return []
+        # thefuzz rounds to int, so anything below threshold - 0.5 can never pass
+        cutoff = threshold - 0.5
+
+        query = fuzz_utils.full_process(text, force_ascii=True)
+        scores = rf_process.cdist(
+            [query], [self._processed_strs[slot] for slot in slots],
+            scorer=rf_fuzz.token_set_ratio, score_cutoff=cutoff, dtype=np.float64,
+        )[0]
+
+        # partial_ratio <= 200c / (ls + c), where ls is the shorter length and c
+        # the number of characters the two strings can share at most.
+        shorter = np.minimum(self._lengths[slots], len(text))
+        common = np.minimum(self._char_counts[slots], _char_histogram(text)).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bound = np.where(shorter > 0, 200.0 * common / (shorter + common), 100.0)
+        needs_partial = (bound >= cutoff) & (bound > scores)
+        if needs_partial.any():
+            partial_slots = slots[needs_partial]
+            partial = rf_process.cdist(
+                [text], [self._search_strs[slot] for slot in partial_slots],
+                scorer=rf_fuzz.partial_ratio, score_cutoff=cutoff, dtype=np.float64,
+            )[0]
+            scores[needs_partial] = np.maximum(scores[needs_partial], partial)
+
+        scores = np.rint(scores).astype(np.int64)
+        passing = scores >= threshold
+        slots, scores = slots[passing], scores[passing]
+
+        # Sort by score desc, ties in catalog order
+        if top_k is not None and len(slots) > top_k:
+            keys = scores * (len(self._matters) + 1) + (len(self._matters) - slots)
+            keep = np.argpartition(-keys, top_k - 1)[:top_k]
+            slots, scores = slots[keep], scores[keep]
+        order = np.lexsort((slots, -scores))
+
+        return [(self._matters[slot], int(score)) for slot, score in zip(slots[order], scores[order])]
+
+    def _trigram_candidates(self, text, limit):
+        """
+        Pick the `limit` matters sharing the most (idf-weighted) character trigrams
+        with the text. Postings are visited rarest first within a fixed budget, so
+        the cost stays flat as the catalog grows.
+        """
+        postings = sorted(
+            (len(self._trigram_postings[gram]), gram)
+            for gram in _trigrams(text) if gram in self._trigram_postings
+        )
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+
+        arrays, weights = [], []
+        budget = _TRIGRAM_POSTING_BUDGET
+        for df, gram in postings:
+            if arrays and df > budget:
+                break
+            array = self._trigram_arrays.get(gram)
+            if array is None:
+                array = np.array(self._trigram_postings[gram], dtype=np.int64)
+                self._trigram_arrays[gram] = array
+            arrays.append(array)
+            weights.append(np.log1p(len(self._slot_of) / df))
+            budget -= df
+
+        lengths = [len(array) for array in arrays]
+        shared = np.bincount(
+            np.concatenate(arrays), weights=np.repeat(weights, lengths), minlength=len(self._matters)
+        )
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-shared[candidates], limit - 1)[:limit]]
+        return candidates
+
 
 def match_matter(text, matters, threshold=60):
     """
     Find the best matching matter for the given text.
     matters: list of dicts or objects with 'name' and 'description' attributes.
-    matters: list of dicts or objects with 'name' and 'description' attributes.
     Returns: list of matter objects [best_match, second_best, ...], empty list if none
+
+    Builds a throwaway MatterMatcher; callers matching many entries against the
+    same catalog should keep a MatterMatcher (see catalog_service) instead.
     """
-    candidates = []
     if not matters:
         return []
-        
-    # Stage 0: Explicit ID Match (Top Priority)
-    # Check if any matter's external_id is present as a distinct word in the text
-    # e.g. "matter id 1404" -> matches matter with external_id="1404"
-    for m in matters:
-        if m.external_id:
-            # Look for exact word match of the ID
-            if re.search(r'\b' + re.escape(m.external_id) + r'\b', text):
-                return [m]
+    return MatterMatcher(matters).match(text, threshold)
 
-    # Stage 1: Exact Substring Match (Priority)
-    # Check if any matter name is directly contained in the text
-    # This fixes issues where a short matter name (e.g. "Review MOU") is part of a longer sentence
-    text_lower = text.lower()
-    for m in matters:
-        if m.name.lower() in text_lower:
-            candidates.append(m)
-            
-    if candidates:
-        return candidates
-            
-    # Stage 1.5: Word Set Containment
-    # Improved: Check if each word in matter name exists as a substring or full word in input
-    text_words = set(re.findall(r'\w+', text_lower))
-    for m in matters:
-        name_words = re.findall(r'\w+', m.name.lower())
-        if not name_words:
-            continue
-            
-        all_found = True
-        for word in name_words:
-            # For short English words, require word boundary or exact match in text_words
-            if word.isalnum() and len(word) <= 3 and word.isascii():
-                if word not in text_words:
-                    all_found = False
-                    break
-            else:
-                # For Thai or longer English, check as substring
-                if word not in text_lower:
-                    all_found = False
-                    break
-        
-        if all_found:
-            # print(f"DEBUG: Stage 1.5 Match: {m.name}")
-            candidates.append(m)
-
-    if candidates:
-        return candidates
-            
-    # Stage 2: Fuzzy Match (Fallback)
-    # Collect all matches above threshold
-    fuzzy_candidates = []
-    
-    for m in matters:
-        search_str = f"{m.name} {m.description}"
-        score_set = fuzz.token_set_ratio(text, search_str)
-        score_partial = fuzz.partial_ratio(text, search_str)
-        max_score = max(score_set, score_partial)
-        
-        if max_score >= threshold:
-            fuzzy_candidates.append((m, max_score))
-            
-    # Sort by score desc
-    fuzzy_candidates.sort(key=lambda x: x[1], reverse=True)
-    
-    return [c[0] for c in fuzzy_candidates]
 
-def extract_duration(text):
+def match_spans(text, matter, stage):
     """
-    Extract duration in minutes from text.
-    Supports formats: "1h", "1.5 hr", "30 mins", "30m", "1 hour"
-    Returns: integer minutes
+    Character ranges of `text` that made `matter` match at the given stage
+    (as reported by MatterMatcher.match_scored), for highlighting.
+    Returns a list of (start, end); empty when nothing can be pointed at.
     """
-    text = text.lower()
-    
+    if stage == STAGE_ID:
+        if matter.external_id:
+            found = re.search(r'\b' + re.escape(matter.external_id) + r'\b', text)
+            if found:
+                return [found.span()]
+        return []
+
+    text_lower = text.lower()
+    if len(text_lower) != len(text):
+        # Offsets in the lowercased text would not line up with the original
+        return []
+    name = (matter.name or "").lower()
+
+    if stage == STAGE_NAME:
+        start = text_lower.find(name)
+        return [(start, start + len(name))] if name and start >= 0 else []
+
+    if stage == STAGE_WORDS:
+        spans = []
+        for word in dict.fromkeys(_WORD_RE.findall(name)):
+            if _is_short_word(word):
+                found = re.search(r'\b' + re.escape(word) + r'\b', text_lower)
+                if found:
+                    spans.append(found.span())
+            else:
+                start = text_lower.find(word)
+                if start >= 0:
+                    spans.append((start, start + len(word)))
+        return sorted(spans)
+
+    if stage == STAGE_FUZZY and name:
+        # Words of the entry that also occur in the matter name, else the best aligned substring
+        name_words = set(_WORD_RE.findall(name))
+        spans = [w.span() for w in _WORD_RE.finditer(text_lower) if w.group() in name_words]
+        if spans:
+            return spans
+        alignment = rf_fuzz.partial_ratio_alignment(name, text_lower)
+        if alignment and alignment.dest_end > alignment.dest_start:
+            return [(alignment.dest_start, alignment.dest_end)]
+    return []
+
+# --- Log entry parsing ---
+# Patterns are compiled once at import; the extract_* helpers and LogEntryParser share them.
+
+# Matches: 1.5h, 1 h, 1 hour, 1 hours
+_HOURS_RE = re.compile(r'(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours)')
+# Matches: 30m, 30 min, 30 mins, 30 minutes
+_MINUTES_RE = re.compile(r'(\d+)\s*(m|min|mins|minute|minutes)')
+
+_MONTHS = {
+    'jan': 1, 'january': 1,
+    'feb': 2, 'february': 2,
+    'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4,
+    'may': 5,
+    'jun': 6, 'june': 6,
+    'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8,
+    'sep': 9, 'september': 9,
+    'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11,
+    'dec': 12, 'december': 12
+}
+# "16 Feb 2026" or "16 Feb"
+_DATE_MONTH_RE = re.compile(rf'(\d{{1,2}})\s*({"|".join(_MONTHS)})\s*(\d{{4}})?')
+# DD/MM/YYYY or DD-MM-YYYY
+_DATE_FULL_RE = re.compile(r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})')
+# DD/MM or DD-MM, only accepted after a keyword that implies a date
+_DATE_SHORT_RE = re.compile(r'\b(\d{1,2})[/\-](\d{1,2})\b')
+_DATE_CONTEXT_RE = re.compile(r'\bon\b|\bdate\b|\bdated\b|\bat\b')
+
+# Optional leading "for", duration number, optional space, unit
+_DURATION_PHRASE_RE = re.compile(
+    r'(?:\bfor\b\s*)?(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours|m|min|mins|minute|minutes)\b', re.IGNORECASE
+)
+_LEADING_PUNCT_RE = re.compile(r'^[\s,\.\-]+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s,\.\-]+$')
+_MULTI_SPACE_RE = re.compile(r'\s{2,}')
+
+
+def _duration_of(text_lower):
+    """Returns (minutes, [spans of the hour/minute matches])."""
     total_minutes = 0
-    
-    # Regex for hours
-    # Matches: 1.5h, 1 h, 1 hour, 1 hours
-    hours_match = re.search(r'(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours)', text)
+    spans = []
+
+    hours_match = _HOURS_RE.search(text_lower)
     if hours_match:
-        hours = float(hours_match.group(1))
-        total_minutes += int(hours * 60)
-        
-    # Regex for minutes
-    # Matches: 30m, 30 min, 30 mins, 30 minutes
-    minutes_match = re.search(r'(\d+)\s*(m|min|mins|minute|minutes)', text)
+        total_minutes += int(float(hours_match.group(1)) * 60)
+        spans.append(hours_match.span())
+
+    minutes_match = _MINUTES_RE.search(text_lower)
     if minutes_match:
-        minutes = int(minutes_match.group(1))
-        total_minutes += minutes
-        
-    return total_minutes
+        total_minutes += int(minutes_match.group(1))
+        spans.append(minutes_match.span())
 
-def extract_date(text):
-    """
-    Extract date from text.
-    Supports formats:
-    - 16 Feb 2026
-    - 16/02/2026
-    - 16-02-2026
-    - 16 Feb (assumes current year)
-    Returns: datetime object or None
-    """
+    return total_minutes, spans
+
+
+def _date_of(text_lower, now):
+    """Returns (datetime or None, span of the date text or None)."""
     from datetime import datetime
-    text = text.lower()
-    now = datetime.now()
 
     # 1. Format: DD MMM YYYY or DD MMM
-    months = {
-        'jan': 1, 'january': 1,
-        'feb': 2, 'february': 2,
-        'mar': 3, 'march': 3,
-        'apr': 4, 'april': 4,
-        'may': 5,
-        'jun': 6, 'june': 6,
-        'jul': 7, 'july': 7,
-        'aug': 8, 'august': 8,
-        'sep': 9, 'september': 9,
-        'oct': 10, 'october': 10,
-        'nov': 11, 'november': 11,
-        'dec': 12, 'december': 12
-    }
-    
-    month_pattern = '|'.join(months.keys())
-    # Match "16 Feb 2026" or "16 Feb"
-    pattern1 = rf'(\d{{1,2}})\s*({month_pattern})\s*(\d{{4}})?'
-    match1 = re.search(pattern1, text)
+    match1 = _DATE_MONTH_RE.search(text_lower)
     if match1:
         day = int(match1.group(1))
-        month_str = match1.group(2)
-        month = months[month_str]
+        month = _MONTHS[match1.group(2)]
         year = int(match1.group(3)) if match1.group(3) else now.year
         try:
-            return datetime(year, month, day)
+            return datetime(year, month, day), match1.span()
         except ValueError:
             pass
 
     # 2. Format: DD/MM/YYYY or DD-MM-YYYY
-    pattern2 = r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})'
-    match2 = re.search(pattern2, text)
+    match2 = _DATE_FULL_RE.search(text_lower)
     if match2:
-        day = int(match2.group(1))
-        month = int(match2.group(2))
-        year = int(match2.group(3))
         try:
-            return datetime(year, month, day)
+            return datetime(int(match2.group(3)), int(match2.group(2)), int(match2.group(1))), match2.span()
         except ValueError:
             pass
-            
+
     # 3. Format: DD/MM or DD-MM (assumes current year)
     # Refined: Look for date context to avoid matching "Matter 14/04"
     # and ensures it's not part of a duration like "14/04 for 2h"
-    pattern3 = r'\b(\d{1,2})[/\-](\d{1,2})\b'
-    match3 = re.search(pattern3, text)
+    match3 = _DATE_SHORT_RE.search(text_lower)
     if match3:
-        # Context keywords that strongly imply a date
-        context_keywords = [r'\bon\b', r'\bdate\b', r'\bdated\b', r'\bat\b']
-        # Check if any context keyword appears BEFORE the match
-        text_before = text[:match3.start()]
-        has_context = any(re.search(kw, text_before) for kw in context_keywords)
-        
+        # Context keyword must appear BEFORE the match
+        has_context = _DATE_CONTEXT_RE.search(text_lower, 0, match3.start()) is not None
+
         day = int(match3.group(1))
         month = int(match3.group(2))
-        year = now.year
         try:
             if 1 <= month <= 12 and 1 <= day <= 31 and has_context:
-                return datetime(year, month, day)
+                return datetime(now.year, month, day), match3.span()
         except ValueError:
             pass
 
-    return None
+    return None, None
+
+
+def extract_duration(text):
+    """
+    Extract duration in minutes from text.
+    Supports formats: "1h", "1.5 hr", "30 mins", "30m", "1 hour"
+    Returns: integer minutes
+    """
+    return _duration_of(text.lower())[0]
+
+def extract_date(text):
+    """
+    Extract date from text.
+    Supports formats:
+    - 16 Feb 2026
+    - 16/02/2026
+    - 16-02-2026
+    - 16 Feb (assumes current year)
+    Returns: datetime object or None
+    """
+    from datetime import datetime
+    return _date_of(text.lower(), datetime.now())[0]
 
 def clean_description(text, matter_name=None):
     """
@@ -196,23 +648,60 @@ def clean_description(text, matter_name=None):
         if clean_desc.lower().startswith(prefix.lower()):
             clean_desc = clean_desc[len(prefix):].strip()
 
-    # 2. Strip duration text using regex variations
-    # This removes things like "for 1.5 hours", "1.5h", "30 mins", etc.
-    # Optional leading "for", optional leading commas/hyphens, duration number, optional space, unit
-    duration_pattern = r'(?:\bfor\b\s*)?(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours|m|min|mins|minute|minutes)\b'
-    
-    # Replace the duration phrase with an empty string
-    clean_desc = re.sub(duration_pattern, '', clean_desc, flags=re.IGNORECASE)
+    # 2. Strip duration text, e.g. "for 1.5 hours", "1.5h", "30 mins"
+    clean_desc = _DURATION_PHRASE_RE.sub('', clean_desc)
 
     # 3. Clean up loose/dangling punctuation that might be left behind or was typed by the user
     # E.g. ".., Update backend" -> "Update backend"
-    # Remove leading non-alphanumeric chars (keep some exceptions like quotes/brackets if needed, but safer to strip common symbols)
-    clean_desc = re.sub(r'^[\s,\.\-]+', '', clean_desc)
-    
-    # Remove trailing non-alphanumeric chars
-    clean_desc = re.sub(r'[\s,\.\-]+$', '', clean_desc)
+    clean_desc = _LEADING_PUNCT_RE.sub('', clean_desc)
+    clean_desc = _TRAILING_PUNCT_RE.sub('', clean_desc)
     
     # Clean up double spaces that might result from stripping text from the middle
-    clean_desc = re.sub(r'\s{2,}', ' ', clean_desc)
+    clean_desc = _MULTI_SPACE_RE.sub(' ', clean_desc)
     
     return clean_desc.strip()
+
+
+class ParsedEntry:
+    """
+    Result of LogEntryParser.parse().
+    duration: minutes (0 if none), date: datetime or None,
+    spans: {"duration": [(start, end), ...], "date": (start, end) or None} - the
+    character ranges of the text that were read as duration and date. Spans are
+    empty when lowercasing changes the text length (e.g. "İ"), as they could not
+    be mapped back onto the original text.
+    """
+    __slots__ = ("text", "duration", "date", "spans", "_descriptions")
+
+    def __init__(self, text, duration, date, spans):
+        self.text = text
+        self.duration = duration
+        self.date = date
+        self.spans = spans
+        self._descriptions = {}
+
+    def description(self, matter_name=None):
+        """Cleaned description, as clean_description(text, matter_name)."""
+        if matter_name not in self._descriptions:
+            self._descriptions[matter_name] = clean_description(self.text, matter_name)
+        return self._descriptions[matter_name]
+
+
+class LogEntryParser:
+    """
+    Parses a time entry in one go: the text is lowercased once and scanned with
+    the precompiled patterns, giving the same duration, date and description as
+    extract_duration(), extract_date() and clean_description().
+    """
+
+    def parse(self, text, now=None):
+        from datetime import datetime
+        text_lower = text.lower()
+        duration, duration_spans = _duration_of(text_lower)
+        date, date_span = _date_of(text_lower, now or datetime.now())
+
+        if len(text_lower) == len(text):
+            spans = {"duration": duration_spans, "date": date_span}
+        else:
+            spans = {"duration": [], "date": None}
+        return ParsedEntry(text, duration, date, spans)
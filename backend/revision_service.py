@@ -0,0 +1,175 @@
+"""
+Speculative logging: /api/log commits a confidently matched entry right away
+and refine_log() asks the AI afterwards. If the AI disagrees, the log is
+changed and the change is stored as a LogRevision that the user can accept
+or revert.
+"""
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, or_, select
+from . import database
+from . import ai_service
+from . import catalog_service
+from . import nlp_service
+from . import settings_service
+from . import time_service
+
+# Background refinement is not user-facing, so it may wait longer than /api/log
+REFINE_DEADLINE_SECONDS = 30.0
+
+# Background tasks open their own session; tests point this at a scratch database
+_session_factory = database.SessionLocal
+
+
+def speculative_enabled() -> bool:
+    return settings_service.get_setting("ai_speculative_logging", "false") == "true"
+
+
+def _logged_values(log_id: int):
+    """((matter_id, duration, description), matcher) of a committed log, or (None, None) if it is gone."""
+    db = _session_factory()
+    try:
+        log = db.query(database.TimeLog).filter(database.TimeLog.id == log_id).first()
+        if not log:
+            return None, None
+        return (log.matter_id, log.duration_minutes, log.description), catalog_service.get_matcher(db)
+    finally:
+        db.close()
+
+
+def _apply_answer(log_id: int, logged: tuple, text: str, provider: str, ai_result: dict, matcher):
+    """Store the AI's answer as a pending revision when it differs from the log and the user left the log alone."""
+    matter = next((m for m in matcher.matters if m.name == ai_result["matter_name"]), None)
+    if matter is None:
+        return
+    logged_matter_id, logged_duration, _logged_description = logged
+    duration = logged_duration
+    if isinstance(ai_result.get("duration_minutes"), int) and ai_result["duration_minutes"] > 0:
+        duration = ai_result["duration_minutes"]
+    if matter.id == logged_matter_id and duration == logged_duration:
+        return  # AI agrees
+
+    db = _session_factory()
+    try:
+        log = db.query(database.TimeLog).filter(database.TimeLog.id == log_id).first()
+        if not log or (log.matter_id, log.duration_minutes, log.description) != logged:
+            return  # deleted or edited by the user while the AI was thinking
+
+        description = ai_result.get("description") or nlp_service.clean_description(text, matter.name)
+        db.add(database.LogRevision(
+            log_id=log.id,
+            source=provider,
+            old_matter_id=log.matter_id,
+            old_duration_minutes=log.duration_minutes,
+            old_description=log.description,
+            new_matter_id=matter.id,
+            new_duration_minutes=duration,
+            new_description=description,
+        ))
+        log.matter_id = matter.id
+        log.duration_minutes = duration
+        log.units = time_service.calculate_units(duration)
+        log.description = description
+        db.commit()
+    finally:
+        db.close()
+
+
+async def refine_log(log_id: int, text: str, provider: str, api_key: str):
+    """
+    Background task: ask the AI about an already committed log and apply its
+    answer as a pending revision if it picks another matter or duration.
+    Does nothing if the user edited the log in the meantime. The database work
+    runs in worker threads, so only the wait for the AI is on the event loop.
+    """
+    try:
+        logged, matcher = await run_in_threadpool(_logged_values, log_id)
+        if logged is None:
+            return
+        ai_result = await catalog_service.cached_ai_parse_async(
+            text, provider,
+            lambda: ai_service.parse_log_entry_async(
+                text, matcher, provider, api_key,
+                fallback=ai_service.fallback_settings(provider), deadline=REFINE_DEADLINE_SECONDS
+            )
+        )
+        if not ai_result or not ai_result.get("matter_name"):
+            return
+        await run_in_threadpool(_apply_answer, log_id, logged, text, provider, ai_result, matcher)
+    except Exception as e:
+        print(f"Error refining log {log_id}: {e}")
+
+
+def list_revisions(db, status: str = "pending"):
+    """Revisions of logs that still exist, newest first."""
+    snapshot = catalog_service.get_snapshot(db)
+    rows = db.query(database.LogRevision).join(
+        database.TimeLog, database.TimeLog.id == database.LogRevision.log_id
+    ).filter(database.LogRevision.status == status).order_by(database.LogRevision.id.desc()).all()
+
+    def matter_name(matter_id):
+        m = snapshot.get(matter_id)
+        return m.name if m else None
+
+    return [
+        {
+            "id": r.id,
+            "log_id": r.log_id,
+            "source": r.source,
+            "status": r.status,
+            "created_at": r.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "old": {"matter_id": r.old_matter_id, "matter": matter_name(r.old_matter_id),
+                    "duration": r.old_duration_minutes, "description": r.old_description},
+            "new": {"matter_id": r.new_matter_id, "matter": matter_name(r.new_matter_id),
+                    "duration": r.new_duration_minutes, "description": r.new_description},
+        }
+        for r in rows
+    ]
+
+
+class RevisionConflict(Exception):
+    """The log was edited after the revision, so reverting would overwrite that edit."""
+
+
+def resolve_revision(db, revision_id: int, accept: bool):
+    """
+    Accept (keep the AI's values) or revert (restore the logged values) a pending revision.
+    Returns the revision, or None if it or its log no longer exists.
+    Raises ValueError if it was already resolved, and RevisionConflict on a revert
+    when the log no longer holds the revision's new values.
+    """
+    revision = db.query(database.LogRevision).filter(database.LogRevision.id == revision_id).first()
+    if not revision:
+        return None
+    log = db.query(database.TimeLog).filter(database.TimeLog.id == revision.log_id).first()
+    if not log:
+        return None
+    if revision.status != "pending":
+        raise ValueError(f"Revision already {revision.status}")
+
+    if not accept:
+        current = (log.matter_id, log.duration_minutes, log.description)
+        if current != (revision.new_matter_id, revision.new_duration_minutes, revision.new_description):
+            raise RevisionConflict("The log was changed after this revision; edit it directly instead")
+        log.matter_id = revision.old_matter_id
+        log.duration_minutes = revision.old_duration_minutes
+        log.units = time_service.calculate_units(revision.old_duration_minutes)
+        log.description = revision.old_description
+    revision.status = "accepted" if accept else "reverted"
+    revision.resolved_at = datetime.now()
+    db.commit()
+    return revision
+
+
+def matter_deleted(db, matter_id: int):
+    """
+    Drop the revisions of a matter's logs before they are bulk deleted, and the
+    pending revisions whose revert would move a log back into the matter.
+    The caller commits.
+    """
+    revision = database.LogRevision
+    logs = select(database.TimeLog.id).where(database.TimeLog.matter_id == matter_id)
+    db.execute(delete(revision).where(or_(
+        revision.log_id.in_(logs),
+        (revision.status == "pending") & (revision.old_matter_id == matter_id),
+    )))
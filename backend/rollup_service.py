@@ -0,0 +1,118 @@
+"""
+Daily rollup of time logs: the daily_totals table.
+
+One row per (matter, log_day) with the summed minutes and units and the number
+of logs. database.py keeps it in step with every ORM write of a TimeLog (insert,
+edit, delete, merge, revision accept/revert) inside the same transaction; bulk
+deletes call matter_deleted() / reset() here. Period and per-matter totals are
+then read from days x matters rows instead of every log.
+
+rebuild() recomputes the table from time_logs and verify() lists any drift.
+ensure() runs at startup and rebuilds when the log counts disagree (e.g. a
+database from before the rollup existed). From the command line:
+
+    python -m backend.rollup_service            # report drift
+    python -m backend.rollup_service --rebuild  # report drift, then rebuild
+"""
+import argparse
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+from . import database
+from . import summary_service
+
+_LOG = database.TimeLog
+_TOTAL = database.DailyTotal
+
+
+def _rollup_query():
+    return select(
+        _LOG.matter_id,
+        _LOG.log_day,
+        func.coalesce(func.sum(_LOG.duration_minutes), 0),
+        func.coalesce(func.sum(_LOG.units), 0),
+        func.count(),
+    ).where(
+        _LOG.matter_id.isnot(None),
+        _LOG.log_day.isnot(None),
+    ).group_by(_LOG.matter_id, _LOG.log_day)
+
+
+def rebuild(db) -> int:
+    """Recompute daily_totals from time_logs. Returns the number of rows. The caller commits."""
+    db.execute(delete(_TOTAL))
+    db.execute(insert(_TOTAL).from_select(["matter_id", "log_day", "minutes", "units", "count"], _rollup_query()))
+    summary_service.logs_changed(db)
+    return db.query(_TOTAL).count()
+
+
+def verify(db) -> list:
+    """[{matter_id, log_day, expected, actual}] for every (matter, day) where the rollup differs from time_logs."""
+    expected = {(row[0], row[1]): tuple(row[2:]) for row in db.execute(_rollup_query())}
+    actual = {
+        (row[0], row[1]): tuple(row[2:])
+        for row in db.execute(select(_TOTAL.matter_id, _TOTAL.log_day, _TOTAL.minutes, _TOTAL.units, _TOTAL.count))
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            drift.append({
+                "matter_id": key[0],
+                "log_day": key[1],
+                "expected": expected.get(key),
+                "actual": actual.get(key),
+            })
+    return drift
+
+
+def ensure(db) -> bool:
+    """Rebuild when the rollup's log count differs from time_logs (cheap: two index counts). The caller commits."""
+    logged = db.query(func.count(_LOG.id)).filter(_LOG.matter_id.isnot(None), _LOG.log_day.isnot(None)).scalar()
+    rolled_up = db.query(func.coalesce(func.sum(_TOTAL.count), 0)).scalar()
+    if logged == rolled_up:
+        return False
+    rows = rebuild(db)
+    print(f"Rebuilt daily_totals ({rows} rows): it counted {rolled_up} logs, time_logs has {logged}")
+    return True
+
+
+def matter_deleted(db, matter_id: int):
+    """Drop a matter's rollup rows, for bulk deletes of its logs. The caller commits."""
+    db.execute(delete(_TOTAL).where(_TOTAL.matter_id == matter_id))
+    summary_service.logs_changed(db, [matter_id])
+
+
+def reset(db):
+    """Empty the rollup, for a bulk delete of all logs. The caller commits."""
+    db.execute(delete(_TOTAL))
+    summary_service.logs_changed(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the daily_totals rollup")
+    parser.add_argument("--db", default=None, help="Path to the SQLite database file (default: ./timesheet.db)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild daily_totals from time_logs")
+    args = parser.parse_args()
+
+    engine = database.engine
+    if args.db:
+        engine = database.attach_profile(create_engine(f"sqlite:///{args.db}", connect_args={"check_same_thread": False}))
+    database.Base.metadata.create_all(bind=engine, tables=[_TOTAL.__table__])
+    db = sessionmaker(bind=engine)()
+    try:
+        drift = verify(db)
+        for item in drift[:20]:
+            print(f"matter {item['matter_id']} day {item['log_day']}: "
+                  f"time_logs {item['expected']} vs daily_totals {item['actual']} (minutes, units, count)")
+        if len(drift) > 20:
+            print(f"... and {len(drift) - 20} more")
+        print(f"{len(drift)} (matter, day) rows drifted." if drift else "daily_totals matches time_logs.")
+        if args.rebuild:
+            rows = rebuild(db)
+            db.commit()
+            print(f"Rebuilt daily_totals: {rows} rows.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Server-side matter search for /api/matters/search.
+
+Every matter is embedded as a SEARCH_DIM float32 vector: the words and word
+pairs of its name, client, company, description and ai_tags are hashed into
+the vector (each token adds +/-1 at _PROBES hashed positions, weighted by
+field and sublinear term frequency) and the vector is L2-normalized. A query
+is embedded the same way with idf weights from the indexed document
+frequencies, and matters are ranked by cosine similarity with one
+matrix-vector product; the best candidates are then re-scored exactly, after a
+substring check that skips the (many) candidates sharing no word with the query.
+
+The index follows the catalog version, re-embedding only matters whose
+snapshot record changed, so tags written by the tag queue show up on the
+next search. It is saved under INDEX_DIR as .npy files and opened with
+mmap_mode="r" at startup; only rows whose content hash differs from the
+database are re-embedded, so a restart does not rebuild it.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+from . import database
+from . import catalog_service
+from . import classifier_service
+
+SEARCH_DIM = 128
+INDEX_DIR = "search_index"
+# Candidates re-scored exactly per requested result (at least SEARCH_RERANK_MIN). The hashed
+# scores are coarse: with 50 candidates only 0.43 of the exact top 10 survived, with 500 0.85
+SEARCH_RERANK_FACTOR = 50
+SEARCH_RERANK_MIN = 500
+_PROBES = 4
+_FIELD_WEIGHTS = (
+    ("name", 3.0),
+    ("client_name", 2.0),
+    ("company_name", 2.0),
+    ("description", 1.0),
+    ("ai_tags", 1.0),
+)
+_HASHED_FIELDS = tuple(field for field, _weight in _FIELD_WEIGHTS) + ("is_closed",)
+
+
+@lru_cache(maxsize=200_000)
+def _probes(token: str):
+    """((position, sign), ...) of a token in the hashed vector."""
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4 * _PROBES).digest()
+    values = [int.from_bytes(digest[4 * i:4 * i + 4], "little") for i in range(_PROBES)]
+    return tuple((v % SEARCH_DIM, 1.0 if v >> 31 else -1.0) for v in values)
+
+
+def _embed(weights) -> np.ndarray:
+    """Normalized hashed vector for {token: weight}."""
+    positions = []
+    values = []
+    for token, weight in weights.items():
+        for position, sign in _probes(token):
+            positions.append(position)
+            values.append(sign * weight)
+    vector = np.bincount(positions, weights=values, minlength=SEARCH_DIM).astype(np.float32) if positions \
+        else np.zeros(SEARCH_DIM, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _record_tokens(matter) -> dict:
+    """{token: weight} for a matter: field weight x (1 + log tf)."""
+    weights = Counter()
+    for field, field_weight in _FIELD_WEIGHTS:
+        for token, tf in Counter(classifier_service.words(getattr(matter, field))).items():
+            weights[token] += field_weight * (1.0 + math.log(tf))
+    return weights
+
+
+def _record_text(matter) -> str:
+    """Lower-cased text of the embedded fields: a query token absent from it cannot score."""
+    return " ".join(str(getattr(matter, field) or "") for field, _weight in _FIELD_WEIGHTS).lower()
+
+
+def _record_hash(matter) -> int:
+    text = "\x1f".join(str(getattr(matter, field) or "") for field in _HASHED_FIELDS)
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class MatterSearchIndex:
+    """Vectors of every matter, one row each. Not thread-safe; the module functions lock around it."""
+
+    def __init__(self, vectors=None, ids=None, hashes=None, closed=None, norms=None, df=None):
+        self.vectors = vectors if vectors is not None else np.zeros((0, SEARCH_DIM), dtype=np.float32)
+        self.ids = ids if ids is not None else np.zeros(0, dtype=np.int64)  # -1 for a removed matter
+        self.hashes = hashes if hashes is not None else np.zeros(0, dtype=np.uint32)
+        self.closed = closed if closed is not None else np.zeros(0, dtype=bool)
+        self.norms = norms if norms is not None else np.zeros(0, dtype=np.float32)  # exact norm of each row's weights
+        self.df = Counter(df or {})
+        self.count = len(self.ids)  # rows in use; the arrays may have spare capacity beyond it
+        self.size = int(np.count_nonzero(self.ids >= 0))  # live matters
+        self.rows = {int(matter_id): row for row, matter_id in enumerate(self.ids.tolist()) if matter_id >= 0}
+        self.records = [None] * self.count  # snapshot record each row was embedded from
+        self.texts = [None] * self.count  # _record_text() of each record, filled on first re-rank
+        self.dirty = False
+        self._df_stale = False
+
+    @classmethod
+    def load(cls, directory: str):
+        """The index saved in directory (vectors memory-mapped read-only), or None."""
+        try:
+            with open(os.path.join(directory, "matter_df.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("dim") != SEARCH_DIM:
+                return None
+            return cls(
+                vectors=np.load(os.path.join(directory, "matter_vectors.npy"), mmap_mode="r"),
+                ids=np.load(os.path.join(directory, "matter_ids.npy")),
+                hashes=np.load(os.path.join(directory, "matter_hashes.npy")),
+                closed=np.load(os.path.join(directory, "matter_closed.npy")),
+                norms=np.load(os.path.join(directory, "matter_norms.npy")),
+                df=meta["df"],
+            )
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Search index could not be loaded, rebuilding: {e}")
+            return None
+
+    def save(self, directory: str):
+        """Write the live rows to directory (compacted) and reopen the vectors memory-mapped."""
+        os.makedirs(directory, exist_ok=True)
+        # Release the memory map first: Windows cannot replace a mapped file
+        self._writable()
+        live = self.ids[:self.count] >= 0
+        arrays = {
+            "matter_vectors.npy": self.vectors[:self.count][live],
+            "matter_ids.npy": self.ids[:self.count][live],
+            "matter_hashes.npy": self.hashes[:self.count][live],
+            "matter_closed.npy": self.closed[:self.count][live],
+            "matter_norms.npy": self.norms[:self.count][live],
+        }
+        records = [r for r, keep in zip(self.records, live) if keep]
+        texts = [t for t, keep in zip(self.texts, live) if keep]
+        for name, array in arrays.items():
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(directory, name))
+        tmp = os.path.join(directory, "matter_df.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": SEARCH_DIM, "df": self.df}, f)
+        os.replace(tmp, os.path.join(directory, "matter_df.json"))
+
+        saved = MatterSearchIndex.load(directory)
+        self.vectors, self.ids, self.hashes, self.closed = saved.vectors, saved.ids, saved.hashes, saved.closed
+        self.norms = saved.norms
+        self.count, self.rows = saved.count, saved.rows
+        self.records = records
+        self.texts = texts
+        self.dirty = False
+
+    def _writable(self):
+        # Arrays from load() are read-only (the vectors are a memory map): copy on first write
+        if not self.vectors.flags.writeable:
+            self.vectors = np.array(self.vectors)
+        for name in ("ids", "hashes", "closed", "norms"):
+            array = getattr(self, name)
+            if not array.flags.writeable:
+                setattr(self, name, np.array(array))
+
+    def _append_row(self) -> int:
+        row = self.count
+        if row == len(self.ids):
+            capacity = max(64, 2 * row)
+            for name in ("vectors", "ids", "hashes", "closed", "norms"):
+                array = getattr(self, name)
+                grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+                grown[:row] = array[:row]
+                setattr(self, name, grown)
+            self.ids[row:] = -1
+        self.count += 1
+        self.records.append(None)
+        self.texts.append(None)
+        return row
+
+    def _set(self, matter, content_hash: int):
+        self._writable()
+        row = self.rows.get(matter.id)
+        if row is None:
+            row = self._append_row()
+            self.rows[matter.id] = row
+            self.size += 1
+        elif self.records[row] is not None:
+            self.df.subtract(set(_record_tokens(self.records[row])))
+        else:
+            self._df_stale = True  # loaded row: its old tokens are unknown
+        weights = _record_tokens(matter)
+        self.df.update(set(weights))
+        self.vectors[row] = _embed(weights)
+        self.norms[row] = math.sqrt(sum(w * w for w in weights.values()))
+        self.ids[row] = matter.id
+        self.hashes[row] = content_hash
+        self.closed[row] = bool(matter.is_closed)
+        self.records[row] = matter
+        self.texts[row] = None
+        self.dirty = True
+
+    def _remove(self, matter_id: int):
+        self._writable()
+        row = self.rows.pop(matter_id)
+        if self.records[row] is not None:
+            self.df.subtract(set(_record_tokens(self.records[row])))
+        else:
+            self._df_stale = True
+        self.vectors[row] = 0.0
+        self.ids[row] = -1
+        self.records[row] = None
+        self.texts[row] = None
+        self.size -= 1
+        self.dirty = True
+
+    def sync(self, matters) -> int:
+        """Bring the index in line with the catalog. Returns the number of rows re-embedded or removed."""
+        changed = 0
+        seen = set()
+        for matter in matters:
+            seen.add(matter.id)
+            row = self.rows.get(matter.id)
+            if row is not None and self.records[row] is matter:
+                continue  # same immutable snapshot record as last time
+            content_hash = _record_hash(matter)
+            if row is not None and int(self.hashes[row]) == content_hash:
+                self.records[row] = matter  # unchanged content (reloaded catalog or saved index)
+                continue
+            self._set(matter, content_hash)
+            changed += 1
+        for matter_id in [i for i in self.rows if i not in seen]:
+            self._remove(matter_id)
+            changed += 1
+        if self._df_stale:
+            self.df = Counter()
+            for matter in matters:
+                self.df.update(set(_record_tokens(matter)))
+            self._df_stale = False
+        self.df = +self.df  # drop zero counts
+        return changed
+
+    def _idf(self, token: str) -> float:
+        return math.log((self.size + 1) / (self.df.get(token, 0) + 1)) + 1.0
+
+    @staticmethod
+    def _query_dot(query_weights: dict, pattern, matter) -> float:
+        """Dot product of the query with the matter's token weights, counting only the query's tokens."""
+        dot = 0.0
+        for field, field_weight in _FIELD_WEIGHTS:
+            value = getattr(matter, field)
+            if value:
+                for token, tf in Counter(pattern.findall(value.lower())).items():
+                    dot += query_weights[token] * field_weight * (1.0 + math.log(tf))
+        return dot
+
+    @staticmethod
+    def _exact_score(query_weights: dict, query_norm: float, matter) -> float:
+        """Cosine between the idf-weighted query and the matter's token weights (as embedded)."""
+        doc = _record_tokens(matter)
+        dot = sum(weight * doc.get(token, 0.0) for token, weight in query_weights.items())
+        norm = math.sqrt(sum(w * w for w in doc.values()))
+        return dot / (query_norm * norm) if dot and norm else 0.0
+
+    def search(self, query: str, limit: int = 20, include_closed: bool = False) -> list:
+        """
+        [(matter_id, cosine score)] best first. The hashed vectors pick
+        SEARCH_RERANK_FACTOR x limit candidates with one matrix-vector product;
+        those are re-scored with their exact cosine, so hash collisions
+        cannot rank a matter that shares no word with the query.
+        """
+        tokens = Counter(t for t in classifier_service.words(query) if self.df.get(t))
+        if not tokens or not self.size:
+            return []
+        weights = {token: (1.0 + math.log(tf)) * self._idf(token) for token, tf in tokens.items()}
+        n = self.count
+        scores = self.vectors[:n] @ _embed(weights)
+        scores[self.ids[:n] < 0] = -np.inf
+        if not include_closed:
+            scores[self.closed[:n]] = -np.inf
+        shortlist = min(max(limit * SEARCH_RERANK_FACTOR, SEARCH_RERANK_MIN), n)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        top = top[scores[top] > -np.inf]
+
+        query_norm = math.sqrt(sum(w * w for w in weights.values()))
+        # A query token as a whole word, as classifier_service.words() splits text
+        pattern = re.compile(r"(?<![^\W_])(?:" + "|".join(map(re.escape, weights)) + r")(?![^\W_])")
+        results = []
+        for row, matter_id, hashed_score in zip(top.tolist(), self.ids[top].tolist(), scores[top].tolist()):
+            record = self.records[row]
+            if record is None:
+                score = hashed_score
+            else:
+                text = self.texts[row]
+                if text is None:
+                    text = self.texts[row] = _record_text(record)
+                if not any(token in text for token in weights):
+                    continue  # a hash collision: shares no word with the query
+                score = self._query_dot(weights, pattern, record) / (query_norm * float(self.norms[row]))
+            if score > 0:
+                results.append((matter_id, score))
+        results.sort(key=lambda item: -item[1])
+        return results[:limit]
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def _get_index(db) -> MatterSearchIndex:
+    """The index, loaded or built on first use and synced to the catalog. Caller holds _lock."""
+    global _index, _index_version
+    version = catalog_service.version()  # read before the snapshot, see catalog_service._bump
+    if version == _index_version:
+        return _index
+    snapshot = catalog_service.get_snapshot(db)
+    first_use = _index is None
+    if first_use:
+        _index = MatterSearchIndex.load(INDEX_DIR) or MatterSearchIndex()
+    changed = _index.sync(snapshot)
+    if first_use and changed:
+        _index.save(INDEX_DIR)
+    _index_version = version
+    return _index
+
+
+def search(db, query: str, limit: int = 20, include_closed: bool = False) -> list:
+    """[(MatterRecord, score)] for a free-text query, best first."""
+    with _lock:
+        index = _get_index(db)
+        results = index.search(query, limit, include_closed)
+    snapshot = catalog_service.get_snapshot(db)
+    return [(snapshot.get(matter_id), score) for matter_id, score in results if snapshot.get(matter_id)]
+
+
+def warm():
+    """Load (or build) the index ahead of the first search; run in a background thread at startup."""
+    db = database.SessionLocal()
+    try:
+        with _lock:
+            _get_index(db)
+    except Exception as e:
+        print(f"Search index warm-up failed: {e}")
+    finally:
+        db.close()
+
+
+def save():
+    """Persist index changes made since the last save (called at shutdown)."""
+    with _lock:
+        if _index is not None and _index.dirty:
+            _index.save(INDEX_DIR)
+
+
+def reset():
+    """Drop the in-memory index; the next search syncs the saved one with the database."""
+    global _index, _index_version
+    with _lock:
+        _index = None
+        _index_version = None
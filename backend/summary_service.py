@@ -0,0 +1,366 @@
+"""
+/api/summary and the per-matter records pages, computed with SQL aggregates.
+
+Totals are read from the daily_totals rollup (see rollup_service), so they cost
+days x matters rows rather than one per log: per-matter totals are one GROUP BY
+matter_id, and the today / this week / this month / last month reports one row
+of conditional SUMs over log_day ranges. Rows are read as plain Core tuples, so
+no TimeLog objects are built.
+
+The summary carries only the newest SUMMARY_PREVIEW_RECORDS records of each
+matter; the rest is paged by matter_records_page() with a keyset cursor on
+(log_date, id), newest first, so a page costs the same however deep it is.
+
+Per-matter totals and previews are kept between summaries. Committed log
+writes mark their matters stale (the session hooks below, and logs_changed()
+for bulk deletes), and the next summary re-reads only those matters.
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import String, case, event, func, select, tuple_, type_coerce
+from sqlalchemy.orm import Session
+from . import database
+from . import catalog_service
+
+SUMMARY_PREVIEW_RECORDS = 5
+RECORDS_PAGE_DEFAULT = 50
+RECORDS_PAGE_MAX = 200
+
+_LOG = database.TimeLog
+_TOTAL = database.DailyTotal
+
+# More stale matters than this are re-read with the full queries
+PARTIAL_REFRESH_MAX = 200
+
+# Totals and previews of the last summary, for the database it was read from.
+# _refresh_lock serializes the refreshes; _lock guards _stale (matter ids whose
+# logs changed since, or None when everything must be re-read).
+_refresh_lock = threading.Lock()
+_lock = threading.Lock()
+_cache = {"bind": None, "totals": {}, "previews": {}}
+_stale = None
+
+
+def period_bounds(now: datetime) -> dict:
+    """{period: (start, end or None)} for the summary reports."""
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=now.weekday()) # Monday
+    this_month_start = today_start.replace(day=1)
+    if now.month == 1:
+        last_month_start = this_month_start.replace(year=now.year - 1, month=12)
+    else:
+        last_month_start = this_month_start.replace(month=now.month - 1)
+    last_month_end = this_month_start - timedelta(seconds=1)
+    return {
+        "today": (today_start, None),
+        "this_week": (week_start, None),
+        "this_month": (this_month_start, None),
+        "last_month": (last_month_start, last_month_end),
+    }
+
+
+def _in_period(start, end):
+    # Periods start at midnight, so whole days of the rollup match the log_date bounds
+    if end is None:
+        return _TOTAL.log_day >= database.day_key(start)
+    return (_TOTAL.log_day >= database.day_key(start)) & (_TOTAL.log_day <= database.day_key(end))
+
+
+def _period_totals_query(bounds: dict):
+    columns = []
+    for start, end in bounds.values():
+        in_period = _in_period(start, end)
+        columns.append(func.coalesce(func.sum(case((in_period, _TOTAL.minutes), else_=0)), 0))
+        columns.append(func.coalesce(func.sum(case((in_period, _TOTAL.units), else_=0)), 0))
+    earliest = min(start for start, _end in bounds.values())
+    return select(*columns).where(
+        _TOTAL.log_day >= database.day_key(earliest),
+        _TOTAL.matter_id.in_(select(database.Matter.id)),
+    )
+
+
+def period_totals(db, now: datetime = None) -> dict:
+    """{period: {"minutes", "units"}} from the rollup rows since the earliest period start."""
+    bounds = period_bounds(now or datetime.now())
+    row = db.execute(_period_totals_query(bounds)).one()
+    return {
+        period: {"minutes": row[2 * i], "units": row[2 * i + 1]}
+        for i, period in enumerate(bounds)
+    }
+
+
+def _matter_totals_query(matter_ids=None):
+    # Sums from the rollup; the latest created_at of each matter is one seek in ix_time_logs_matter_id_created_at
+    last_logged = (
+        select(func.max(_LOG.created_at))
+        .where(_LOG.matter_id == _TOTAL.matter_id)
+        .correlate(_TOTAL)
+        .scalar_subquery()
+    )
+    query = select(
+        _TOTAL.matter_id,
+        func.sum(_TOTAL.minutes),
+        func.sum(_TOTAL.units),
+        func.strftime("%Y-%m-%d %H:%M:%S", last_logged),
+        func.sum(_TOTAL.count),
+    )
+    if matter_ids is not None:
+        query = query.where(_TOTAL.matter_id.in_(matter_ids))
+    return query.group_by(_TOTAL.matter_id)
+
+
+def matter_totals(db, matter_ids=None) -> dict:
+    """
+    {matter_id: (total_minutes, total_units, last_logged_at string, record_count)}
+    for matters with logs, or only for those of matter_ids.
+    """
+    rows = db.execute(_matter_totals_query(matter_ids))
+    return {
+        matter_id: (minutes or 0, units or 0, last, count)
+        for matter_id, minutes, units, last, count in rows
+    }
+
+
+def _record_columns(logs):
+    # log_date as stored (for cursors) and the display strings formatted by SQLite
+    return (
+        logs.c.id,
+        type_coerce(logs.c.log_date, String),
+        func.strftime("%Y-%m-%d %H:%M", logs.c.log_date),
+        func.strftime("%Y-%m-%d %H:%M:%S", logs.c.created_at),
+        logs.c.duration_minutes,
+        logs.c.units,
+        logs.c.description,
+    )
+
+
+_NEWEST_FIRST = (_LOG.log_date.desc(), _LOG.id.desc())
+
+
+def _record(row) -> dict:
+    log_id, _stored_date, date, logged_at, minutes, units, description = row
+    return {
+        "id": log_id,
+        "date": date,
+        "logged_at": logged_at,
+        "minutes": minutes,
+        "units": units,
+        "description": description,
+    }
+
+
+def _cursor_after(row) -> str:
+    return f"{row[1]}|{row[0]}"
+
+
+def decode_cursor(cursor: str):
+    """(stored log_date text, id) from a cursor; ValueError when it is malformed."""
+    log_date, _sep, log_id = cursor.partition("|")
+    datetime.fromisoformat(log_date)
+    return log_date, int(log_id)
+
+
+def _preview_columns(logs):
+    # Stored text as is: SQLite's strftime() over every preview row costs more than slicing here
+    return (
+        logs.c.matter_id,
+        logs.c.id,
+        type_coerce(logs.c.log_date, String),
+        type_coerce(logs.c.created_at, String),
+        logs.c.duration_minutes,
+        logs.c.units,
+        logs.c.description,
+    )
+
+
+def _preview_record(row) -> dict:
+    # DateTime columns are stored as "YYYY-MM-DD HH:MM:SS.ffffff", so the display
+    # strings are the same prefixes strftime() gives the records pages
+    log_id, log_date, created_at, minutes, units, description = row
+    return {
+        "id": log_id,
+        "date": log_date[:16],
+        "logged_at": created_at[:19] if created_at else None,
+        "minutes": minutes,
+        "units": units,
+        "description": description,
+    }
+
+
+def matter_previews(db, limit: int = SUMMARY_PREVIEW_RECORDS, matter_ids=None) -> dict:
+    """
+    {matter_id: (newest `limit` records, cursor after the last one)} for matters
+    with logs, or only for those of matter_ids.
+    """
+    # The newest ids of each matter, each found by a short backward walk of ix_time_logs_matter_id_log_date
+    newest = (
+        select(_LOG.id)
+        .where(_LOG.matter_id == database.Matter.id)
+        .order_by(*_NEWEST_FIRST)
+        .limit(limit)
+        .correlate(database.Matter)
+    )
+    logs = database.TimeLog.__table__.alias("preview_logs")
+    # No ORDER BY: sorting every preview row in a temp B-tree costs more than
+    # ordering each matter's few rows here
+    query = select(*_preview_columns(logs)).select_from(
+        database.Matter.__table__.join(logs, logs.c.id.in_(newest.scalar_subquery()))
+    )
+    if matter_ids is not None:
+        query = query.where(database.Matter.id.in_(matter_ids))
+    rows = db.execute(query).all()
+    previews = {}
+    for row in rows:
+        previews.setdefault(row[0], []).append(row[1:])
+    result = {}
+    for matter_id, matter_rows in previews.items():
+        matter_rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+        result[matter_id] = ([_preview_record(row) for row in matter_rows], _cursor_after(matter_rows[-1]))
+    return result
+
+
+def _records_page_query(matter_id, limit, cursor, start, end):
+    query = select(*_record_columns(database.TimeLog.__table__)).where(_LOG.matter_id == matter_id)
+    if cursor:
+        # Compared as text with the stored value, so equal dates are split exactly by id
+        log_date, log_id = decode_cursor(cursor)
+        query = query.where(tuple_(type_coerce(_LOG.log_date, String), _LOG.id) < (log_date, log_id))
+    if start is not None:
+        query = query.where(_LOG.log_date >= start)
+    if end is not None:
+        query = query.where(_LOG.log_date < end)
+    return query.order_by(*_NEWEST_FIRST).limit(limit)
+
+
+def matter_records_page(db, matter_id: int, limit: int = RECORDS_PAGE_DEFAULT, cursor: str = None,
+                        start: datetime = None, end: datetime = None) -> dict:
+    """
+    One page of a matter's records, newest first. `cursor` is the next_cursor of the
+    previous page; start / end bound log_date (end exclusive).
+    """
+    rows = db.execute(_records_page_query(matter_id, limit + 1, cursor, start, end)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _cursor_after(rows[-1])
+    return {
+        "matter_id": matter_id,
+        "records": [_record(row) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _note_changed_logs(session, _flush_context, _instances):
+    """Collect the matters of TimeLogs this flush writes: their current and stored matter_id."""
+    logs = [obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+            if isinstance(obj, database.TimeLog)]
+    if not logs:
+        return
+    changed = session.info.setdefault("summary_changed", set())
+    if changed is None:
+        return  # every matter is re-read already
+    changed.update(log.matter_id for log in logs if log.matter_id is not None)
+    stored = [log.id for log in logs if log.id is not None]
+    if stored:
+        # A moved log also changes the matter it left
+        rows = session.connection().execute(select(_LOG.matter_id).where(_LOG.id.in_(stored), _LOG.matter_id.isnot(None)))
+        changed.update(rows.scalars())
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_logs(session, _flush_context):
+    # matter_id is only known after the flush when a log was given its matter through the relationship
+    changed = session.info.get("summary_changed")
+    if changed is not None:
+        changed.update(obj.matter_id for obj in session.new
+                       if isinstance(obj, database.TimeLog) and obj.matter_id is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_changed_logs(session):
+    global _stale
+    if "summary_changed" not in session.info:
+        return
+    changed = session.info.pop("summary_changed")
+    with _lock:
+        if changed is None or _stale is None:
+            _stale = None
+        else:
+            _stale.update(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_logs(session):
+    session.info.pop("summary_changed", None)
+
+
+def logs_changed(db, matter_ids=None):
+    """
+    Mark logs written around the ORM (bulk deletes) as changed for the next
+    summary once db commits: those of matter_ids, or every matter's when None.
+    """
+    changed = db.info.get("summary_changed", set())
+    db.info["summary_changed"] = None if changed is None or matter_ids is None else changed | set(matter_ids)
+
+
+def _matter_data(db):
+    """
+    (totals, previews) as matter_totals() and matter_previews() return them,
+    re-reading only the matters whose logs changed since the last call.
+    """
+    global _stale
+    bind = db.get_bind()
+    with _refresh_lock:
+        # Taken before reading: a commit landing during the reads marks its matters again
+        with _lock:
+            stale, _stale = _stale, set()
+        if _cache["bind"] is not bind or stale is None or len(stale) > PARTIAL_REFRESH_MAX:
+            _cache.update(bind=bind, totals=matter_totals(db), previews=matter_previews(db))
+        elif stale:
+            ids = sorted(stale)
+            totals = matter_totals(db, ids)
+            previews = matter_previews(db, matter_ids=ids)
+            for matter_id in ids:
+                _cache["totals"].pop(matter_id, None)
+                _cache["previews"].pop(matter_id, None)
+            _cache["totals"].update(totals)
+            _cache["previews"].update(previews)
+        return dict(_cache["totals"]), dict(_cache["previews"])
+
+
+def get_summary(db, now: datetime = None) -> dict:
+    totals, previews = _matter_data(db)
+    matter_summary = []
+    grand_total_units = 0
+
+    for m in catalog_service.get_snapshot(db):
+        minutes, units, last_logged_at, record_count = totals.get(m.id, (0, 0, None, 0))
+        records, cursor = previews.get(m.id, ([], None))
+        grand_total_units += units
+        matter_summary.append({
+            "id": m.id,
+            "name": m.name,
+            "external_id": m.external_id,
+            "client_name": m.client_name,
+            "status_flag": m.status_flag or "yellow",
+            "is_closed": m.is_closed,
+            "total_minutes": minutes,
+            "total_units": units,
+            "last_logged_at": last_logged_at,
+            "record_count": record_count,
+            # Newest records only; the rest come from GET /api/matters/{id}/records?cursor=next_cursor
+            "records": records,
+            "next_cursor": cursor if record_count > len(records) else None,
+        })
+
+    # Sort results: matters with logs first (by last_logged_at), then others
+    def sort_key(m):
+        return (m["last_logged_at"] is not None, m["last_logged_at"])
+
+    return {
+        "by_matter": sorted(matter_summary, key=sort_key, reverse=True),
+        "reports": period_totals(db, now),
+        "grand_total_units": grand_total_units,
+    }
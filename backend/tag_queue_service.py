@@ -0,0 +1,213 @@
+"""
+Background queue for AI matter tags.
+
+enqueue() records new matters in the tag_jobs table. TAG_CONCURRENCY worker
+threads each take up to TAG_BATCH_SIZE due jobs and ask for all of their tags
+in one prompt (ai_service.generate_tags_batch). Provider calls are spaced to
+stay under TAG_CALLS_PER_MINUTE. A failed job is retried with exponential
+backoff and given up after TAG_MAX_ATTEMPTS. Jobs live in SQLite, so work
+interrupted by a restart resumes when the workers start again; while AI is
+not configured they simply wait.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from . import database
+from . import ai_service
+from . import catalog_service
+
+TAG_BATCH_SIZE = 10
+TAG_CONCURRENCY = 2
+TAG_CALLS_PER_MINUTE = 20
+TAG_MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled after every further failure
+TAG_BACKOFF_SECONDS = 30
+TAG_BACKOFF_MAX_SECONDS = 3600
+# Workers poll this often when idle; enqueue() wakes them early
+_IDLE_SECONDS = 30
+
+_session_factory = database.SessionLocal
+_lock = threading.Lock()
+_wake = threading.Event()
+_stop = threading.Event()
+_workers = []
+_in_flight = set()
+_next_call_at = 0.0
+_stats = {"batches": 0, "tagged": 0, "failed_attempts": 0, "dropped": 0}
+
+
+def enqueue(db, matter_ids):
+    """Queue matters for tagging and wake the workers. Matters already queued keep their place."""
+    ids = set(matter_ids)
+    if not ids:
+        return
+    queued = {
+        row.matter_id
+        for row in db.query(database.TagJob.matter_id).filter(database.TagJob.matter_id.in_(ids))
+    }
+    db.add_all([database.TagJob(matter_id=matter_id) for matter_id in sorted(ids - queued)])
+    db.commit()
+    _wake.set()
+
+
+def _wait_for_rate_slot() -> bool:
+    """Reserve the next provider call slot and sleep until it. False if the queue is stopping."""
+    global _next_call_at
+    with _lock:
+        now = time.monotonic()
+        slot = max(now, _next_call_at)
+        _next_call_at = slot + 60.0 / TAG_CALLS_PER_MINUTE
+    return not _stop.wait(slot - now)
+
+
+def _claim(db):
+    """Due jobs no other worker is handling, oldest first, marked as in flight."""
+    with _lock:
+        query = db.query(database.TagJob).filter(database.TagJob.next_attempt_at <= datetime.now())
+        if _in_flight:
+            query = query.filter(database.TagJob.matter_id.notin_(_in_flight))
+        jobs = query.order_by(database.TagJob.next_attempt_at, database.TagJob.matter_id).limit(TAG_BATCH_SIZE).all()
+        _in_flight.update(job.matter_id for job in jobs)
+    return jobs
+
+
+def _retry_later(db, job, error: str):
+    job.attempts = (job.attempts or 0) + 1
+    job.last_error = error[:500]
+    if job.attempts >= TAG_MAX_ATTEMPTS:
+        print(f"Giving up on AI tags for matter {job.matter_id} after {job.attempts} attempts: {error}")
+        db.delete(job)
+        with _lock:
+            _stats["dropped"] += 1
+        return
+    delay = min(TAG_BACKOFF_SECONDS * 2 ** (job.attempts - 1), TAG_BACKOFF_MAX_SECONDS)
+    job.next_attempt_at = datetime.now() + timedelta(seconds=delay)
+    with _lock:
+        _stats["failed_attempts"] += 1
+
+
+def process_batch(ai_settings=None) -> int:
+    """
+    Tag one batch of due jobs. ai_settings defaults to the configured
+    (provider, api_key). Returns the number of jobs handled, 0 when there
+    was nothing to do.
+    """
+    ai_settings = ai_settings or ai_service.configured_settings()
+    if ai_settings is None:
+        return 0
+
+    db = _session_factory()
+    ids = []
+    try:
+        jobs = _claim(db)
+        ids = [job.matter_id for job in jobs]
+        if not jobs:
+            return 0
+        matters = {m.id: m for m in db.query(database.Matter).filter(database.Matter.id.in_(ids))}
+
+        tags, error = {}, None
+        if matters and _wait_for_rate_slot():
+            try:
+                tags = ai_service.generate_tags_batch([matters[i] for i in ids if i in matters], *ai_settings)
+            except Exception as e:
+                error = str(e)
+        elif matters:
+            return 0  # stopping: leave the jobs for the next start
+
+        for job in jobs:
+            matter = matters.get(job.matter_id)
+            if matter is None:
+                db.delete(job)  # matter deleted while queued
+            elif job.matter_id in tags:
+                matter.ai_tags = tags[job.matter_id]
+                db.delete(job)
+            else:
+                _retry_later(db, job, error or "No tags for this matter in the answer")
+        db.commit()
+
+        for matter_id in tags:
+            catalog_service.matter_saved(db, matter_id)
+        with _lock:
+            _stats["batches"] += 1
+            _stats["tagged"] += len(tags)
+        if tags:
+            print(f"Generated AI tags for {len(tags)} matter(s) in one call")
+        return len(ids)
+    finally:
+        with _lock:
+            _in_flight.difference_update(ids)
+        db.close()
+
+
+def _worker():
+    while not _stop.is_set():
+        try:
+            handled = process_batch()
+        except Exception as e:
+            print(f"Tag queue error: {e}")
+            handled = 0
+        if not handled:
+            _wake.wait(_IDLE_SECONDS)
+            # Under the lock, so a worker never clears the wake-up stop() gives the others
+            with _lock:
+                if not _stop.is_set():
+                    _wake.clear()
+
+
+def start():
+    """Start the worker threads (at startup); pending jobs from the last run are picked up."""
+    with _lock:
+        if any(t.is_alive() for t in _workers):
+            return
+        _stop.clear()
+        _workers[:] = [
+            threading.Thread(target=_worker, name=f"tag-queue-{i}", daemon=True) for i in range(TAG_CONCURRENCY)
+        ]
+    for t in _workers:
+        t.start()
+
+
+def stop(timeout: float = 5.0):
+    """Stop the workers. Unfinished jobs stay in tag_jobs for the next start."""
+    with _lock:
+        _stop.set()
+        _wake.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
+
+
+def status() -> dict:
+    """Queue depth and worker counters, for /api/tags/queue."""
+    db = _session_factory()
+    try:
+        pending, retrying, next_attempt_at = db.query(
+            func.count(database.TagJob.matter_id),
+            func.count(database.TagJob.matter_id).filter(database.TagJob.attempts > 0),
+            func.min(database.TagJob.next_attempt_at),
+        ).one()
+        due = db.query(func.count(database.TagJob.matter_id)).filter(
+            database.TagJob.next_attempt_at <= datetime.now()
+        ).scalar()
+    finally:
+        db.close()
+    with _lock:
+        in_flight = len(_in_flight)
+        counters = dict(_stats)
+    return {
+        "pending": pending,
+        "due": due,
+        "retrying": retrying,
+        "in_flight": in_flight,
+        "next_attempt_at": next_attempt_at.strftime("%Y-%m-%d %H:%M:%S") if next_attempt_at else None,
+        "workers": sum(1 for t in _workers if t.is_alive()),
+        "ai_configured": ai_service.configured_settings() is not None,
+        "limits": {
+            "batch_size": TAG_BATCH_SIZE,
+            "concurrency": TAG_CONCURRENCY,
+            "calls_per_minute": TAG_CALLS_PER_MINUTE,
+            "max_attempts": TAG_MAX_ATTEMPTS,
+        },
+        **counters,
+    }
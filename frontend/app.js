@@ -50,6 +50,17 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('chat-input').addEventListener('keypress', (e) => {
         if (e.key === 'Enter') sendMessage();
     });
+    document.getElementById('chat-input').addEventListener('input', schedulePreview);
+    document.getElementById('log-date').addEventListener('change', schedulePreview);
+    document.getElementById('chat-input').addEventListener('paste', (e) => {
+        // Pasting several lines (e.g. a whole day's timesheet) logs them in one batch
+        const pasted = (e.clipboardData || window.clipboardData).getData('text');
+        const lines = pasted.split(/\r?\n/).map(line => line.trim()).filter(line => line);
+        if (lines.length > 1) {
+            e.preventDefault();
+            sendBatch(lines);
+        }
+    });
 
     document.getElementById('scan-btn').addEventListener('click', scanOutlook);
     document.getElementById('export-btn').addEventListener('click', exportLogs);
@@ -638,6 +649,7 @@ async function sendMessage() {
 
     addMessage('User', text);
     input.value = '';
+    clearPreview();
 
     try {
         const response = await fetch(`${API_BASE}/log`, {
@@ -659,8 +671,8 @@ async function sendMessage() {
         }
 
         const data = await response.json();
-        const responseMsg = `Logged <strong>${data.duration} mins</strong> for <strong>${escapeHtml(data.matter)}</strong> on ${data.date}.<br><em>"${escapeHtml(data.description)}"</em>`;
-        addMessage('System', responseMsg, true); // true for HTML content
+        addMessage('System', formatLoggedMessage(data), true); // true for HTML content
+        if (data.refining) watchRevision(data.log_id);
 
         // Reset date picker to today (optional, or keep if user wants to log multiple things for the same day)
         // dateInput.value = ''; 
@@ -676,6 +688,180 @@ async function sendMessage() {
     }
 }
 
+// --- Live parse preview (debounced, read-only) ---
+const PREVIEW_DELAY_MS = 250;
+let previewTimer = null;
+let previewSeq = 0;
+
+function schedulePreview() {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(loadPreview, PREVIEW_DELAY_MS);
+}
+
+function clearPreview() {
+    clearTimeout(previewTimer);
+    previewSeq++; // drop responses still in flight
+    const box = document.getElementById('log-preview');
+    box.hidden = true;
+    box.innerHTML = '';
+}
+
+async function loadPreview() {
+    const text = document.getElementById('chat-input').value;
+    if (!text.trim()) {
+        clearPreview();
+        return;
+    }
+    const seq = ++previewSeq;
+    try {
+        const response = await fetch(`${API_BASE}/log/preview`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ text: text, date: document.getElementById('log-date').value || null })
+        });
+        if (!response.ok || seq !== previewSeq) return;
+        const data = await response.json();
+        if (seq !== previewSeq) return;
+        renderPreview(text, data);
+    } catch (error) {
+        console.error('Preview failed', error);
+    }
+}
+
+function highlightSpans(text, marks) {
+    // marks: [{start, end, cls}], overlapping ranges keep the first one
+    marks.sort((a, b) => a.start - b.start);
+    let html = '';
+    let pos = 0;
+    for (const m of marks) {
+        if (m.start < pos) continue;
+        html += escapeHtml(text.slice(pos, m.start));
+        html += `<mark class="${m.cls}">${escapeHtml(text.slice(m.start, m.end))}</mark>`;
+        pos = m.end;
+    }
+    return html + escapeHtml(text.slice(pos));
+}
+
+function renderPreview(text, data) {
+    const box = document.getElementById('log-preview');
+    const marks = [];
+    data.spans.duration.forEach(([start, end]) => marks.push({ start, end, cls: 'preview-duration' }));
+    if (data.spans.date) marks.push({ start: data.spans.date[0], end: data.spans.date[1], cls: 'preview-date' });
+    data.spans.matter.forEach(([start, end]) => marks.push({ start, end, cls: 'preview-matter' }));
+
+    const parts = [];
+    parts.push(data.duration ? `<strong>${data.duration} mins</strong>` : 'No duration yet');
+    if (data.date) parts.push(data.date);
+    if (data.matched) {
+        parts.push(`<strong>${escapeHtml(data.candidates[0].name)}</strong>`);
+    } else if (data.candidates.length) {
+        const names = data.candidates.slice(0, 3).map(c => escapeHtml(c.name) + (c.score !== null ? ` (${c.score})` : ''));
+        parts.push(`${data.candidates.length} candidates: ${names.join(', ')}`);
+    } else {
+        parts.push('No matter matched');
+    }
+
+    box.innerHTML = `<div>${highlightSpans(text, marks)}</div><div class="preview-candidates">${parts.join(' · ')}</div>`;
+    box.hidden = false;
+}
+
+function formatLoggedMessage(data) {
+    const refining = data.refining ? '<br><small>Checking with AI in the background...</small>' : '';
+    return `Logged <strong>${data.duration} mins</strong> for <strong>${escapeHtml(data.matter)}</strong> on ${data.date}.<br><em>"${escapeHtml(data.description)}"</em>${refining}`;
+}
+
+// --- Speculative logging: offer the AI's correction once the background check is done ---
+const REVISION_POLL_MS = 5000;
+const REVISION_POLL_TRIES = 6;
+
+function watchRevision(logId, tries = REVISION_POLL_TRIES) {
+    setTimeout(async () => {
+        try {
+            const response = await fetch(`${API_BASE}/logs/revisions`);
+            if (!response.ok) return;
+            const revisions = await response.json();
+            const revision = revisions.find(r => r.log_id === logId);
+            if (revision) {
+                showRevision(revision);
+            } else if (tries > 1) {
+                watchRevision(logId, tries - 1);
+            }
+        } catch (error) {
+            console.error('Failed to load log revisions', error);
+        }
+    }, REVISION_POLL_MS);
+}
+
+function showRevision(revision) {
+    addMessage('System',
+        `AI changed a log: <strong>${revision.old.duration} mins</strong> for <strong>${escapeHtml(revision.old.matter)}</strong>` +
+        ` &rarr; <strong>${revision.new.duration} mins</strong> for <strong>${escapeHtml(revision.new.matter)}</strong>.` +
+        `<br><em>"${escapeHtml(revision.new.description)}"</em><br>` +
+        `<button class="btn" onclick="resolveRevision(${revision.id}, 'accept')">Accept</button> ` +
+        `<button class="btn" onclick="resolveRevision(${revision.id}, 'revert')">Revert</button>`, true);
+}
+
+async function resolveRevision(revisionId, action) {
+    try {
+        const response = await fetch(`${API_BASE}/logs/revisions/${revisionId}/${action}`, { method: 'POST' });
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.detail || 'Failed to update log');
+        addMessage('System', action === 'accept' ? 'Kept the AI correction.' : 'Restored the original log.');
+    } catch (error) {
+        addMessage('System', `Error: ${error.message}`);
+    }
+}
+
+// Ambiguous lines from a batch paste, resolved one modal after another
+let pendingAmbiguousQueue = [];
+
+async function sendBatch(lines) {
+    const dateInput = document.getElementById('log-date');
+    const selectedDate = dateInput.value;
+
+    addMessage('User', lines.join('\n'));
+    pendingAmbiguousQueue = [];
+
+    try {
+        const response = await fetch(`${API_BASE}/log/batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                entries: lines.map(text => ({ text: text, date: selectedDate || null }))
+            })
+        });
+
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.detail || 'Failed to log time');
+        }
+
+        const data = await response.json();
+        data.results.forEach(result => {
+            if (result.status === 200) {
+                addMessage('System', formatLoggedMessage(result), true);
+                if (result.refining) watchRevision(result.log_id);
+            } else if (result.status === 409) {
+                pendingAmbiguousQueue.push(result);
+            } else {
+                addMessage('System', `Line ${result.index + 1} not logged (${result.detail}): "${result.text}"`);
+            }
+        });
+        addMessage('System', `Logged ${data.logged} of ${data.results.length} lines.` +
+            (pendingAmbiguousQueue.length ? ` ${pendingAmbiguousQueue.length} need a matter selected.` : ''));
+        showNextAmbiguous();
+    } catch (error) {
+        addMessage('System', `Error: ${error.message}`);
+    }
+}
+
+function showNextAmbiguous() {
+    const next = pendingAmbiguousQueue.shift();
+    if (next) {
+        showAmbiguousMatterModal(next.text, next.candidates);
+    }
+}
+
 let pendingLogText = '';
 
 function showMissingDurationModal(text) {
@@ -773,11 +959,11 @@ async function retryWithMatterId(matterId) {
         }
 
         const data = await response.json();
-        const responseMsg = `Logged <strong>${data.duration} mins</strong> for <strong>${escapeHtml(data.matter)}</strong> on ${data.date}.<br><em>"${escapeHtml(data.description)}"</em>`;
-        addMessage('System', responseMsg, true);
+        addMessage('System', formatLoggedMessage(data), true);
     } catch (error) {
         addMessage('System', `Error: ${error.message}`);
     }
+    showNextAmbiguous();
 }
 
 function addMessage(sender, text, isHtml = false) {
@@ -877,28 +1063,12 @@ function renderSummary(data) {
                 </div>
             </div>
             <div class="record-list">
-                ${item.records.map(record => `
-                    <div class="record-item">
-                        <div class="record-date">${record.date}${record.logged_at ? `<span class="record-logged-at" title="Logged at ${record.logged_at}"> (${record.logged_at.slice(11, 16)})</span>` : ''}</div>
-                        <div class="record-desc" title="${escapeHtml(record.description)}">
-                            ${escapeHtml(record.description)}
-                        </div>
-                        <div class="record-time">
-                            ${record.units} u (${record.minutes}m)
-                            <div class="record-actions" style="display: inline-flex; gap: 8px; margin-left: 8px;">
-                                <button onclick="openEditLogModal(${record.id}, '${escapeHtml(record.description).replace(/'/g, "\\'")}', ${record.minutes}, '${record.date}')" 
-                                    class="icon-btn" title="Edit" style="background: none; border: none; cursor: pointer; color: var(--accent-color);">
-                                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 20h9"></path><path d="M16.5 3.5a2.121 2.121 0 0 1 3 3L7 10l-4 1 1-4L16.5 3.5z"></path></svg>
-                                </button>
-                                <button onclick="deleteLog(${record.id}, '${escapeHtml(record.description).replace(/'/g, "\\'")}', ${record.minutes})"
-                                    class="icon-btn" title="Delete" style="background: none; border: none; cursor: pointer; color: var(--danger-color);">
-                                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><polyline points="3 6 5 6 21 6"></polyline><path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path></svg>
-                                </button>
-                            </div>
-                        </div>
-                    </div>
-                `).join('')}
+                ${item.records.map(summaryRecordHtml).join('')}
             </div>
+            ${item.next_cursor ? `
+                <button class="summary-more-btn" data-matter-id="${item.id}" data-cursor="${escapeHtml(item.next_cursor)}"
+                    onclick="loadMoreSummaryRecords(this)">Show all ${item.record_count} records</button>
+            ` : ''}
         `;
         container.appendChild(block);
     });
@@ -910,6 +1080,55 @@ function renderSummary(data) {
     container.appendChild(footer);
 }
 
+function summaryRecordHtml(record) {
+    return `
+        <div class="record-item">
+            <div class="record-date">${record.date}${record.logged_at ? `<span class="record-logged-at" title="Logged at ${record.logged_at}"> (${record.logged_at.slice(11, 16)})</span>` : ''}</div>
+            <div class="record-desc" title="${escapeHtml(record.description)}">
+                ${escapeHtml(record.description)}
+            </div>
+            <div class="record-time">
+                ${record.units} u (${record.minutes}m)
+                <div class="record-actions" style="display: inline-flex; gap: 8px; margin-left: 8px;">
+                    <button onclick="openEditLogModal(${record.id}, '${escapeHtml(record.description).replace(/'/g, "\\'")}', ${record.minutes}, '${record.date}')" 
+                        class="icon-btn" title="Edit" style="background: none; border: none; cursor: pointer; color: var(--accent-color);">
+                        <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 20h9"></path><path d="M16.5 3.5a2.121 2.121 0 0 1 3 3L7 10l-4 1 1-4L16.5 3.5z"></path></svg>
+                    </button>
+                    <button onclick="deleteLog(${record.id}, '${escapeHtml(record.description).replace(/'/g, "\\'")}', ${record.minutes})"
+                        class="icon-btn" title="Delete" style="background: none; border: none; cursor: pointer; color: var(--danger-color);">
+                        <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><polyline points="3 6 5 6 21 6"></polyline><path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path></svg>
+                    </button>
+                </div>
+            </div>
+        </div>
+    `;
+}
+
+// Fetch the next page of a matter's records (the summary only carries the newest few)
+async function loadMoreSummaryRecords(btn) {
+    const list = btn.previousElementSibling;
+    btn.disabled = true;
+    btn.innerText = 'Loading...';
+    try {
+        const params = new URLSearchParams({ cursor: btn.dataset.cursor, limit: 50 });
+        const response = await fetch(`${API_BASE}/matters/${btn.dataset.matterId}/records?${params}`);
+        if (!response.ok) throw new Error('Failed to load records');
+        const page = await response.json();
+        list.insertAdjacentHTML('beforeend', page.records.map(summaryRecordHtml).join(''));
+        if (page.next_cursor) {
+            btn.dataset.cursor = page.next_cursor;
+            btn.innerText = 'Load more';
+            btn.disabled = false;
+        } else {
+            btn.remove();
+        }
+    } catch (error) {
+        btn.innerText = 'Retry';
+        btn.disabled = false;
+        alert('Error loading records: ' + error.message);
+    }
+}
+
 // Matters Overview Implementation
 let mattersOverviewData = null;
 
@@ -1750,64 +1969,84 @@ async function renderMatterHistory(matterId) {
     container.innerHTML = '<div class="loading-state">Loading history...</div>';
 
     try {
-        const response = await fetch(`${API_BASE}/summary`);
-        const data = await response.json();
+        const page = await fetchMatterRecords(matterId);
 
-        let matterData = null;
-        if (data.by_matter) {
-            matterData = data.by_matter.find(m => m.id === matterId);
-        }
-
-        if (!matterData || !matterData.records || matterData.records.length === 0) {
+        if (page.records.length === 0) {
             container.innerHTML = '<div class="empty-state">No time logs found for this matter.</div>';
             return;
         }
 
         container.innerHTML = '';
-
-        // Sort by date desc
-        const sorted = matterData.records.sort((a, b) => new Date(b.date) - new Date(a.date));
-
-        sorted.forEach(log => {
-            const row = document.createElement('div');
-            row.className = 'history-item';
-            row.style.display = 'flex';
-            row.style.justifyContent = 'space-between';
-            row.style.alignItems = 'center';
-            row.style.padding = '10px';
-            row.style.borderBottom = '1px solid var(--border-color)';
-
-            row.innerHTML = `
-                <div style="display:flex; align-items:flex-start; gap:10px; flex:1;">
-                    <input type="checkbox" class="merge-checkbox" value="${log.id}" data-date="${log.date.split(' ')[0]}" onchange="handleMergeSelection()">
-                    <div style="flex: 1; min-width: 0;">
-                        <div style="font-weight: 500; font-size: 0.95em;">${escapeHtml(log.description || '(No description)')}</div>
-                        <div style="font-size: 0.8em; color: var(--text-secondary); margin-top: 4px;">${log.date} &bull; ${log.minutes}m (${log.units}u)</div>
-                    </div>
-                </div>
-                <div style="display:flex; gap:6px; align-items:center;">
-                     <button class="icon-btn" onclick="editLogFromHistory(${log.id}, '${escapeHtml(log.description || '').replace(/'/g, "\\'").replace(/"/g, '&quot;')}', ${log.minutes}, '${log.date}')" title="Edit Log"
-                        style="background: none; border: 1px solid var(--border-color); border-radius: 4px; padding: 4px 8px; cursor: pointer; font-size:1em;">
-                        &#9998;
-                     </button>
-                     <button class="icon-btn" onclick="deleteLogFromHistory(${log.id})" title="Delete Log"
-                        style="color: var(--danger-color); background: none; border: 1px solid var(--border-color); border-radius: 4px; padding: 4px 8px; cursor: pointer;">
-                        &times;
-                     </button>
-                </div>
-            `;
-            container.appendChild(row);
-        });
+        appendHistoryRecords(container, matterId, page);
 
         // Reset merge button state
         handleMergeSelection();
-
     } catch (e) {
         console.error(e);
         container.innerHTML = '<div class="error-state">Failed to load history</div>';
     }
 }
 
+// A page of a matter's time logs, newest first
+async function fetchMatterRecords(matterId, cursor = null) {
+    const params = new URLSearchParams({ limit: 200 });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${API_BASE}/matters/${matterId}/records?${params}`);
+    if (!response.ok) throw new Error('Failed to load records');
+    return response.json();
+}
+
+function appendHistoryRecords(container, matterId, page) {
+    page.records.forEach(log => {
+        const row = document.createElement('div');
+        row.className = 'history-item';
+        row.style.display = 'flex';
+        row.style.justifyContent = 'space-between';
+        row.style.alignItems = 'center';
+        row.style.padding = '10px';
+        row.style.borderBottom = '1px solid var(--border-color)';
+
+        row.innerHTML = `
+            <div style="display:flex; align-items:flex-start; gap:10px; flex:1;">
+                <input type="checkbox" class="merge-checkbox" value="${log.id}" data-date="${log.date.split(' ')[0]}" onchange="handleMergeSelection()">
+                <div style="flex: 1; min-width: 0;">
+                    <div style="font-weight: 500; font-size: 0.95em;">${escapeHtml(log.description || '(No description)')}</div>
+                    <div style="font-size: 0.8em; color: var(--text-secondary); margin-top: 4px;">${log.date} &bull; ${log.minutes}m (${log.units}u)</div>
+                </div>
+            </div>
+            <div style="display:flex; gap:6px; align-items:center;">
+                 <button class="icon-btn" onclick="editLogFromHistory(${log.id}, '${escapeHtml(log.description || '').replace(/'/g, "\\'").replace(/"/g, '&quot;')}', ${log.minutes}, '${log.date}')" title="Edit Log"
+                    style="background: none; border: 1px solid var(--border-color); border-radius: 4px; padding: 4px 8px; cursor: pointer; font-size:1em;">
+                    &#9998;
+                 </button>
+                 <button class="icon-btn" onclick="deleteLogFromHistory(${log.id})" title="Delete Log"
+                    style="color: var(--danger-color); background: none; border: 1px solid var(--border-color); border-radius: 4px; padding: 4px 8px; cursor: pointer;">
+                    &times;
+                 </button>
+            </div>
+        `;
+        container.appendChild(row);
+    });
+
+    if (page.next_cursor) {
+        const more = document.createElement('button');
+        more.className = 'summary-more-btn';
+        more.innerText = 'Load older logs';
+        more.onclick = async () => {
+            more.disabled = true;
+            try {
+                const next = await fetchMatterRecords(matterId, page.next_cursor);
+                more.remove();
+                appendHistoryRecords(container, matterId, next);
+            } catch (e) {
+                console.error(e);
+                more.disabled = false;
+            }
+        };
+        container.appendChild(more);
+    }
+}
+
 async function deleteLogFromHistory(logId) {
     if (!confirm("Are you sure you want to delete this time log?")) return;
 
@@ -51,12 +51,20 @@ EXPECTED_SCHEMA = {
         {"name": "log_date",         "type": "DATETIME","notnull": False, "default": None},
         {"name": "created_at",       "type": "DATETIME","notnull": False, "default": None},
         {"name": "units",            "type": "INTEGER", "notnull": False, "default": "0"},
+        {"name": "log_day",          "type": "INTEGER", "notnull": False, "default": None},
     ],
     "user_settings": [
         {"name": "id",    "type": "INTEGER", "notnull": True,  "default": None},
         {"name": "key",   "type": "VARCHAR", "notnull": False, "default": None},
         {"name": "value", "type": "VARCHAR", "notnull": False, "default": None},
     ],
+    "daily_totals": [
+        {"name": "matter_id", "type": "INTEGER", "notnull": True,  "default": None},
+        {"name": "log_day",   "type": "INTEGER", "notnull": True,  "default": None},
+        {"name": "minutes",   "type": "INTEGER", "notnull": False, "default": None},
+        {"name": "units",     "type": "INTEGER", "notnull": False, "default": None},
+        {"name": "count",     "type": "INTEGER", "notnull": False, "default": None},
+    ],
 }
 
 # ─────────────────────────────────────────────────────────────
@@ -124,6 +132,73 @@ MIGRATIONS = [
         "column": "ai_tags",
         "sql": "ALTER TABLE matters ADD COLUMN ai_tags TEXT",
     },
+    {
+        "id": "009",
+        "description": "Add log_day column to time_logs (YYYYMMDD day bucket) and fill it for existing logs",
+        "table": "time_logs",
+        "column": "log_day",
+        "sql": [
+            "ALTER TABLE time_logs ADD COLUMN log_day INTEGER",
+            "UPDATE time_logs SET log_day = CAST(strftime('%Y%m%d', log_date) AS INTEGER) "
+            "WHERE log_day IS NULL AND log_date IS NOT NULL",
+        ],
+    },
+    {
+        "id": "010",
+        "description": "Index time_logs by log_date (date range filters)",
+        "table": "time_logs",
+        "column": None,
+        "index": "ix_time_logs_log_date",
+        "sql": "CREATE INDEX IF NOT EXISTS ix_time_logs_log_date ON time_logs (log_date)",
+    },
+    {
+        "id": "011",
+        "description": "Index time_logs by (matter_id, log_date) (per-matter history and totals)",
+        "table": "time_logs",
+        "column": None,
+        "index": "ix_time_logs_matter_id_log_date",
+        "sql": "CREATE INDEX IF NOT EXISTS ix_time_logs_matter_id_log_date ON time_logs (matter_id, log_date)",
+    },
+    {
+        "id": "012",
+        "description": "Index time_logs by log_day (per-day grouping)",
+        "table": "time_logs",
+        "column": None,
+        "index": "ix_time_logs_log_day",
+        "sql": "CREATE INDEX IF NOT EXISTS ix_time_logs_log_day ON time_logs (log_day)",
+    },
+    {
+        "id": "013",
+        "description": "Index on time_logs for the latest log of each matter",
+        "table": "time_logs",
+        "column": None,
+        "index": "ix_time_logs_matter_id_created_at",
+        "sql": [
+            "CREATE INDEX IF NOT EXISTS ix_time_logs_matter_id_created_at ON time_logs (matter_id, created_at)",
+            # Wider index from before the daily_totals rollup; totals no longer read time_logs
+            "DROP INDEX IF EXISTS ix_time_logs_matter_totals",
+        ],
+    },
+    {
+        "id": "014",
+        "description": "Create daily_totals rollup (per matter and day) and fill it from time_logs",
+        "table": "daily_totals",
+        "column": None,  # Table-level migration
+        "sql": [
+            """CREATE TABLE IF NOT EXISTS daily_totals (
+            matter_id INTEGER NOT NULL REFERENCES matters (id) ON DELETE CASCADE,
+            log_day INTEGER NOT NULL,
+            minutes INTEGER,
+            units INTEGER,
+            count INTEGER,
+            PRIMARY KEY (matter_id, log_day)
+        )""",
+            "CREATE INDEX IF NOT EXISTS ix_daily_totals_log_day ON daily_totals (log_day)",
+            "INSERT INTO daily_totals (matter_id, log_day, minutes, units, count) "
+            "SELECT matter_id, log_day, COALESCE(SUM(duration_minutes), 0), COALESCE(SUM(units), 0), COUNT(*) "
+            "FROM time_logs WHERE matter_id IS NOT NULL AND log_day IS NOT NULL GROUP BY matter_id, log_day",
+        ],
+    },
 ]
 
 # ─────────────────────────────────────────────────────────────
@@ -138,6 +213,10 @@ def get_existing_columns(cursor, table_name):
     cursor.execute(f"PRAGMA table_info({table_name})")
     return {row[1] for row in cursor.fetchall()}
 
+def get_existing_indexes(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    return {row[0] for row in cursor.fetchall()}
+
 def print_banner():
     print("=" * 60)
     print("  PersonalTimesheetAssistant — Database Migration Tool")
@@ -157,6 +236,7 @@ def print_section(title):
 def check_schema(cursor):
     """Returns a list of pending migrations (those that need to be applied)."""
     existing_tables = get_existing_tables(cursor)
+    existing_indexes = get_existing_indexes(cursor)
     pending = []
 
     for migration in MIGRATIONS:
@@ -177,6 +257,8 @@ def check_schema(cursor):
             existing_cols = get_existing_columns(cursor, table)
             if column not in existing_cols:
                 pending.append(migration)
+        elif migration.get("index") and migration["index"] not in existing_indexes:
+            pending.append(migration)
         # Table-level CREATE IF NOT EXISTS migrations are always safe to re-run
 
     return pending
@@ -233,11 +315,13 @@ def apply_migrations(conn, cursor, pending):
     for migration in pending:
         mid = migration["id"]
         desc = migration["description"]
-        sql = migration["sql"]
+        # A migration is one statement or a list of statements (e.g. add a column, then fill it)
+        statements = migration["sql"] if isinstance(migration["sql"], list) else [migration["sql"]]
 
         try:
             print(f"  [{mid}] {desc} ...", end=" ")
-            cursor.execute(sql)
+            for sql in statements:
+                cursor.execute(sql)
             conn.commit()
             print("DONE")
             applied += 1
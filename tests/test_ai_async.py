@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from backend import ai_service, nlp_service
+from tests.test_matter_matcher import MATTERS
+
+
+def _fake_provider(name, delay, matter_name="GSC Matter", fail=False):
+    """Register a local provider answering after `delay` seconds (or failing)."""
+    calls = []
+
+    def call(prompt, api_key):
+        calls.append(time.monotonic())
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} is down")
+        return json.dumps({"matter_name": matter_name, "duration_minutes": None, "date": None, "description": None})
+
+    ai_service._PROVIDER_CALLS[name] = call
+    ai_service._UNCACHED_PROVIDERS.add(name)
+    return calls
+
+
+def _cleanup(*names):
+    for name in names:
+        ai_service._PROVIDER_CALLS.pop(name, None)
+        ai_service._UNCACHED_PROVIDERS.discard(name)
+    ai_service.breaker = ai_service.CircuitBreaker()
+
+
+def _parse(provider, fallback=None, deadline=1.0, hedge_delay=0.1):
+    matcher = nlp_service.MatterMatcher(MATTERS)
+
+    async def timed():
+        start = time.monotonic()
+        result = await ai_service.parse_log_entry_async(
+            "GSC request 1h", matcher, provider, "key",
+            fallback=(fallback, "key") if fallback else None, deadline=deadline, hedge_delay=hedge_delay
+        )
+        return result, time.monotonic() - start
+
+    return asyncio.run(timed())
+
+
+def test_fast_provider_answers():
+    _fake_provider("fast", 0.01)
+    try:
+        result, _elapsed = _parse("fast")
+        assert result["matter_name"] == "GSC Matter"
+    finally:
+        _cleanup("fast")
+
+
+def test_deadline_returns_none_without_waiting():
+    _fake_provider("slow", 0.6)
+    try:
+        result, elapsed = _parse("slow", deadline=0.2)
+        assert result is None
+        assert 0.19 <= elapsed < 0.4
+    finally:
+        _cleanup("slow")
+
+
+def test_hedged_request_wins_over_slow_primary():
+    slow_calls = _fake_provider("slow", 0.5, matter_name="Tripartite Agreement")
+    backup_calls = _fake_provider("backup", 0.01)
+    try:
+        result, _elapsed = _parse("slow", fallback="backup", deadline=1.0, hedge_delay=0.1)
+        assert result["matter_name"] == "GSC Matter"
+        assert len(slow_calls) == 1 and len(backup_calls) == 1
+        assert backup_calls[0] - slow_calls[0] >= 0.09
+    finally:
+        _cleanup("slow", "backup")
+
+
+def test_failed_primary_hedges_immediately():
+    _fake_provider("broken", 0.0, fail=True)
+    _fake_provider("backup", 0.01)
+    try:
+        result, elapsed = _parse("broken", fallback="backup", hedge_delay=0.5)
+        assert result["matter_name"] == "GSC Matter" and elapsed < 0.4
+    finally:
+        _cleanup("broken", "backup")
+
+
+def test_circuit_breaker_skips_failing_provider():
+    calls = _fake_provider("broken", 0.0, fail=True)
+    try:
+        for _ in range(ai_service.breaker.failure_threshold):
+            assert _parse("broken")[0] is None
+        assert ai_service.breaker.status()["broken"]["open"]
+        assert _parse("broken")[0] is None
+        assert len(calls) == ai_service.breaker.failure_threshold  # not called while open
+
+        ai_service.breaker._state["broken"][1] = 0.0  # cool-down over: one trial call goes through
+        _parse("broken")
+        assert len(calls) == ai_service.breaker.failure_threshold + 1
+    finally:
+        _cleanup("broken")
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = ai_service.CircuitBreaker(failure_threshold=2, cooldown_seconds=60.0)
+    breaker.record("p", False)
+    assert breaker.allow("p")  # still closed below the threshold
+    breaker.record("p", False)
+    assert not breaker.allow("p")
+
+    breaker._state["p"][1] = 0.0  # cool-down over
+    assert [breaker.allow("p") for _ in range(5)] == [True, False, False, False, False]
+    assert breaker.status()["p"]["half_open"] and not breaker.status()["p"]["open"]
+    breaker.record("p", False)  # the trial failed: open again
+    assert not breaker.allow("p") and breaker.status()["p"]["open"]
+
+    breaker._state["p"][1] = 0.0
+    assert breaker.allow("p") and not breaker.allow("p")
+    breaker.record("p", True)  # the trial succeeded: closed
+    assert all(breaker.allow("p") for _ in range(3))
+    assert breaker.status()["p"] == {"failures": 0, "open": False, "half_open": False}
+
+    # A trial that never reports is replaced after another cool-down
+    for _ in range(2):
+        breaker.record("p", False)
+    breaker._state["p"][1] = 0.0
+    assert breaker.allow("p") and not breaker.allow("p")
+    breaker._state["p"][1] = 0.0
+    assert breaker.allow("p")
+
+
+if __name__ == "__main__":
+    test_fast_provider_answers()
+    test_deadline_returns_none_without_waiting()
+    test_hedged_request_wins_over_slow_primary()
+    test_failed_primary_hedges_immediately()
+    test_circuit_breaker_skips_failing_provider()
+    test_half_open_circuit_lets_one_trial_through()
+    print("SUCCESS: Async AI path honours deadlines, hedging and the circuit breaker.")
@@ -0,0 +1,131 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import ai_cache_service, ai_service, catalog_service, database
+from tests.test_ai_clients import MATTERS_DATA
+
+
+def _use_memory_database():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    previous = ai_cache_service._session_factory
+    ai_cache_service._session_factory = sessionmaker(bind=engine)
+    ai_cache_service._memory = catalog_service.LRUCache(1024)
+    return previous
+
+
+def _restore(previous):
+    ai_cache_service._session_factory = previous
+    ai_cache_service._memory = catalog_service.LRUCache(1024)
+
+
+def test_cache_has_its_own_table():
+    # The settings migration at startup still reads the deprecated user_settings table
+    assert database.AICacheEntry.__tablename__ == "ai_cache"
+    assert database.UserSetting.__tablename__ == "user_settings"
+    assert {"ai_cache", "user_settings"} <= set(database.Base.metadata.tables)
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add(database.UserSetting(key="user_name", value="Alex"))
+        db.add(database.AICacheEntry(key="k", kind="parse", value="{}"))
+        db.commit()
+        assert [(s.key, s.value) for s in db.query(database.UserSetting)] == [("user_name", "Alex")]
+        assert db.query(database.AICacheEntry).count() == 1
+    finally:
+        db.close()
+
+
+def test_cache_survives_restart_and_expires():
+    previous = _use_memory_database()
+    try:
+        key = ai_cache_service.make_key("parse", "claude", "model", "gsc call", "prefix")
+        ai_cache_service.put(key, "parse", {"matter_name": "GSC Matter"})
+        ai_cache_service._memory.clear()  # as after a restart: only SQLite has it
+        assert ai_cache_service.get(key) == {"matter_name": "GSC Matter"}
+
+        db = ai_cache_service._session_factory()
+        db.query(database.AICacheEntry).update(
+            {database.AICacheEntry.created_at: datetime.now() - timedelta(days=ai_cache_service.AI_CACHE_TTL_DAYS + 1)}
+        )
+        db.commit()
+        db.close()
+        ai_cache_service._memory.clear()
+        assert ai_cache_service.get(key) is None
+        assert ai_cache_service.evict() == 1
+        assert ai_cache_service.stats()["rows"] == 0
+    finally:
+        _restore(previous)
+
+
+def test_memory_hits_expire_too():
+    previous = _use_memory_database()
+    ttl = ai_cache_service.AI_CACHE_TTL_DAYS
+    try:
+        key = ai_cache_service.make_key("tags", "claude", "model", "matter 1")
+        ai_cache_service.put(key, "tags", "gsc, call")
+        assert ai_cache_service.get(key) == "gsc, call"
+        # A process that has been up longer than the TTL must not keep serving the memory copy
+        ai_cache_service.AI_CACHE_TTL_DAYS = -1
+        assert ai_cache_service.get(key) is None
+        ai_cache_service.AI_CACHE_TTL_DAYS = ttl
+        assert ai_cache_service.get(key) == "gsc, call"
+    finally:
+        ai_cache_service.AI_CACHE_TTL_DAYS = ttl
+        _restore(previous)
+
+
+def test_size_eviction_drops_oldest():
+    previous = _use_memory_database()
+    limit = ai_cache_service.AI_CACHE_MAX_ENTRIES
+    ai_cache_service.AI_CACHE_MAX_ENTRIES = 3
+    try:
+        for i in range(5):
+            ai_cache_service.put(f"key-{i}", "tags", f"tags {i}")
+            time.sleep(0.001)
+        ai_cache_service.evict()
+        ai_cache_service._memory.clear()
+        assert [ai_cache_service.get(f"key-{i}") for i in range(5)] == [None, None, "tags 2", "tags 3", "tags 4"]
+    finally:
+        ai_cache_service.AI_CACHE_MAX_ENTRIES = limit
+        _restore(previous)
+
+
+def test_parse_results_are_cached_per_prompt_content():
+    previous = _use_memory_database()
+    uncached = ai_service._UNCACHED_PROVIDERS
+    ai_service._UNCACHED_PROVIDERS = set()
+    try:
+        text = "Drafting the tripartite agreement 1h"
+        first = ai_service.parse_log_entry_with_ai(text, MATTERS_DATA, "stub", "key")
+        client = ai_service._clients[("stub", "key")]
+        again = ai_service.parse_log_entry_with_ai("  Drafting the tripartite   agreement 1h", MATTERS_DATA, "stub", "key")
+        assert again == first and client.calls == 1
+
+        # Different matters offered means a different answer may be right
+        ai_service.parse_log_entry_with_ai(text, MATTERS_DATA[1:], "stub", "key")
+        assert client.calls == 2
+
+        key = ai_cache_service.make_key("parse", "warm")
+        ai_cache_service.put(key, "parse", first)
+        start = time.perf_counter()
+        for _ in range(1000):
+            assert ai_cache_service.get(key) == first
+        print(f"warm AI cache hit: {(time.perf_counter() - start) * 1000:.1f} us per lookup")
+    finally:
+        ai_service._UNCACHED_PROVIDERS = uncached
+        ai_service.close_clients()
+        _restore(previous)
+
+
+if __name__ == "__main__":
+    test_cache_has_its_own_table()
+    test_cache_survives_restart_and_expires()
+    test_memory_hits_expire_too()
+    test_size_eviction_drops_oldest()
+    test_parse_results_are_cached_per_prompt_content()
+    print("SUCCESS: AI answers are cached in SQLite.")
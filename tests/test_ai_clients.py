@@ -0,0 +1,100 @@
+import time
+from backend import ai_service, database
+
+MATTERS_DATA = [
+    {"name": "GSC Matter", "external_id": "2000", "description": "General Service Center", "client_name": None},
+    {"name": "Tripartite Agreement", "external_id": None, "description": "Three party agreement", "client_name": "ACME"},
+]
+
+
+def test_client_registry_reuses_and_rotates_clients():
+    ai_service.close_clients()
+    try:
+        first = ai_service._get_client("stub", "key-1")
+        assert ai_service._get_client("stub", "key-1") is first
+
+        # A new key for the same provider replaces and closes the old client
+        second = ai_service._get_client("stub", "key-2")
+        assert second is not first and first.closed and not second.closed
+        assert ("stub", "key-1") not in ai_service._clients
+
+        ai_service.close_clients()
+        assert second.closed and not ai_service._clients
+    finally:
+        ai_service.close_clients()
+
+
+def test_stub_provider_parse():
+    try:
+        result = ai_service.parse_log_entry_with_ai("Drafting the tripartite agreement 1h", MATTERS_DATA, "stub", "key")
+        assert result["matter_name"] == "Tripartite Agreement"
+        assert ai_service.parse_log_entry_with_ai("Lunch 1h", MATTERS_DATA, "stub", "key")["matter_name"] is None
+        assert ai_service._clients[("stub", "key")].calls == 2
+    finally:
+        ai_service.close_clients()
+
+
+def test_prompt_prefix_is_stable():
+    first = ai_service._build_prompt_parts("GSC call 1h", MATTERS_DATA, prefix_key=("catalog", 1))
+    second = ai_service._build_prompt_parts("Tripartite review 2h", MATTERS_DATA, prefix_key=("catalog", 1))
+    assert first.prefix is second.prefix
+    assert "GSC call" not in first.prefix and first.suffix == '\nUser entry: "GSC call 1h"'
+    assert ai_service._build_prompt("GSC call 1h", MATTERS_DATA) == first.prefix + first.suffix
+
+
+def test_usage_hook_reports_cached_tokens():
+    usages = []
+    ai_service.add_usage_hook(usages.append)
+    try:
+        for text in ("GSC call 1h", "Tripartite review 2h"):
+            ai_service.parse_log_entry_with_ai(text, MATTERS_DATA, "stub", "key", prefix_key=("catalog", 1))
+        assert usages[0]["cached_input_tokens"] == 0 and usages[0]["uncached_input_tokens"] > 0
+        assert usages[1]["cached_input_tokens"] > usages[1]["uncached_input_tokens"] > 0
+        assert ai_service.prompt_stats()["tokens"]["stub"]["cached_input_tokens"] >= usages[1]["cached_input_tokens"]
+    finally:
+        ai_service.remove_usage_hook(usages.append)
+        ai_service.close_clients()
+
+
+def test_tags_batch_answer_is_not_cut_off():
+    # A full batch of 20-keyword answers is far longer than a parse answer
+    matters = [database.Matter(id=i, name=f"Matter {i}") for i in range(1, 11)]
+    ai_service.StubClient.tags_answer = ", ".join(f"practice area keyword {k}" for k in range(20))
+    try:
+        raw = ai_service.StubClient.tags_answer * len(matters)
+        assert len(raw) // 4 > ai_service.ANSWER_MAX_TOKENS
+        tags = ai_service.generate_tags_batch(matters, "stub", "key")
+        assert tags == {m.id: ai_service.StubClient.tags_answer for m in matters}
+    finally:
+        ai_service.StubClient.tags_answer = "stub, keywords"
+        ai_service.close_clients()
+
+
+def benchmark_client_reuse(calls=20):
+    text = "Drafting the tripartite agreement 1h"
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        ai_service.close_clients()  # what every call used to do: build a fresh client
+        ai_service.parse_log_entry_with_ai(text, MATTERS_DATA, "stub", "key")
+    fresh = (time.perf_counter() - start) / calls
+
+    ai_service.close_clients()
+    start = time.perf_counter()
+    for _ in range(calls):
+        ai_service.parse_log_entry_with_ai(text, MATTERS_DATA, "stub", "key")
+    pooled = (time.perf_counter() - start) / calls
+    ai_service.close_clients()
+
+    print(f"new client per call: {fresh * 1000:.1f} ms per call")
+    print(f"pooled client:       {pooled * 1000:.1f} ms per call ({fresh / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    test_client_registry_reuses_and_rotates_clients()
+    test_stub_provider_parse()
+    test_prompt_prefix_is_stable()
+    test_usage_hook_reports_cached_tokens()
+    test_tags_batch_answer_is_not_cut_off()
+    print("SUCCESS: AI provider clients are pooled per key.")
+    benchmark_client_reuse()
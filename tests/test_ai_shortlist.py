@@ -0,0 +1,54 @@
+from backend import ai_service, nlp_service, database
+from tests.test_matter_matcher import MATTERS, _synthetic_catalog
+
+
+def _catalog():
+    catalog = _synthetic_catalog(600)
+    catalog.append(database.Matter(id=601, name="Rayong Plant Lease", description="Industrial estate lease"))
+    return catalog
+
+
+def test_shortlist_ranks_exact_hits_first():
+    matcher = nlp_service.MatterMatcher(MATTERS)
+    shortlist = matcher.shortlist("Review comments for matter id 1002", 5)
+    assert shortlist[0].id == 2 and len(shortlist) == 5
+    assert len({m.id for m in shortlist}) == 5
+
+    catalog = _catalog()
+    matcher = nlp_service.MatterMatcher(catalog)
+    target = catalog[123]
+    words = target.name.split()
+    assert target in matcher.shortlist(f"{words[1]} {words[0][:-1]} call", ai_service.AI_SHORTLIST_SIZE)
+
+
+def test_prompt_uses_shortlist_and_widens_on_null():
+    matcher = nlp_service.MatterMatcher(_catalog())
+    ai_service._prompt_log.clear()
+    try:
+        result = ai_service.parse_log_entry_with_shortlist("Rayong Plant Lease negotiation 1h", matcher, "stub", "key")
+        assert result["matter_name"] == "Rayong Plant Lease"
+        assert [c["matters"] for c in ai_service._prompt_log] == [ai_service.AI_SHORTLIST_SIZE]
+
+        # Nothing the stub can name: asked again with the wider list, then gives up
+        result = ai_service.parse_log_entry_with_shortlist("Lunch break 1h", matcher, "stub", "key")
+        assert result["matter_name"] is None
+        assert [c["matters"] for c in ai_service._prompt_log][1:] == [ai_service.AI_SHORTLIST_SIZE, ai_service.AI_SHORTLIST_WIDE]
+        assert ai_service.prompt_stats()["calls"] == 3
+    finally:
+        ai_service.close_clients()
+
+
+def benchmark_prompt_size():
+    catalog = _catalog()
+    text = "Rayong Plant Lease negotiation 1h"
+    full = ai_service._build_prompt(text, ai_service.matters_prompt_data(catalog))
+    matcher = nlp_service.MatterMatcher(catalog)
+    short = ai_service._build_prompt(text, ai_service.matters_prompt_data(matcher.shortlist(text, ai_service.AI_SHORTLIST_SIZE)))
+    print(f"full catalog prompt: {len(full)} chars, shortlist prompt: {len(short)} chars ({len(full) / len(short):.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    test_shortlist_ranks_exact_hits_first()
+    test_prompt_uses_shortlist_and_widens_on_null()
+    print("SUCCESS: AI prompts only carry the shortlisted matters.")
+    benchmark_prompt_size()
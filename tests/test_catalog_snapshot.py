@@ -0,0 +1,42 @@
+from datetime import datetime
+from backend import catalog_service
+
+
+def _record(matter_id, name, is_closed=False):
+    row = (matter_id, name, None, "", None, None, None, "yellow", is_closed, None, datetime(2026, 1, 1), None)
+    return catalog_service.MatterRecord(row)
+
+
+def test_matter_record_is_read_only():
+    record = _record(1, "GSC Matter")
+    assert record.name_lower == "gsc matter"
+    assert record.to_dict()["name"] == "GSC Matter"
+    try:
+        record.name = "Renamed"
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("MatterRecord accepted an assignment")
+
+
+def test_snapshot_patching():
+    snapshot = catalog_service.CatalogSnapshot(0, [_record(1, "A"), _record(2, "B"), _record(4, "D", is_closed=True)])
+    assert [m.id for m in snapshot.open_matters()] == [1, 2]
+
+    added = snapshot.patched(1, record=_record(5, "E"))
+    updated = added.patched(2, record=_record(2, "B2"))
+    removed = updated.patched(3, removed_id=1)
+    reinserted = removed.patched(4, record=_record(3, "C"))
+
+    assert [m.id for m in snapshot] == [1, 2, 4]  # older snapshots are untouched
+    assert [m.id for m in added] == [1, 2, 4, 5]
+    assert updated.get(2).name == "B2" and snapshot.get(2).name == "B"
+    assert removed.get(1) is None and len(removed) == 3
+    assert [m.id for m in reinserted] == [2, 3, 4, 5]
+    assert reinserted.get(3).name == "C" and reinserted.version == 4
+
+
+if __name__ == "__main__":
+    test_matter_record_is_read_only()
+    test_snapshot_patching()
+    print("SUCCESS: Catalog snapshot behaves as expected.")
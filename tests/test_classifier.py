@@ -0,0 +1,182 @@
+import random
+import time
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import catalog_service, classifier_service, database
+
+GENERIC = ["call", "review", "draft", "email", "meeting", "comments", "revise", "client", "notes", "follow"]
+TOPICS = [
+    ("Rayong Plant Lease", ["landlord", "estoppel", "rent", "premises", "renewal"]),
+    ("Bangkok Office Lease", ["fitout", "handover", "deposit", "floor", "tenancy"]),
+    ("Supply Agreement", ["purchase", "orders", "volumes", "pricing", "delivery"]),
+    ("Distribution Agreement", ["territory", "exclusivity", "distributor", "targets", "resale"]),
+    ("Employment Dispute", ["termination", "severance", "labour", "court", "witness"]),
+]
+
+
+def _session(matters, logs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(matters)
+    db.add_all(
+        database.TimeLog(matter_id=matter_id, duration_minutes=60, units=10, description=text, log_date=datetime(2026, 3, 2))
+        for matter_id, text in logs
+    )
+    db.commit()
+    catalog_service.invalidate()
+    classifier_service.reset()
+    return db
+
+
+def _cleanup(db):
+    db.close()
+    catalog_service.invalidate()
+    classifier_service.reset()
+
+
+def _synthetic_logs(count, seed=3, noise=0.0):
+    """
+    Log descriptions built from each matter's own vocabulary plus generic legal chores.
+    With probability `noise` one of the topic words comes from another matter.
+    """
+    rng = random.Random(seed)
+    logs = []
+    for _ in range(count):
+        matter_id = rng.randrange(len(TOPICS)) + 1
+        words = rng.sample(TOPICS[matter_id - 1][1], 2) + rng.sample(GENERIC, rng.randint(1, 3))
+        if rng.random() < noise:
+            words[1] = rng.choice(rng.choice(TOPICS)[1])
+        rng.shuffle(words)
+        logs.append((matter_id, " ".join(words)))
+    return logs
+
+
+def _topic_matters():
+    return [database.Matter(id=i, name=name, description="") for i, (name, _words) in enumerate(TOPICS, start=1)]
+
+
+def test_tokenize_drops_durations_keeps_ids():
+    assert classifier_service.tokenize("Review estoppel for 1.5h, matter 1002") == [
+        "review", "estoppel", "matter", "1002", "review estoppel", "estoppel matter", "matter 1002"
+    ]
+
+
+def test_classifier_resolves_ambiguous_entries():
+    db = _session(_topic_matters(), _synthetic_logs(200))
+    try:
+        # Both leases match the rule stage on "lease"; past logs say estoppel work is Rayong
+        assert classifier_service.classify(db, "Lease: chase landlord estoppel 1h", [1, 2])[0] == 1
+        assert classifier_service.classify(db, "Lease: fitout handover 1h", [1, 2])[0] == 2
+        assert classifier_service.classify(db, "lunch 1h") is None  # nothing it knows
+
+        # New logs are folded in on the next call without retraining
+        db.add_all(
+            database.TimeLog(matter_id=4, duration_minutes=30, units=5, description="incoterms schedule", log_date=datetime(2026, 3, 3))
+            for _ in range(5)
+        )
+        db.commit()
+        assert classifier_service.classify(db, "incoterms schedule 30m")[0] == 4
+        assert classifier_service.stats()["resolved"] >= 3
+    finally:
+        _cleanup(db)
+
+
+def test_closed_matters_are_not_predicted():
+    matters = _topic_matters()
+    matters[0].is_closed = True
+    db = _session(matters, _synthetic_logs(200))
+    try:
+        ranked = classifier_service.predict(db, "landlord estoppel 1h")
+        assert ranked and 1 not in [matter_id for matter_id, _p, _n in ranked]
+    finally:
+        _cleanup(db)
+
+
+def _learned_state(model):
+    """Examples and token counts per matter id, independent of the row order."""
+    examples = {model.matter_ids[row]: int(n) for row, n in enumerate(model.examples[:len(model.matter_ids)]) if n}
+    postings = {
+        token: {model.matter_ids[row]: n for row, n in counts.items()}
+        for token, counts in model.postings.items()
+    }
+    return examples, postings
+
+
+def test_edited_and_deleted_logs_are_unlearned():
+    matters = _topic_matters()
+    db = _session(matters, [(1, "landlord estoppel review"), (1, "estoppel certificate"), (2, "fitout handover call"),
+                            (2, "deposit refund"), (1, "renewal notice"), (2, "floor plans")])
+    try:
+        classifier_service.get_classifier(db)
+        logs = db.query(database.TimeLog).order_by(database.TimeLog.id).all()
+
+        # Misfiled log moved (PUT /api/logs/{id}, revision revert), merge, delete
+        logs[1].matter_id = 2
+        logs[1].description = "handover estoppel"
+        db.commit()
+        logs[4].description = "renewal notice and estoppel"
+        db.flush()
+        logs[4].description = "renewal notice"  # two flushes in one transaction
+        db.commit()
+        logs[2].duration_minutes = 90  # not a label change: nothing to unlearn, but harmless
+        db.delete(logs[3])
+        db.commit()
+        # A rolled-back edit changes nothing
+        logs[0].matter_id = 3
+        db.flush()
+        db.rollback()
+        db.add(database.TimeLog(matter_id=3, duration_minutes=6, units=1, description="supply pricing",
+                                log_date=datetime(2026, 3, 3)))
+        db.commit()
+        assert _learned_state(classifier_service.get_classifier(db))[0] == {1: 2, 2: 3, 3: 1}
+
+        # DELETE /api/matters/{id} removes the logs in bulk, past the flush hook
+        classifier_service.matter_deleted(db, 1)
+        db.query(database.TimeLog).filter(database.TimeLog.matter_id == 1).delete()
+        db.commit()
+
+        incremental = _learned_state(classifier_service.get_classifier(db))
+        classifier_service.reset()
+        assert incremental == _learned_state(classifier_service.get_classifier(db))
+        assert incremental[0] == {2: 3, 3: 1}
+    finally:
+        _cleanup(db)
+
+
+def benchmark_classifier(count=5000, holdout=0.2, noise=0.5):
+    """Train on the older logs, report accuracy and latency on the newest ones."""
+    logs = _synthetic_logs(count, seed=11, noise=noise)
+    split = int(len(logs) * (1 - holdout))
+    model = classifier_service.MatterClassifier()
+    start = time.perf_counter()
+    for matter_id, text in logs[:split]:
+        model.learn(matter_id, text)
+    train_ms = (time.perf_counter() - start) * 1000
+
+    correct = confident = confident_correct = 0
+    start = time.perf_counter()
+    for matter_id, text in logs[split:]:
+        best, probability, _examples = model.predict(text)[0]
+        correct += best == matter_id
+        if probability >= classifier_service.CLASSIFIER_MIN_CONFIDENCE:
+            confident += 1
+            confident_correct += best == matter_id
+    per_prediction_ms = (time.perf_counter() - start) * 1000 / (len(logs) - split)
+
+    held_out = len(logs) - split
+    print(f"trained on {split} logs in {train_ms:.0f} ms; {held_out} held out")
+    print(f"top-1 accuracy: {correct / held_out:.1%}, {per_prediction_ms:.3f} ms per prediction")
+    print(f"confident (p >= {classifier_service.CLASSIFIER_MIN_CONFIDENCE}): {confident / held_out:.1%} of entries, "
+          f"{confident_correct / max(confident, 1):.1%} correct")
+
+
+if __name__ == "__main__":
+    test_tokenize_drops_durations_keeps_ids()
+    test_classifier_resolves_ambiguous_entries()
+    test_closed_matters_are_not_predicted()
+    test_edited_and_deleted_logs_are_unlearned()
+    print("SUCCESS: Past logs resolve ambiguous entries locally.")
+    benchmark_classifier()
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import catalog_service, database, disambiguation_service
+
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        database.Matter(id=1, name="Rayong Plant Lease", description=""),
+        database.Matter(id=2, name="Bangkok Office Lease", description=""),
+        database.Matter(id=3, name="Old Lease", description="", is_closed=True),
+    ])
+    db.commit()
+    catalog_service.invalidate()
+    return db
+
+
+def _cleanup(db):
+    db.close()
+    catalog_service.invalidate()
+
+
+def test_phrase_key_ignores_duration_date_and_order():
+    key = disambiguation_service.phrase_key("Lease review, landlord comments 1.5h yesterday")
+    assert key == disambiguation_service.phrase_key("landlord comments on lease review 30m")
+    assert key == "comments landlord lease review"
+    assert disambiguation_service.phrase_key("1h") is None
+
+
+def test_remembered_choice_is_recalled():
+    db = _session()
+    try:
+        assert disambiguation_service.recall(db, "Lease review 1h") is None
+        disambiguation_service.remember(db, "Lease review 1h", 2)
+        db.commit()
+        assert disambiguation_service.recall(db, "lease review 2h") == 2
+
+        # Conflicting picks: no answer until one matter clearly dominates
+        disambiguation_service.remember(db, "Lease review 1h", 1)
+        db.commit()
+        assert disambiguation_service.recall(db, "lease review") is None
+        for _ in range(3):
+            disambiguation_service.remember(db, "Lease review 1h", 1)
+        db.commit()
+        assert disambiguation_service.recall(db, "lease review") == 1
+    finally:
+        _cleanup(db)
+
+
+def test_same_phrase_twice_in_one_batch():
+    # As /api/log/batch: both picks are remembered in one transaction, on a session without autoflush
+    db = _session()
+    batch = sessionmaker(bind=db.get_bind(), autoflush=False)()
+    try:
+        disambiguation_service.remember(batch, "estoppel review 1h", 1)
+        disambiguation_service.remember(batch, "review estoppel 30m", 1)
+        batch.commit()
+        entries = batch.query(database.DisambiguationEntry).all()
+        assert [(e.phrase_key, e.matter_id) for e in entries] == [("estoppel review", 1)]
+        assert round(entries[0].weight, 3) == 2.0
+    finally:
+        batch.close()
+        _cleanup(db)
+
+
+def test_decay_and_eviction():
+    db = _session()
+    try:
+        disambiguation_service.remember(db, "estoppel 1h", 1)
+        disambiguation_service.remember(db, "old lease filing 1h", 3)  # closed matter
+        disambiguation_service.remember(db, "fitout 1h", 2)
+        db.commit()
+        assert disambiguation_service.recall(db, "old lease filing") is None  # never a closed matter
+
+        # Half a year unused: "estoppel" has faded below the minimum weight
+        long_ago = datetime.now() - timedelta(days=disambiguation_service.MEMORY_HALF_LIFE_DAYS * 4)
+        db.query(database.DisambiguationEntry).filter(
+            database.DisambiguationEntry.matter_id == 1
+        ).update({database.DisambiguationEntry.last_used_at: long_ago})
+        db.commit()
+        assert disambiguation_service.recall(db, "estoppel") is None
+
+        assert disambiguation_service.evict(db) == 2
+        db.commit()
+        assert [e.phrase_key for e in db.query(database.DisambiguationEntry)] == ["fitout"]
+    finally:
+        _cleanup(db)
+
+
+if __name__ == "__main__":
+    test_phrase_key_ignores_duration_date_and_order()
+    test_remembered_choice_is_recalled()
+    test_same_phrase_twice_in_one_batch()
+    test_decay_and_eviction()
+    print("SUCCESS: Matter choices after a 409 are remembered per phrasing.")
@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from backend import database
+
+
+def _file_engine(directory, profile):
+    url = f"sqlite:///{os.path.join(directory, 'timesheet.db')}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return database.attach_profile(engine, profile)
+
+
+def test_tuned_profile_is_applied_to_every_connection():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _file_engine(directory, "tuned")
+        try:
+            report = database.check_profile(engine, "tuned")
+            assert report["journal_mode"]["actual"] == "wal"
+            assert report["synchronous"]["actual"] == 1
+            assert report["busy_timeout"]["actual"] == 5000
+            assert report["temp_store"]["actual"] == 2
+            assert report["cache_size"]["ok"]
+
+            # A second pooled connection gets the per-connection pragmas too
+            with engine.connect() as first, engine.connect() as second:
+                for connection in (first, second):
+                    assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+                    assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        finally:
+            engine.dispose()
+
+
+def test_check_profile_reports_mismatches():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _file_engine(directory, "legacy")
+        try:
+            assert all(item["ok"] for item in database.check_profile(engine, "legacy").values())
+            report = database.check_profile(engine, "tuned")
+            assert not report["journal_mode"]["ok"]
+            assert not report["synchronous"]["ok"]
+        finally:
+            engine.dispose()
+
+
+def test_profile_is_selected_by_environment():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=root, TIMESHEET_DB_PROFILE="legacy")
+        output = subprocess.run([sys.executable, "-c", "from backend import database; print(database.ENGINE_PROFILE)"],
+                                cwd=directory, env=env, capture_output=True, text=True, check=True).stdout
+        assert output.split()[-1] == "legacy"
+
+
+def test_refused_wal_falls_back_to_legacy():
+    # An in-memory database cannot use WAL, like a database on a network drive
+    engine = database.attach_profile(create_engine("sqlite://"))
+    previous = database.ENGINE_PROFILE
+    database.ENGINE_PROFILE = "tuned"
+    try:
+        report = database.ensure_profile(engine)
+        assert database.ENGINE_PROFILE == "legacy"
+        assert report["synchronous"]["actual"] == 2 and report["synchronous"]["ok"]
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -2000
+    finally:
+        database.ENGINE_PROFILE = previous
+        engine.dispose()
+
+
+def test_readers_are_not_blocked_by_an_open_write():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _file_engine(directory, "tuned")
+        try:
+            database.Base.metadata.create_all(bind=engine)
+            with engine.begin() as connection:
+                connection.execute(database.TimeLog.__table__.insert(), {"duration_minutes": 60, "description": "a"})
+            writer = engine.connect()
+            transaction = writer.begin()
+            writer.execute(database.TimeLog.__table__.insert(), {"duration_minutes": 30, "description": "b"})
+            # With the rollback journal this read would wait for the writer's lock
+            with engine.connect() as reader:
+                assert reader.execute(text("SELECT COUNT(*) FROM time_logs")).scalar() == 1
+            transaction.commit()
+            writer.close()
+        finally:
+            engine.dispose()
+
+
+def _run_workload(engine, commits, readers, read_seconds):
+    database.Base.metadata.create_all(bind=engine)
+    table = database.TimeLog.__table__
+    start = time.perf_counter()
+    for i in range(commits):
+        with engine.begin() as connection:
+            connection.execute(table.insert(), {"matter_id": 1, "duration_minutes": 6, "units": 1,
+                                                "description": f"entry {i}", "log_date": datetime.now()})
+    commit_ms = (time.perf_counter() - start) * 1000 / commits
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+
+    def read_loop():
+        while not stop.is_set():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT matter_id, SUM(duration_minutes) FROM time_logs GROUP BY matter_id")).all()
+                counts["reads"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    def write_loop():
+        while not stop.is_set():
+            try:
+                with engine.begin() as connection:
+                    connection.execute(table.insert(), {"matter_id": 2, "duration_minutes": 6, "units": 1,
+                                                        "description": "concurrent", "log_date": datetime.now()})
+                counts["writes"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)] + [threading.Thread(target=write_loop)]
+    for thread in threads:
+        thread.start()
+    time.sleep(read_seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return commit_ms, counts
+
+
+def benchmark_engine_profile(commits=300, readers=3, read_seconds=3.0):
+    """Commit latency and mixed read/write throughput for each profile on a file database."""
+    for profile in ("legacy", "tuned"):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = _file_engine(directory, profile)
+            try:
+                commit_ms, counts = _run_workload(engine, commits, readers, read_seconds)
+            finally:
+                engine.dispose()
+        print(f"{profile:>6}: {commit_ms:.2f} ms per commit; concurrent {counts['reads'] / read_seconds:.0f} reads/s, "
+              f"{counts['writes'] / read_seconds:.0f} writes/s, {counts['errors']} errors")
+
+
+if __name__ == "__main__":
+    test_tuned_profile_is_applied_to_every_connection()
+    test_check_profile_reports_mismatches()
+    test_profile_is_selected_by_environment()
+    test_refused_wal_falls_back_to_legacy()
+    test_readers_are_not_blocked_by_an_open_write()
+    print("SUCCESS: Every SQLite connection runs with the tuned engine profile.")
+    benchmark_engine_profile()
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import migrate_database
+from backend import database, migrate_db_log_day
+
+# time_logs as created by releases before log_day and the log_date indexes
+OLD_TIME_LOGS = """CREATE TABLE time_logs (
+    id INTEGER PRIMARY KEY, matter_id INTEGER, duration_minutes INTEGER, description TEXT,
+    log_date DATETIME, created_at DATETIME, units INTEGER DEFAULT 0
+)"""
+
+
+def _old_database(directory):
+    path = os.path.join(directory, "timesheet.db")
+    conn = sqlite3.connect(path)
+    conn.execute(OLD_TIME_LOGS)
+    conn.executemany(
+        "INSERT INTO time_logs (matter_id, duration_minutes, description, log_date, units) VALUES (?, ?, ?, ?, ?)",
+        [(1, 60, "a", "2026-03-02 09:15:00.000000", 10), (1, 30, "b", "2026-03-02 23:59:59", 5),
+         (2, 12, "c", "2026-12-31 08:00:00.000000", 2), (2, 6, "d", None, 1)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _plan(conn, sql, params=()):
+    return " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_migration_adds_log_day_and_indexes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = _old_database(directory)
+        conn = sqlite3.connect(path)
+        # Left by releases that summed per-matter totals from time_logs
+        conn.execute("CREATE INDEX ix_time_logs_matter_totals ON time_logs (matter_id, created_at, duration_minutes, units)")
+        conn.close()
+        migrate_db_log_day.add_log_day_column(path)
+        migrate_db_log_day.add_log_day_column(path)  # idempotent
+
+        conn = sqlite3.connect(path)
+        try:
+            assert [row[0] for row in conn.execute("SELECT log_day FROM time_logs ORDER BY id")] == [
+                20260302, 20260302, 20261231, None
+            ]
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+            assert set(migrate_db_log_day.INDEXES) <= indexes
+            assert not indexes & set(migrate_db_log_day.OBSOLETE_INDEXES)
+
+            assert "SEARCH time_logs USING INDEX ix_time_logs_log_date" in _plan(
+                conn, "SELECT * FROM time_logs WHERE log_date >= ? AND log_date <= ?", ("2026-03-01", "2026-03-07")
+            )
+            assert "USING COVERING INDEX ix_time_logs_matter_id_log_date" in _plan(
+                conn, "SELECT matter_id, COUNT(*), MAX(log_date) FROM time_logs GROUP BY matter_id"
+            )
+            assert "ix_time_logs_log_day" in _plan(conn, "SELECT id FROM time_logs WHERE log_day = ?", (20260302,))
+            assert "SCAN time_logs" not in _plan(
+                conn, "SELECT log_day, COUNT(*) FROM time_logs WHERE log_day BETWEEN ? AND ? GROUP BY log_day",
+                (20260301, 20260307),
+            )
+        finally:
+            conn.close()
+
+
+def test_standalone_tool_applies_the_same_migration():
+    with tempfile.TemporaryDirectory() as directory:
+        path = _old_database(directory)
+        conn = sqlite3.connect(path)
+        try:
+            cursor = conn.cursor()
+            pending = [m["id"] for m in migrate_database.check_schema(cursor) if m["table"] == "time_logs"]
+            assert pending == ["009", "010", "011", "012", "013"]
+            pending = [m for m in migrate_database.check_schema(cursor) if m["table"] == "time_logs"]
+            applied, failed = migrate_database.apply_migrations(conn, cursor, pending)
+            assert (applied, failed) == (5, 0)
+            assert not [m for m in migrate_database.check_schema(cursor) if m["table"] == "time_logs"]
+            assert conn.execute("SELECT log_day FROM time_logs WHERE id = 3").fetchone()[0] == 20261231
+        finally:
+            conn.close()
+
+
+def test_orm_writes_keep_log_day_in_step():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        log = database.TimeLog(matter_id=1, duration_minutes=60, units=10, description="x",
+                               log_date=datetime(2026, 3, 2, 23, 30))
+        undated = database.TimeLog(matter_id=1, duration_minutes=6, units=1, description="now")
+        db.add_all([log, undated])
+        db.commit()
+        assert log.log_day == 20260302
+        assert undated.log_day == database.day_key(datetime.now())
+
+        log.log_date = datetime(2026, 3, 3, 0, 5)
+        db.commit()
+        assert db.query(database.TimeLog.log_day).filter(database.TimeLog.id == log.id).scalar() == 20260303
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_migration_adds_log_day_and_indexes()
+    test_standalone_tool_applies_the_same_migration()
+    test_orm_writes_keep_log_day_in_step()
+    print("SUCCESS: time_logs is indexed by date and bucketed by day.")
@@ -0,0 +1,145 @@
+import re
+import time
+from datetime import datetime
+from backend import nlp_service
+
+
+# --- Original implementations, kept for parity checks and the benchmark ---
+
+def _legacy_extract_duration(text):
+    text = text.lower()
+    total_minutes = 0
+    hours_match = re.search(r'(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours)', text)
+    if hours_match:
+        total_minutes += int(float(hours_match.group(1)) * 60)
+    minutes_match = re.search(r'(\d+)\s*(m|min|mins|minute|minutes)', text)
+    if minutes_match:
+        total_minutes += int(minutes_match.group(1))
+    return total_minutes
+
+
+def _legacy_extract_date(text):
+    text = text.lower()
+    now = datetime.now()
+    months = {
+        'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+        'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+        'aug': 8, 'august': 8, 'sep': 9, 'september': 9, 'oct': 10, 'october': 10,
+        'nov': 11, 'november': 11, 'dec': 12, 'december': 12
+    }
+    month_pattern = '|'.join(months.keys())
+    match1 = re.search(rf'(\d{{1,2}})\s*({month_pattern})\s*(\d{{4}})?', text)
+    if match1:
+        year = int(match1.group(3)) if match1.group(3) else now.year
+        try:
+            return datetime(year, months[match1.group(2)], int(match1.group(1)))
+        except ValueError:
+            pass
+    match2 = re.search(r'(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})', text)
+    if match2:
+        try:
+            return datetime(int(match2.group(3)), int(match2.group(2)), int(match2.group(1)))
+        except ValueError:
+            pass
+    match3 = re.search(r'\b(\d{1,2})[/\-](\d{1,2})\b', text)
+    if match3:
+        context_keywords = [r'\bon\b', r'\bdate\b', r'\bdated\b', r'\bat\b']
+        text_before = text[:match3.start()]
+        has_context = any(re.search(kw, text_before) for kw in context_keywords)
+        day, month = int(match3.group(1)), int(match3.group(2))
+        try:
+            if 1 <= month <= 12 and 1 <= day <= 31 and has_context:
+                return datetime(now.year, month, day)
+        except ValueError:
+            pass
+    return None
+
+
+def _legacy_clean_description(text, matter_name=None):
+    clean_desc = text
+    if matter_name:
+        prefix = f"Worked on {matter_name}"
+        if clean_desc.lower().startswith(prefix.lower()):
+            clean_desc = clean_desc[len(prefix):].strip()
+    duration_pattern = r'(?:\bfor\b\s*)?(\d+(\.\d+)?)\s*(h|hr|hrs|hour|hours|m|min|mins|minute|minutes)\b'
+    clean_desc = re.sub(duration_pattern, '', clean_desc, flags=re.IGNORECASE)
+    clean_desc = re.sub(r'^[\s,\.\-]+', '', clean_desc)
+    clean_desc = re.sub(r'[\s,\.\-]+$', '', clean_desc)
+    clean_desc = re.sub(r'\s{2,}', ' ', clean_desc)
+    return clean_desc.strip()
+
+
+CORPUS = [
+    ("on 16 Feb 2026", None),
+    ("16/02/2026", None),
+    ("16-02-2026", None),
+    ("meeting on 16 Feb", None),
+    ("log date 16/02", None),
+    ("Matter 1404 for 2 hours on 16 Feb 2026", None),
+    ("worked 30m on 20/05/2026", None),
+    ("No date here 1h", None),
+    ("Matter 14/04 for 2h", None),
+    ("14/04", None),
+    ("Drafting contract 1h 30m", None),
+    ("Matter 1404 MOU for 2 hours on 16 Feb 2026", None),
+    ("Matter 1404 email 1h on 14 Feb 2026", None),
+    ("call at 31/02 about lease 45 mins", None),
+    ("32 January review 1.5 hrs", None),
+    (".., Update backend and frontend of timesheet assistance, 1.5 hours", None),
+    ("Review contracts for 30 mins", None),
+    ("Worked on GSC Matter - draft email 15m", "GSC Matter"),
+    ("- Phone call with client, 1 hr.", None),
+    ("Research for meeting, 2.5 hours.", None),
+    ("   Clean up formatting   ", None),
+    ("Worked on ช่วย Review เอกสาร MOU review MOU for 45 minutes", "ช่วย Review เอกสาร MOU"),
+    ("İstanbul office call 20 min", None),
+]
+
+
+def test_parser_matches_legacy_functions():
+    parser = nlp_service.LogEntryParser()
+    for text, matter_name in CORPUS:
+        entry = parser.parse(text)
+        assert entry.duration == _legacy_extract_duration(text) == nlp_service.extract_duration(text), text
+        assert entry.date == _legacy_extract_date(text) == nlp_service.extract_date(text), text
+        expected_desc = _legacy_clean_description(text, matter_name)
+        assert entry.description(matter_name) == expected_desc == nlp_service.clean_description(text, matter_name), text
+
+
+def test_parser_spans():
+    entry = nlp_service.LogEntryParser().parse("Drafting contract 1h 30m on 16 Feb 2026")
+    text = entry.text
+    assert entry.duration == 90
+    assert [text[s:e] for s, e in entry.spans["duration"]] == ["1h", "30m"]
+    start, end = entry.spans["date"]
+    assert text[start:end] == "16 Feb 2026"
+
+
+def benchmark_parser(rounds=2000):
+    texts = [text for text, _ in CORPUS]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            _legacy_extract_duration(text)
+            _legacy_extract_date(text)
+            _legacy_clean_description(text)
+    legacy = time.perf_counter() - start
+
+    parser = nlp_service.LogEntryParser()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            parser.parse(text).description()
+    parsed = time.perf_counter() - start
+
+    per_entry = rounds * len(texts)
+    print(f"legacy functions: {legacy / per_entry * 1e6:.1f} us per entry")
+    print(f"LogEntryParser:   {parsed / per_entry * 1e6:.1f} us per entry ({legacy / parsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    test_parser_matches_legacy_functions()
+    test_parser_spans()
+    print("SUCCESS: LogEntryParser matches the legacy functions.")
+    benchmark_parser()
@@ -0,0 +1,43 @@
+import urllib.request
+import urllib.error
+import json
+
+BASE_URL = "http://127.0.0.1:8000"
+MATTER_NAME = "Rayong Preview Plant Lease"
+
+
+def _call(method, path, data=None):
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(BASE_URL + path, data=body, headers={"Content-Type": "application/json"}, method=method)
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def test_preview_endpoint():
+    # Irregular whitespace: the matcher sees the normalized text, spans must index this one
+    text = "  Reviewed the Rayong  Preview Plant\tLease draft   1h 30m"
+    try:
+        if not any(m["name"] == MATTER_NAME for m in _call("GET", "/api/matters")):
+            _call("POST", "/api/matters/manual", {"name": MATTER_NAME})
+    except urllib.error.URLError as e:
+        print(f"ERROR: {e}")
+        return
+    matter_id = next(m["id"] for m in _call("GET", "/api/matters") if m["name"] == MATTER_NAME)
+
+    try:
+        preview = _call("POST", "/api/log/preview", {"text": text})
+        print("Response:", preview)
+
+        assert preview["matched"], preview
+        assert preview["candidates"][0]["id"] == matter_id
+        assert preview["duration"] == 90
+        matter_spans = preview["spans"]["matter"]
+        assert [" ".join(text[start:end].split()) for start, end in matter_spans] == [MATTER_NAME]
+        assert [text[start:end] for start, end in preview["spans"]["duration"]] == ["1h", "30m"]
+        print("SUCCESS: Preview matter, duration and spans line up with the entry text.")
+    finally:
+        _call("DELETE", f"/api/matters/{matter_id}")
+
+
+if __name__ == "__main__":
+    test_preview_endpoint()
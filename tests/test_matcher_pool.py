@@ -0,0 +1,58 @@
+import gc
+from backend import nlp_service, matcher_pool, database, catalog_service
+from tests.test_matter_matcher import MATTERS, QUERIES, _synthetic_catalog
+
+
+def test_sharded_matcher_matches_single_process():
+    catalog = MATTERS + _synthetic_catalog(150)[11:]
+    single = nlp_service.MatterMatcher(catalog)
+    pool = matcher_pool.ShardedMatterMatcher(catalog, processes=2)
+    try:
+        texts = QUERIES + [f"{m.name.split()[1]} {m.name.split()[0][:-1]} call" for m in catalog[20::15]]
+        for text in texts:
+            for top_k in (None, 3):
+                expected = [m.id for m in single.match(text, 40, top_k)]
+                actual = [m.id for m in pool.match(text, 40, top_k)]
+                assert actual == expected, f"{text!r}: expected {expected}, got {actual}"
+            # Exact hits of every shard rank first, so only the best candidate is guaranteed to agree
+            expected = single.shortlist(text, 10)
+            actual = pool.shortlist(text, 10)
+            assert [m.id for m in actual[:1]] == [m.id for m in expected[:1]], text
+
+        # Workers must see catalog changes
+        renamed = database.Matter(id=3, name="Tripartite Supply Agreement", description="Renamed", external_id="1003")
+        for matcher in (single, pool):
+            matcher.update(renamed)
+            matcher.remove(4)
+        for text in ["supply agreement tripartite", "GSC Matter work", "id 2000 GSC work"]:
+            assert [m.id for m in pool.match(text)] == [m.id for m in single.match(text)]
+        assert len(pool) == len(single)
+    finally:
+        pool.close()
+
+
+def test_invalidated_pool_finishes_in_flight_queries():
+    pool = matcher_pool.ShardedMatterMatcher(MATTERS, processes=2)
+    workers = [worker for worker, _conn in pool._shards]
+    previous = catalog_service._matcher
+    catalog_service._matcher = pool
+    try:
+        # A request fetched the matcher, then the catalog was invalidated under it
+        catalog_service.invalidate()
+        assert catalog_service._matcher is None
+        assert [m.id for m in pool.match("GSC Matter work")]
+        assert pool.shortlist("GSC Matter work", 3)
+        assert all(worker.is_alive() for worker in workers)
+
+        # Once the request lets go, the workers stop
+        del pool
+        gc.collect()
+        assert not any(worker.is_alive() for worker in workers)
+    finally:
+        catalog_service._matcher = previous
+
+
+if __name__ == "__main__":
+    test_sharded_matcher_matches_single_process()
+    test_invalidated_pool_finishes_in_flight_queries()
+    print("SUCCESS: Sharded matcher agrees with the in-process matcher.")
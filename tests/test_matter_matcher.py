@@ -0,0 +1,206 @@
+import re
+from thefuzz import fuzz
+from backend import nlp_service, database, catalog_service
+
+
+def _reference_match(text, matters, threshold=60):
+    """The original linear-scan implementation of match_matter, kept for parity checks."""
+    candidates = []
+    if not matters:
+        return []
+
+    for m in matters:
+        if m.external_id:
+            if re.search(r'\b' + re.escape(m.external_id) + r'\b', text):
+                return [m]
+
+    text_lower = text.lower()
+    for m in matters:
+        if m.name.lower() in text_lower:
+            candidates.append(m)
+    if candidates:
+        return candidates
+
+    text_words = set(re.findall(r'\w+', text_lower))
+    for m in matters:
+        name_words = re.findall(r'\w+', m.name.lower())
+        if not name_words:
+            continue
+        all_found = True
+        for word in name_words:
+            if word.isalnum() and len(word) <= 3 and word.isascii():
+                if word not in text_words:
+                    all_found = False
+                    break
+            else:
+                if word not in text_lower:
+                    all_found = False
+                    break
+        if all_found:
+            candidates.append(m)
+    if candidates:
+        return candidates
+
+    fuzzy_candidates = []
+    for m in matters:
+        search_str = f"{m.name} {m.description}"
+        max_score = max(fuzz.token_set_ratio(text, search_str), fuzz.partial_ratio(text, search_str))
+        if max_score >= threshold:
+            fuzzy_candidates.append((m, max_score))
+    fuzzy_candidates.sort(key=lambda x: x[1], reverse=True)
+    return [c[0] for c in fuzzy_candidates]
+
+
+MATTERS = [
+    database.Matter(id=1, name="General", description="Unassigned time", external_id="0001"),
+    database.Matter(id=2, name="MOU Review", description="Reviewing MOUs with partners", external_id="1002"),
+    database.Matter(id=3, name="Tripartite Agreement", description="Three party agreement drafting", external_id="1003"),
+    database.Matter(id=4, name="GSC Matter", description="General Service Center requests", external_id="2000"),
+    database.Matter(id=5, name="DOW Chemical Rebate", description="Rebates and refunds", external_id="3000"),
+    database.Matter(id=6, name="Thai Text ซ่อมแซม", description="Repair works", external_id="4000"),
+    database.Matter(id=7, name="MOU Review Matter", description="Reviewing MOUs"),
+    database.Matter(id=8, name="ช่วย Review เอกสาร MOU", description="Subject: RE: Request Form ID: 1404..."),
+    database.Matter(id=9, name="Lease of Rayong Plant", description=None, external_id="SCG-77"),
+    database.Matter(id=10, name="HR Policy", description="Employment handbook update", external_id="2000"),
+    database.Matter(id=11, name="Review", description="Generic review bucket"),
+]
+
+QUERIES = [
+    "Worked on matter id 1003",
+    "Review comments for matter id 1002",
+    "id 2000 GSC work",
+    "Drafting the Tripartite Agreement today",
+    "Please Review MOU for approval",
+    "Going to do Thai Text ซ่อมแซม now",
+    "Agreement Tripartite drafting",
+    "Rebate for DOW Chemical",
+    "DOW Chemical",
+    "GSC request",
+    "Unknown work",
+    "Review comments from BD team on the draft Tripartite Agreement for 30 minutes, matter id 1404",
+    "Worked on ช่วย Review เอกสาร MOU review MOU for 45 minutes",
+    "Call about SCG-77 lease 1h",
+    "scg-77 lower case id",
+    "Rayong plant lease negotiation",
+    "policy hr employment",
+    "10021003 not an id",
+    "",
+]
+
+
+def test_matcher_parity():
+    matcher = nlp_service.MatterMatcher(MATTERS)
+    for text in QUERIES:
+        for threshold in (40, 60, 80):
+            expected = [m.id for m in _reference_match(text, MATTERS, threshold)]
+            actual = [m.id for m in matcher.match(text, threshold)]
+            assert actual == expected, f"{text!r} @ {threshold}: expected {expected}, got {actual}"
+
+
+def test_matcher_fuzzy_top_k():
+    matcher = nlp_service.MatterMatcher(MATTERS)
+    for text in ["Agreement Tripartite drafting", "Unknown work", "policy hr employment"]:
+        expected = [m.id for m in _reference_match(text, MATTERS, 40)][:3]
+        actual = [m.id for m in matcher.match(text, 40, top_k=3)]
+        assert actual == expected, f"{text!r}: expected {expected}, got {actual}"
+
+
+def test_matcher_incremental_updates():
+    matcher = nlp_service.MatterMatcher(MATTERS[:6])
+    for m in MATTERS[6:]:
+        matcher.add(m)
+
+    renamed = database.Matter(id=3, name="Tripartite Supply Agreement", description="Renamed", external_id="1003")
+    matcher.update(renamed)
+    matcher.remove(4)
+    current = [renamed if m.id == 3 else m for m in MATTERS if m.id != 4]
+
+    for text in QUERIES + ["supply agreement tripartite", "GSC Matter work"]:
+        expected = [m.id for m in _reference_match(text, current)]
+        actual = [m.id for m in matcher.match(text)]
+        assert actual == expected, f"{text!r}: expected {expected}, got {actual}"
+
+
+def _synthetic_catalog(size, seed=7):
+    import random
+    rng = random.Random(seed)
+    syllables = ["con", "tract", "lease", "mer", "ger", "sup", "ply", "ten", "der", "ซ่อม", "แซม", "สัญ", "ญา", "dis", "pute"]
+    matters = []
+    for i in range(size):
+        name = " ".join("".join(rng.choice(syllables) for _ in range(3)) for _ in range(2))
+        matters.append(database.Matter(id=i + 1, name=f"{name} {i}", description=f"Matter for client {i % 97}"))
+    return matters
+
+
+def test_trigram_prefilter():
+    catalog = _synthetic_catalog(2000)
+    matcher = nlp_service.MatterMatcher(catalog)
+    assert len(matcher) > nlp_service.PREFILTER_CANDIDATES
+
+    for target in catalog[::250]:
+        # Misspell the name so that only the fuzzy stage can find it
+        words = target.name.split()
+        text = f"{words[1]} {words[0][:-1]} meeting"
+        expected = _reference_match(text, catalog)
+        actual = matcher.match(text, top_k=5)
+        assert actual and expected and actual[0].id == expected[0].id, text
+
+
+def test_match_matter_wrapper():
+    assert nlp_service.match_matter("anything", []) == []
+    assert [m.id for m in nlp_service.match_matter("id 2000 GSC work", MATTERS)] == [4]
+
+
+def test_match_spans():
+    matcher = nlp_service.MatterMatcher(MATTERS)
+    cases = {
+        "Worked on matter id 1003": ["1003"],
+        "Drafting the Tripartite Agreement today": ["Tripartite Agreement"],
+        "Agreement Tripartite drafting": ["Agreement", "Tripartite"],
+        "policy hr employment": ["policy", "hr"],
+    }
+    for text, expected in cases.items():
+        stage, scored = matcher.match_scored(text, 40, top_k=1)
+        spans = nlp_service.match_spans(text, scored[0][0], stage)
+        assert [text[start:end] for start, end in spans] == expected, text
+
+
+def test_match_spans_on_unnormalized_text():
+    # The cached matcher sees the whitespace-normalized entry; spans must still index the raw one
+    matcher = nlp_service.MatterMatcher(MATTERS)
+    cases = {
+        "  Drafting the Tripartite   Agreement today": ["Tripartite   Agreement"],
+        "Worked on\tmatter id  1003 ": ["1003"],
+        " Agreement \n Tripartite drafting": ["Agreement", "Tripartite"],
+    }
+    for text, expected in cases.items():
+        stage, scored = catalog_service.match_scored(matcher, text, 40, top_k=1)
+        spans = catalog_service.match_spans(text, scored[0][0], stage)
+        assert [text[start:end] for start, end in spans] == expected, text
+
+
+def benchmark_catalog_sizes():
+    import time
+    for size in (500, 5000, 50000):
+        catalog = _synthetic_catalog(size)
+        matcher = nlp_service.MatterMatcher(catalog)
+        texts = [f"{m.name.split()[1]} {m.name.split()[0][:-1]} call" for m in catalog[::max(1, size // 50)]]
+        for text in texts:
+            matcher.match(text, top_k=10)  # warm the lazily built posting arrays
+        start = time.perf_counter()
+        for text in texts:
+            matcher.match(text, top_k=10)
+        elapsed = (time.perf_counter() - start) / len(texts)
+        print(f"{size:>7} matters: {elapsed * 1000:.2f} ms per fuzzy match")
+
+
+if __name__ == "__main__":
+    test_matcher_parity()
+    test_matcher_fuzzy_top_k()
+    test_matcher_incremental_updates()
+    test_trigram_prefilter()
+    test_match_matter_wrapper()
+    test_match_spans()
+    test_match_spans_on_unnormalized_text()
+    print("SUCCESS: MatterMatcher matches the reference implementation.")
+    benchmark_catalog_sizes()
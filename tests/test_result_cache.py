@@ -0,0 +1,60 @@
+from backend import catalog_service, nlp_service
+from tests.test_matter_matcher import MATTERS
+
+
+class CountingMatcher(nlp_service.MatterMatcher):
+    def __init__(self, matters):
+        super().__init__(matters)
+        self.calls = 0
+
+    def match_scored(self, text, threshold=60, top_k=None):
+        self.calls += 1
+        return super().match_scored(text, threshold, top_k)
+
+
+def test_lru_cache_eviction_and_counters():
+    cache = catalog_service.LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 2, "misses": 1}
+
+
+def test_match_cache_hits_until_catalog_changes():
+    matcher = CountingMatcher(MATTERS)
+    first = catalog_service.match(matcher, "Drafting the Tripartite Agreement today", top_k=10)
+    again = catalog_service.match(matcher, "  Drafting the   Tripartite Agreement today ", top_k=10)
+    assert [m.id for m in again] == [m.id for m in first] == [3]
+    assert matcher.calls == 1
+
+    # Any matter mutation bumps the catalog version, so the next lookup recomputes
+    catalog_service.matter_deleted(3)
+    matcher.remove(3)
+    after = catalog_service.match(matcher, "Drafting the Tripartite Agreement today", top_k=10)
+    assert matcher.calls == 2
+    assert 3 not in [m.id for m in after]
+
+
+def test_ai_parse_cache():
+    calls = []
+
+    def parse():
+        calls.append(1)
+        return {"matter_name": "GSC Matter", "duration_minutes": 30}
+
+    for _ in range(3):
+        result = catalog_service.cached_ai_parse("GSC Matter 30m review", "claude", parse)
+        result["matter_name"] = "mutated by caller"
+    assert len(calls) == 1
+    assert catalog_service.cached_ai_parse("GSC Matter 30m review", "gemini", parse)["matter_name"] == "GSC Matter"
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_lru_cache_eviction_and_counters()
+    test_match_cache_hits_until_catalog_changes()
+    test_ai_parse_cache()
+    print("SUCCESS: Result caches behave as expected.")
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import ai_service, catalog_service, database, revision_service
+
+
+def _use_memory_database():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    previous = revision_service._session_factory
+    revision_service._session_factory = sessionmaker(bind=engine)
+    catalog_service.invalidate()
+
+    db = revision_service._session_factory()
+    db.add_all([
+        database.Matter(id=1, name="GSC Matter", description="General Service Center"),
+        database.Matter(id=2, name="Tripartite Agreement", description="Three party agreement"),
+    ])
+    db.add(database.TimeLog(id=10, matter_id=1, duration_minutes=60, units=10,
+                            description="Tripartite call", log_date=datetime(2026, 3, 2)))
+    db.commit()
+    db.close()
+    return previous
+
+
+def _restore(previous):
+    revision_service._session_factory = previous
+    catalog_service.invalidate()
+
+
+def _fake_provider(name, matter_name, duration=None):
+    def call(prompt, api_key):
+        return json.dumps({"matter_name": matter_name, "duration_minutes": duration, "date": None, "description": None})
+
+    ai_service._PROVIDER_CALLS[name] = call
+    ai_service._UNCACHED_PROVIDERS.add(name)
+
+
+def _cleanup(name):
+    ai_service._PROVIDER_CALLS.pop(name, None)
+    ai_service._UNCACHED_PROVIDERS.discard(name)
+    catalog_service._ai_parse_cache.clear()
+
+
+def _refine(provider):
+    asyncio.run(revision_service.refine_log(10, "Tripartite call 1h", provider, "key"))
+
+
+def test_disagreeing_ai_creates_revision_that_can_be_reverted():
+    previous = _use_memory_database()
+    _fake_provider("refiner", "Tripartite Agreement", 90)
+    try:
+        _refine("refiner")
+        db = revision_service._session_factory()
+        log = db.query(database.TimeLog).filter(database.TimeLog.id == 10).first()
+        assert (log.matter_id, log.duration_minutes, log.units) == (2, 90, 15)
+
+        [revision] = revision_service.list_revisions(db)
+        assert revision["old"]["matter"] == "GSC Matter" and revision["new"]["matter"] == "Tripartite Agreement"
+
+        assert revision_service.resolve_revision(db, revision["id"], accept=False).status == "reverted"
+        db.refresh(log)
+        assert (log.matter_id, log.duration_minutes, log.units) == (1, 60, 10)
+        assert revision_service.list_revisions(db) == []
+        try:
+            revision_service.resolve_revision(db, revision["id"], accept=True)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("A resolved revision was resolved twice")
+        assert revision_service.resolve_revision(db, 999, accept=True) is None
+        db.close()
+    finally:
+        _cleanup("refiner")
+        _restore(previous)
+
+
+def test_revert_refuses_to_overwrite_a_later_edit():
+    previous = _use_memory_database()
+    _fake_provider("refiner", "Tripartite Agreement", 90)
+    try:
+        _refine("refiner")
+        db = revision_service._session_factory()
+        [revision] = revision_service.list_revisions(db)
+        log = db.query(database.TimeLog).filter(database.TimeLog.id == 10).first()
+        log.description = "edited by the user"  # PUT /api/logs/{id} after the refinement
+        db.commit()
+
+        try:
+            revision_service.resolve_revision(db, revision["id"], accept=False)
+        except revision_service.RevisionConflict:
+            pass
+        else:
+            raise AssertionError("A revert overwrote a later edit")
+        db.refresh(log)
+        assert (log.matter_id, log.duration_minutes, log.description) == (2, 90, "edited by the user")
+        assert [r["id"] for r in revision_service.list_revisions(db)] == [revision["id"]]
+
+        # Accepting keeps the log as it is
+        assert revision_service.resolve_revision(db, revision["id"], accept=True).status == "accepted"
+        db.close()
+    finally:
+        _cleanup("refiner")
+        _restore(previous)
+
+
+def test_agreeing_ai_leaves_log_alone():
+    previous = _use_memory_database()
+    _fake_provider("refiner", "GSC Matter")
+    try:
+        _refine("refiner")
+        db = revision_service._session_factory()
+        assert db.query(database.LogRevision).count() == 0
+        assert db.query(database.TimeLog).filter(database.TimeLog.id == 10).first().matter_id == 1
+        db.close()
+    finally:
+        _cleanup("refiner")
+        _restore(previous)
+
+
+if __name__ == "__main__":
+    test_disagreeing_ai_creates_revision_that_can_be_reverted()
+    test_revert_refuses_to_overwrite_a_later_edit()
+    test_agreeing_ai_leaves_log_alone()
+    print("SUCCESS: Speculative logs are refined and can be reverted.")
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import catalog_service, database, revision_service, rollup_service, summary_service
+import migrate_database
+from tests.test_log_day import _old_database
+from tests.test_summary import NOW, _add_logs
+
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([database.Matter(id=1, name="Alpha", description=""), database.Matter(id=2, name="Beta", description="")])
+    db.commit()
+    return db
+
+
+def _totals(db):
+    return {
+        (t.matter_id, t.log_day): (t.minutes, t.units, t.count)
+        for t in db.query(database.DailyTotal)
+    }
+
+
+def _log(matter_id, minutes, log_date):
+    return database.TimeLog(matter_id=matter_id, duration_minutes=minutes, units=minutes // 6,
+                            description="work", log_date=log_date)
+
+
+def test_orm_writes_keep_the_rollup_in_step():
+    db = _session()
+    try:
+        first = _log(1, 60, datetime(2026, 3, 2, 9))
+        second = _log(1, 30, datetime(2026, 3, 2, 14))
+        db.add_all([first, second, _log(2, 12, datetime(2026, 3, 3, 9))])
+        db.commit()
+        assert _totals(db) == {(1, 20260302): (90, 15, 2), (2, 20260303): (12, 2, 1)}
+
+        # Edit: duration, then date, then matter (as a revision revert would)
+        second.duration_minutes, second.units = 36, 6
+        db.commit()
+        assert _totals(db)[(1, 20260302)] == (96, 16, 2)
+        second.log_date = datetime(2026, 3, 4, 10)
+        db.commit()
+        assert _totals(db)[(1, 20260302)] == (60, 10, 1) and _totals(db)[(1, 20260304)] == (36, 6, 1)
+        second.matter_id = 2
+        db.commit()
+        assert (1, 20260304) not in _totals(db) and _totals(db)[(2, 20260304)] == (36, 6, 1)
+
+        # A change that is rolled back leaves the rollup as it was
+        first.duration_minutes = 600
+        db.flush()
+        db.rollback()
+        assert _totals(db)[(1, 20260302)] == (60, 10, 1)
+
+        # Delete removes the row once its last log is gone
+        db.delete(db.get(database.TimeLog, second.id))
+        db.commit()
+        assert _totals(db) == {(1, 20260302): (60, 10, 1), (2, 20260303): (12, 2, 1)}
+        assert rollup_service.verify(db) == []
+    finally:
+        db.close()
+
+
+def test_merge_and_bulk_deletes():
+    db = _session()
+    try:
+        logs = [_log(1, minutes, datetime(2026, 3, 2, 9 + i)) for i, minutes in enumerate((6, 12, 18))]
+        db.add_all(logs + [_log(2, 60, datetime(2026, 3, 2, 9))])
+        db.commit()
+
+        # Merge as /api/logs/merge does: fold into the first log, delete the others
+        logs[0].duration_minutes, logs[0].units = 36, 6
+        db.delete(logs[1])
+        db.delete(logs[2])
+        db.commit()
+        assert _totals(db)[(1, 20260302)] == (36, 6, 1)
+
+        # DELETE /api/matters/{id}
+        db.query(database.TimeLog).filter(database.TimeLog.matter_id == 2).delete()
+        rollup_service.matter_deleted(db, 2)
+        db.commit()
+        assert rollup_service.verify(db) == [] and set(_totals(db)) == {(1, 20260302)}
+
+        # /api/reset
+        db.query(database.TimeLog).delete()
+        rollup_service.reset(db)
+        db.commit()
+        assert _totals(db) == {}
+    finally:
+        db.close()
+
+
+def _dependent_rows(db):
+    return {
+        "revisions": sorted(r.log_id for r in db.query(database.LogRevision)),
+        "tag_jobs": sorted(j.matter_id for j in db.query(database.TagJob)),
+        "disambiguation": sorted(e.matter_id for e in db.query(database.DisambiguationEntry)),
+    }
+
+
+def test_bulk_deletes_drop_dependent_rows():
+    db = _session()
+    try:
+        db.add(database.Matter(id=3, name="Gamma", description=""))
+        logs = [_log(1, 6, datetime(2026, 3, 2, 9)), _log(2, 12, datetime(2026, 3, 2, 10)), _log(3, 18, datetime(2026, 3, 2, 11))]
+        db.add_all(logs)
+        db.flush()
+        db.add_all([
+            database.LogRevision(log_id=logs[0].id, old_matter_id=1, new_matter_id=1),
+            database.LogRevision(log_id=logs[1].id, old_matter_id=1, new_matter_id=2),
+            # A pending revision whose revert would move the log back into matter 2
+            database.LogRevision(log_id=logs[2].id, old_matter_id=2, new_matter_id=3),
+        ])
+        db.add_all(database.TagJob(matter_id=i) for i in (1, 2, 3))
+        db.add_all(database.DisambiguationEntry(phrase_key=f"phrase {i}", matter_id=i, weight=1.0) for i in (1, 2, 3))
+        db.commit()
+
+        # DELETE /api/matters/{id}
+        revision_service.matter_deleted(db, 2)
+        db.query(database.TimeLog).filter(database.TimeLog.matter_id == 2).delete()
+        rollup_service.matter_deleted(db, 2)
+        db.query(database.DisambiguationEntry).filter(database.DisambiguationEntry.matter_id == 2).delete()
+        db.query(database.TagJob).filter(database.TagJob.matter_id == 2).delete()
+        db.delete(db.get(database.Matter, 2))
+        db.commit()
+        assert _dependent_rows(db) == {"revisions": [logs[0].id], "tag_jobs": [1, 3], "disambiguation": [1, 3]}
+
+        # /api/reset
+        db.query(database.LogRevision).delete()
+        db.query(database.TimeLog).delete()
+        rollup_service.reset(db)
+        db.query(database.DisambiguationEntry).delete()
+        db.query(database.TagJob).delete()
+        db.query(database.Matter).delete()
+        db.commit()
+        assert _dependent_rows(db) == {"revisions": [], "tag_jobs": [], "disambiguation": []}
+    finally:
+        db.close()
+
+
+def test_verify_finds_drift_and_ensure_rebuilds():
+    db = _session()
+    try:
+        db.add_all([_log(1, 60, datetime(2026, 3, 2, 9)), _log(2, 30, datetime(2026, 3, 5, 9))])
+        db.commit()
+        assert rollup_service.ensure(db) is False
+
+        # Logs written behind the ORM's back (an old release, a manual SQL fix)
+        db.execute(database.TimeLog.__table__.insert(), [
+            {"matter_id": 1, "duration_minutes": 6, "units": 1, "log_date": datetime(2026, 3, 2, 10), "log_day": 20260302},
+        ])
+        db.query(database.DailyTotal).filter(database.DailyTotal.matter_id == 2).update({database.DailyTotal.minutes: 999})
+        db.commit()
+        drift = rollup_service.verify(db)
+        assert [(d["matter_id"], d["log_day"]) for d in drift] == [(1, 20260302), (2, 20260305)]
+        assert drift[0]["expected"] == (66, 11, 2) and drift[0]["actual"] == (60, 10, 1)
+
+        assert rollup_service.ensure(db) is True  # the counts disagree: 3 logs, 2 in the rollup
+        db.commit()
+        assert rollup_service.verify(db) == []
+    finally:
+        db.close()
+
+
+def test_standalone_tool_creates_and_fills_the_rollup():
+    with tempfile.TemporaryDirectory() as directory:
+        path = _old_database(directory)
+        conn = sqlite3.connect(path)
+        try:
+            cursor = conn.cursor()
+            pending = [m for m in migrate_database.check_schema(cursor) if m["table"] in ("time_logs", "daily_totals")]
+            assert pending[-1]["id"] == "014"
+            assert migrate_database.apply_migrations(conn, cursor, pending)[1] == 0
+        finally:
+            conn.close()
+        engine = create_engine(f"sqlite:///{path}")
+        db = sessionmaker(bind=engine)()
+        try:
+            assert _totals(db) == {(1, 20260302): (90, 15, 2), (2, 20261231): (12, 2, 1)}
+            assert rollup_service.verify(db) == []
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def benchmark_rollup(matters=2000, logs=200_000, matters_per_day=20, writes=300, runs=5):
+    """
+    Write cost of keeping the rollup, and summary totals read from it, on a file database.
+    Logs cluster on matters_per_day matters a day, as a timesheet does.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = database.attach_profile(
+            create_engine(f"sqlite:///{os.path.join(directory, 'timesheet.db')}", connect_args={"check_same_thread": False})
+        )
+        database.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            _add_logs(db, matters, logs, days=3 * 365, matters_per_day=matters_per_day)
+            start = time.perf_counter()
+            rows = rollup_service.rebuild(db)
+            db.commit()
+            print(f"{logs} logs, {matters} matters: rebuild {time.perf_counter() - start:.2f} s, {rows} rollup rows")
+
+            start = time.perf_counter()
+            for i in range(writes):
+                db.add(_log(1 + i % matters, 30, NOW))
+                db.commit()
+            print(f"ORM insert + commit with rollup upkeep: {(time.perf_counter() - start) * 1000 / writes:.2f} ms")
+
+            def timed(fn):
+                start = time.perf_counter()
+                for _ in range(runs):
+                    fn()
+                return (time.perf_counter() - start) * 1000 / runs
+
+            summary_service.get_summary(db, NOW)
+            print(f"period totals: {timed(lambda: summary_service.period_totals(db, NOW)):.1f} ms")
+            print(f"matter totals: {timed(lambda: summary_service.matter_totals(db)):.1f} ms")
+            print(f"full summary:  {timed(lambda: summary_service.get_summary(db, NOW)):.1f} ms")
+            start = time.perf_counter()
+            drift = rollup_service.verify(db)
+            print(f"verify: {(time.perf_counter() - start) * 1000:.0f} ms, {len(drift)} drifted rows")
+        finally:
+            db.close()
+            engine.dispose()
+            catalog_service.invalidate()
+
+
+if __name__ == "__main__":
+    test_orm_writes_keep_the_rollup_in_step()
+    test_merge_and_bulk_deletes()
+    test_bulk_deletes_drop_dependent_rows()
+    test_verify_finds_drift_and_ensure_rebuilds()
+    test_standalone_tool_creates_and_fills_the_rollup()
+    print("SUCCESS: daily_totals follows every write to time_logs.")
+    benchmark_rollup()
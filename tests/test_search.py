@@ -0,0 +1,182 @@
+import math
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import catalog_service, classifier_service, database, search_service
+
+
+def _session(directory):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        database.Matter(id=1, name="Rayong Plant Lease", description="Industrial estate lease", client_name="ACME",
+                        ai_tags="tenancy, landlord, rent, deposit, real estate"),
+        database.Matter(id=2, name="Supply Agreement", description="Resin supply", client_name="Dow",
+                        ai_tags="procurement, purchase orders, pricing"),
+        database.Matter(id=3, name="Old Employment Dispute", description="Labour court case", is_closed=True,
+                        ai_tags="termination, severance, litigation"),
+    ])
+    db.commit()
+    catalog_service.invalidate()
+    search_service.reset()
+    previous = search_service.INDEX_DIR
+    search_service.INDEX_DIR = directory
+    return db, previous
+
+
+def _cleanup(db, previous):
+    db.close()
+    search_service.INDEX_DIR = previous
+    search_service.reset()
+    catalog_service.invalidate()
+
+
+def _ids(db, query, **kwargs):
+    return [m.id for m, _score in search_service.search(db, query, **kwargs)]
+
+
+def test_search_uses_tags_and_skips_closed_matters():
+    with tempfile.TemporaryDirectory() as directory:
+        db, previous = _session(directory)
+        try:
+            assert _ids(db, "tenancy deposit")[0] == 1
+            assert _ids(db, "purchase orders dow")[0] == 2
+            assert 3 not in _ids(db, "severance litigation")
+            assert _ids(db, "severance litigation", include_closed=True)[0] == 3
+            assert _ids(db, "zzzz") == []
+        finally:
+            _cleanup(db, previous)
+
+
+def test_new_tags_are_indexed_incrementally():
+    with tempfile.TemporaryDirectory() as directory:
+        db, previous = _session(directory)
+        try:
+            assert 2 not in _ids(db, "incoterms")
+            db.query(database.Matter).filter(database.Matter.id == 2).update({database.Matter.ai_tags: "incoterms, shipping"})
+            db.commit()
+            catalog_service.matter_saved(db, 2)
+            assert _ids(db, "incoterms") == [2]
+
+            db.query(database.Matter).filter(database.Matter.id == 2).delete()
+            db.commit()
+            catalog_service.matter_deleted(2)
+            assert _ids(db, "incoterms") == []
+        finally:
+            _cleanup(db, previous)
+
+
+def test_saved_index_is_memory_mapped_and_not_rebuilt():
+    with tempfile.TemporaryDirectory() as directory:
+        db, previous = _session(directory)
+        try:
+            _ids(db, "lease")  # first use builds and saves the index
+            index = search_service.MatterSearchIndex.load(directory)
+            assert isinstance(index.vectors, np.memmap)
+            assert index.sync(catalog_service.get_snapshot(db)) == 0
+            assert isinstance(index.vectors, np.memmap)
+
+            # A matter edited while the index was not loaded is re-embedded on its own
+            db.query(database.Matter).filter(database.Matter.id == 1).update({database.Matter.ai_tags: "warehouse"})
+            db.commit()
+            catalog_service.invalidate()
+            assert index.sync(catalog_service.get_snapshot(db)) == 1
+            assert index.search("warehouse")[0][0] == 1
+        finally:
+            _cleanup(db, previous)
+
+
+def _synthetic_records(count, seed=5):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    records = []
+    for i in range(1, count + 1):
+        row = (i, f"Matter {' '.join(rng.sample(vocabulary, 3))}", None, " ".join(rng.sample(vocabulary, 8)),
+               None, f"client{rng.randrange(2000)}", None, "yellow", False, None, datetime(2026, 1, 1),
+               ", ".join(rng.sample(vocabulary, 10)))
+        records.append(catalog_service.MatterRecord(row))
+    return records
+
+
+def test_rerank_scores_are_exact_cosines():
+    records = _synthetic_records(3000)
+    index = search_service.MatterSearchIndex()
+    index.sync(records)
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        loaded = search_service.MatterSearchIndex.load(directory)
+        loaded.sync(records)
+        by_id = {record.id: record for record in records}
+        for record in records[:20]:
+            query = " ".join(record.ai_tags.split(", ")[:2] + record.name.split()[1:2])
+            tokens = Counter(t for t in classifier_service.words(query) if loaded.df.get(t))
+            weights = {token: (1.0 + math.log(tf)) * loaded._idf(token) for token, tf in tokens.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            found = loaded.search(query, limit=10)
+            assert found[0][0] == record.id
+            for matter_id, score in found:
+                assert abs(score - loaded._exact_score(weights, norm, by_id[matter_id])) < 1e-6
+        del loaded
+
+
+def _exact_top(texts, index, query, limit):
+    """Exact cosine of every matter sharing a word with the query (the ranking the re-rank approximates)."""
+    tokens = Counter(t for t in classifier_service.words(query) if index.df.get(t))
+    weights = {token: (1.0 + math.log(tf)) * index._idf(token) for token, tf in tokens.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    scores = sorted((index._exact_score(weights, norm, record) for record, text in texts
+                     if any(token in text for token in weights)), reverse=True)
+    return scores[:limit]
+
+
+def benchmark_search(count=100_000, queries=200):
+    records = _synthetic_records(count)
+    index = search_service.MatterSearchIndex()
+    start = time.perf_counter()
+    index.sync(records)
+    build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        start = time.perf_counter()
+        loaded = search_service.MatterSearchIndex.load(directory)
+        loaded.sync(records)
+        reload = time.perf_counter() - start
+
+        rng = random.Random(1)
+        targets = rng.sample(records, queries)
+        texts = [" ".join(record.ai_tags.split(", ")[:2] + record.name.split()[1:2]) for record in targets]
+        for text in texts:
+            loaded.search(text, limit=10)  # first touch of the shortlisted rows
+        start = time.perf_counter()
+        results = [loaded.search(text, limit=10) for text in texts]
+        per_query = (time.perf_counter() - start) / queries
+
+        hits = sum(any(matter_id == record.id for matter_id, _score in found) for record, found in zip(targets, results))
+        # Recall against the exact ranking; a result tied with the exact 10th score counts as correct
+        record_texts = [(record, search_service._record_text(record)) for record in records]
+        recall = []
+        for text, found in zip(texts[:50], results):
+            exact = _exact_top(record_texts, loaded, text, 10)
+            recall.append(sum(score >= exact[-1] - 1e-6 for _id, score in found) / len(exact))
+        del loaded
+
+    print(f"{count} matters: build {build:.1f} s, load + verify {reload * 1000:.0f} ms")
+    print(f"query: {per_query * 1000:.2f} ms, target in top 10 for {hits / queries:.0%} of queries, "
+          f"recall@10 {sum(recall) / len(recall):.2f} against exact scoring")
+
+
+if __name__ == "__main__":
+    test_search_uses_tags_and_skips_closed_matters()
+    test_new_tags_are_indexed_incrementally()
+    test_saved_index_is_memory_mapped_and_not_rebuilt()
+    test_rerank_scores_are_exact_cosines()
+    print("SUCCESS: Matter search ranks by hashed TF-IDF vectors.")
+    benchmark_search()
@@ -0,0 +1,280 @@
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import catalog_service, database, rollup_service, summary_service
+
+NOW = datetime(2026, 3, 18, 15, 30)
+
+
+def _add_logs(db, matter_count, log_count, seed=7, days=120, matters_per_day=None):
+    """Random logs over the last `days` days; with matters_per_day, each day only touches that many matters."""
+    rng = random.Random(seed)
+    db.add_all(database.Matter(id=i, name=f"Matter {i}", description="", is_closed=(i % 7 == 0))
+               for i in range(1, matter_count + 1))
+    db.flush()
+    rows = []
+    for i in range(log_count):
+        day = rng.randrange(days)
+        log_date = NOW - timedelta(days=day, minutes=rng.randrange(600))
+        minutes = rng.choice([6, 12, 30, 60, 90])
+        if matters_per_day:
+            matter_id = (day * 37 + rng.randrange(matters_per_day)) % matter_count + 1
+        else:
+            matter_id = rng.randrange(1, matter_count + 1)
+        rows.append({
+            "matter_id": matter_id, "duration_minutes": minutes, "units": minutes // 6,
+            "description": f"work {i}", "log_date": log_date, "log_day": database.day_key(log_date),
+            "created_at": log_date + timedelta(minutes=rng.randrange(60)),
+        })
+    db.execute(database.TimeLog.__table__.insert(), rows)
+    rollup_service.rebuild(db)  # Core inserts bypass the ORM hooks that keep daily_totals in step
+    db.commit()
+    catalog_service.invalidate()
+
+
+def _reference_summary(db, now):
+    """The summary as computed before, from every TimeLog object in Python."""
+    logs = db.query(database.TimeLog).join(database.Matter).all()
+    reports = {}
+    for period, (start, end) in summary_service.period_bounds(now).items():
+        selected = [l for l in logs if l.log_date >= start and (end is None or l.log_date <= end)]
+        reports[period] = {"minutes": sum(l.duration_minutes for l in selected), "units": sum(l.units for l in selected)}
+    by_matter = {}
+    for m in db.query(database.Matter):
+        matter_logs = [l for l in logs if l.matter_id == m.id]
+        by_matter[m.id] = {
+            "total_minutes": sum(l.duration_minutes for l in matter_logs),
+            "total_units": sum(l.units for l in matter_logs),
+            "last_logged_at": max(l.created_at for l in matter_logs).strftime("%Y-%m-%d %H:%M:%S") if matter_logs else None,
+            "records": [l.id for l in sorted(matter_logs, key=lambda x: (x.log_date, x.id), reverse=True)],
+        }
+    return reports, by_matter, sum(l.units for l in logs)
+
+
+def test_summary_matches_per_log_computation():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        _add_logs(db, 12, 600, days=70)
+        db.add(database.Matter(id=99, name="No logs yet", description=""))
+        db.commit()
+        catalog_service.invalidate()
+
+        summary = _assert_matches_reference(db)
+        assert summary["reports"]["last_month"]["units"] > 0
+        assert len(summary["by_matter"]) == 13
+        assert summary["by_matter"][-1]["id"] == 99 and summary["by_matter"][-1]["records"] == []
+    finally:
+        db.close()
+        catalog_service.invalidate()
+
+
+def _assert_matches_reference(db):
+    summary = summary_service.get_summary(db, NOW)
+    reports, by_matter, grand_total = _reference_summary(db, NOW)
+    assert summary["reports"] == reports
+    assert summary["grand_total_units"] == grand_total
+    for matter in summary["by_matter"]:
+        expected = by_matter[matter["id"]]
+        assert matter["total_minutes"] == expected["total_minutes"]
+        assert matter["total_units"] == expected["total_units"]
+        assert matter["last_logged_at"] == expected["last_logged_at"]
+        assert matter["record_count"] == len(expected["records"])
+        assert [r["id"] for r in matter["records"]] == expected["records"][:summary_service.SUMMARY_PREVIEW_RECORDS]
+        assert (matter["next_cursor"] is not None) == (len(expected["records"]) > summary_service.SUMMARY_PREVIEW_RECORDS)
+    last_logged = [m["last_logged_at"] for m in summary["by_matter"] if m["last_logged_at"]]
+    assert last_logged == sorted(last_logged, reverse=True)
+    return summary
+
+
+def test_kept_totals_follow_log_writes():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        _add_logs(db, 6, 200, days=30)
+        _assert_matches_reference(db)
+
+        # New log through the relationship, an edit, a move to another matter and a delete
+        db.add(database.TimeLog(matter=db.get(database.Matter, 1), duration_minutes=30, units=5,
+                                description="newest", log_date=NOW))
+        db.commit()
+        _assert_matches_reference(db)
+        newest = db.query(database.TimeLog).filter_by(matter_id=2).order_by(database.TimeLog.log_date.desc()).first()
+        newest.description = "edited"
+        db.commit()
+        assert next(m for m in _assert_matches_reference(db)["by_matter"] if m["id"] == 2)["records"][0]["description"] == "edited"
+        newest.matter_id = 3
+        db.commit()
+        _assert_matches_reference(db)
+        db.delete(db.query(database.TimeLog).filter_by(matter_id=4).first())
+        db.commit()
+        _assert_matches_reference(db)
+
+        # A rolled back write changes nothing; bulk deletes go through the rollup_service calls
+        db.query(database.TimeLog).filter_by(matter_id=5).first().duration_minutes = 600
+        db.flush()
+        db.rollback()
+        _assert_matches_reference(db)
+        db.query(database.TimeLog).filter(database.TimeLog.matter_id == 5).delete()
+        rollup_service.matter_deleted(db, 5)
+        db.commit()
+        assert next(m for m in _assert_matches_reference(db)["by_matter"] if m["id"] == 5)["records"] == []
+        db.query(database.TimeLog).delete()
+        rollup_service.reset(db)
+        db.commit()
+        assert _assert_matches_reference(db)["grand_total_units"] == 0
+    finally:
+        db.close()
+        catalog_service.invalidate()
+
+
+def test_summary_meets_target():
+    """/api/summary under 50 ms with 200k logs, also right after a log was written."""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = database.attach_profile(
+            create_engine(f"sqlite:///{os.path.join(directory, 'timesheet.db')}", connect_args={"check_same_thread": False})
+        )
+        database.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            _add_logs(db, 2000, 200_000, days=3 * 365, matters_per_day=20)
+            summary_service.get_summary(db, NOW)
+
+            timings = []
+            for i in range(9):
+                if i % 3 == 0:
+                    db.add(database.TimeLog(matter_id=i + 1, duration_minutes=6, units=1, description="new", log_date=NOW))
+                    db.commit()
+                start = time.perf_counter()
+                summary = summary_service.get_summary(db, NOW)
+                timings.append((time.perf_counter() - start) * 1000)
+            assert next(m for m in summary["by_matter"] if m["id"] == 7)["records"][0]["description"] == "new"
+            assert sorted(timings)[len(timings) // 2] < 50, timings
+        finally:
+            db.close()
+            engine.dispose()
+            catalog_service.invalidate()
+
+
+def test_records_pages_continue_the_preview():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        _add_logs(db, 3, 300, days=30)
+        # Same log_date for several logs: the id breaks the tie, so no log is skipped or repeated
+        same_time = NOW - timedelta(days=40)
+        db.add_all(database.TimeLog(matter_id=1, duration_minutes=6, units=1, description="tie", log_date=same_time)
+                   for _ in range(7))
+        # Rows written by old releases store log_date without microseconds
+        for _ in range(4):
+            db.execute(text("INSERT INTO time_logs (matter_id, duration_minutes, units, description, log_date, created_at) "
+                            "VALUES (1, 6, 1, 'legacy', '2025-12-01 10:00:00', '2025-12-01 10:00:00')"))
+        db.commit()
+        expected = _reference_summary(db, NOW)[1][1]["records"]
+
+        matter = next(m for m in summary_service.get_summary(db, NOW)["by_matter"] if m["id"] == 1)
+        seen = [r["id"] for r in matter["records"]]
+        cursor = matter["next_cursor"]
+        while cursor:
+            page = summary_service.matter_records_page(db, 1, limit=7, cursor=cursor)
+            assert len(page["records"]) <= 7
+            seen += [r["id"] for r in page["records"]]
+            cursor = page["next_cursor"]
+        assert seen == expected
+
+        # Date range: start inclusive, end exclusive
+        page = summary_service.matter_records_page(db, 1, limit=200, start=same_time.replace(hour=0, minute=0),
+                                                   end=same_time.replace(hour=0, minute=0) + timedelta(days=1))
+        assert [r["description"] for r in page["records"]] == ["tie"] * 7 and page["next_cursor"] is None
+    finally:
+        db.close()
+        catalog_service.invalidate()
+
+
+def test_totals_read_the_rollup_not_the_logs():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        _add_logs(db, 5, 50)
+        compiled = _compile(db, summary_service._matter_totals_query())
+        plan = " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + compiled)))
+        # Sums from daily_totals; only the latest created_at is looked up in time_logs, by index seek
+        assert "daily_totals" in plan and "SCAN time_logs" not in plan
+        assert "SEARCH time_logs USING COVERING INDEX ix_time_logs_matter_id_created_at" in plan
+        compiled = _compile(db, summary_service._period_totals_query(summary_service.period_bounds(NOW)))
+        plan = " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + compiled)))
+        assert "SEARCH daily_totals" in plan and "time_logs" not in plan
+
+        # A keyset page is a range seek on (matter_id, log_date), already in order
+        query = summary_service._records_page_query(1, 20, f"{NOW}|10", None, None)
+        plan = " | ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + _compile(db, query))))
+        assert "SEARCH time_logs USING INDEX ix_time_logs_matter_id_log_date" in plan and "TEMP B-TREE" not in plan
+    finally:
+        db.close()
+        catalog_service.invalidate()
+
+
+def _compile(db, query):
+    return str(query.compile(bind=db.get_bind(), compile_kwargs={"literal_binds": True}))
+
+
+def benchmark_summary(matters=2000, logs=200_000, runs=5):
+    """Aggregate queries and the full summary on a file database with the tuned engine profile."""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = database.attach_profile(
+            create_engine(f"sqlite:///{os.path.join(directory, 'timesheet.db')}", connect_args={"check_same_thread": False})
+        )
+        database.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            _add_logs(db, matters, logs, days=3 * 365)
+            summary_service.get_summary(db, NOW)  # warm the page cache and the catalog snapshot
+
+            def timed(fn):
+                start = time.perf_counter()
+                for _ in range(runs):
+                    fn()
+                return (time.perf_counter() - start) * 1000 / runs
+
+            print(f"{logs} logs, {matters} matters")
+            print(f"period totals: {timed(lambda: summary_service.period_totals(db, NOW)):.1f} ms")
+            print(f"matter totals: {timed(lambda: summary_service.matter_totals(db)):.1f} ms")
+            print(f"previews:      {timed(lambda: summary_service.matter_previews(db)):.1f} ms")
+            print(f"full summary:  {timed(lambda: summary_service.get_summary(db, NOW)):.1f} ms (kept totals and previews)")
+            deep = summary_service.matter_records_page(db, 1, limit=80)["next_cursor"]
+            print(f"records page:  {timed(lambda: summary_service.matter_records_page(db, 1, 50, deep)):.2f} ms (after 80 records)")
+            print(f"old summary:   {timed(lambda: _reference_summary_fast(db, NOW)):.1f} ms (ORM load + Python grouping)")
+        finally:
+            db.close()
+            engine.dispose()
+            catalog_service.invalidate()
+
+
+def _reference_summary_fast(db, now):
+    # The previous implementation's work without its O(matters x logs) filter, for a fair baseline
+    logs = db.query(database.TimeLog).join(database.Matter).all()
+    by_matter = {}
+    for l in logs:
+        by_matter.setdefault(l.matter_id, []).append(l)
+    for period, (start, end) in summary_service.period_bounds(now).items():
+        sum(l.units for l in logs if l.log_date >= start and (end is None or l.log_date <= end))
+    return {m: sorted(items, key=lambda x: x.log_date, reverse=True) for m, items in by_matter.items()}
+
+
+if __name__ == "__main__":
+    test_summary_matches_per_log_computation()
+    test_kept_totals_follow_log_writes()
+    test_records_pages_continue_the_preview()
+    test_totals_read_the_rollup_not_the_logs()
+    test_summary_meets_target()
+    print("SUCCESS: /api/summary is computed with SQL aggregates.")
+    benchmark_summary()
@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend import ai_service, catalog_service, database, tag_queue_service
+
+SETTINGS = ("tagger", "key")
+RATE = tag_queue_service.TAG_CALLS_PER_MINUTE
+
+
+def _use_database(matter_count, path=None):
+    """
+    A scratch database for the queue. Threaded tests pass a file path: the
+    in-memory StaticPool engine hands one shared connection to every thread.
+    """
+    if path:
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    previous = tag_queue_service._session_factory
+    tag_queue_service._session_factory = sessionmaker(bind=engine)
+    tag_queue_service._next_call_at = 0.0
+    tag_queue_service.TAG_CALLS_PER_MINUTE = 60000
+    catalog_service.invalidate()
+
+    db = tag_queue_service._session_factory()
+    db.add_all([database.Matter(id=i, name=f"Matter {i}", description=f"Description {i}") for i in range(1, matter_count + 1)])
+    db.commit()
+    return previous, db
+
+
+def _restore(previous, db):
+    db.close()
+    tag_queue_service._session_factory.kw["bind"].dispose()
+    tag_queue_service._session_factory = previous
+    tag_queue_service.TAG_CALLS_PER_MINUTE = RATE
+    catalog_service.invalidate()
+    ai_service._PROVIDER_CALLS.pop(SETTINGS[0], None)
+    ai_service._UNCACHED_PROVIDERS.discard(SETTINGS[0])
+
+
+def _fake_provider(fail=False):
+    """Answers every tags prompt for all the matters in it; records the batch sizes."""
+    batches = []
+
+    def call(prompt, api_key, max_tokens=ai_service.ANSWER_MAX_TOKENS):
+        batches.append(prompt.count("Matter ID: "))
+        if fail:
+            raise RuntimeError("rate limited")
+        ids = re.findall(r'^Matter ID: (\d+)$', prompt, re.MULTILINE)
+        return json.dumps({matter_id: f"tag {matter_id}" for matter_id in ids})
+
+    ai_service._PROVIDER_CALLS[SETTINGS[0]] = call
+    ai_service._UNCACHED_PROVIDERS.add(SETTINGS[0])
+    return batches
+
+
+def _tags(db):
+    db.expire_all()
+    return [m.ai_tags for m in db.query(database.Matter).order_by(database.Matter.id)]
+
+
+def test_matters_are_tagged_in_batches():
+    previous, db = _use_database(23)
+    tag_queue_service.TAG_CALLS_PER_MINUTE = 600  # 0.1 s between calls
+    try:
+        batches = _fake_provider()
+        tag_queue_service.enqueue(db, range(1, 24))
+        tag_queue_service.enqueue(db, [5])  # already queued: no duplicate
+        assert tag_queue_service.status()["pending"] == 23
+
+        start = time.monotonic()
+        while tag_queue_service.process_batch(SETTINGS):
+            pass
+        assert batches == [10, 10, 3]
+        assert time.monotonic() - start >= 0.2  # spaced by the rate limit
+        assert _tags(db) == [f"tag {i}" for i in range(1, 24)]
+        assert tag_queue_service.status()["pending"] == 0
+    finally:
+        _restore(previous, db)
+
+
+def test_failed_batches_back_off_and_give_up():
+    previous, db = _use_database(2)
+    try:
+        batches = _fake_provider(fail=True)
+        tag_queue_service.enqueue(db, [1, 2])
+        assert tag_queue_service.process_batch(SETTINGS) == 2
+        status = tag_queue_service.status()
+        assert status["retrying"] == 2 and status["due"] == 0
+        assert tag_queue_service.process_batch(SETTINGS) == 0  # backing off
+
+        for attempt in range(2, tag_queue_service.TAG_MAX_ATTEMPTS + 1):
+            job = db.query(database.TagJob).first()
+            delay = (job.next_attempt_at - datetime.now()).total_seconds()
+            assert delay > tag_queue_service.TAG_BACKOFF_SECONDS * 2 ** (attempt - 2) - 5
+            db.query(database.TagJob).update({database.TagJob.next_attempt_at: datetime.now() - timedelta(seconds=1)})
+            db.commit()
+            tag_queue_service.process_batch(SETTINGS)
+        assert len(batches) == tag_queue_service.TAG_MAX_ATTEMPTS
+        assert tag_queue_service.status()["pending"] == 0 and _tags(db) == [None, None]
+    finally:
+        _restore(previous, db)
+
+
+def test_workers_resume_persisted_jobs():
+    directory = tempfile.TemporaryDirectory()
+    previous, db = _use_database(3, os.path.join(directory.name, "timesheet.db"))
+    configured = ai_service.configured_settings
+    ai_service.configured_settings = lambda: SETTINGS
+    try:
+        _fake_provider()
+        # Left in tag_jobs by a previous run that stopped before tagging them
+        db.add_all([database.TagJob(matter_id=i) for i in (1, 2, 3)])
+        db.commit()
+        tag_queue_service.start()
+        deadline = time.monotonic() + 5
+        while tag_queue_service.status()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _tags(db) == ["tag 1", "tag 2", "tag 3"]
+    finally:
+        tag_queue_service.stop()
+        ai_service.configured_settings = configured
+        _restore(previous, db)
+        directory.cleanup()
+
+
+if __name__ == "__main__":
+    test_matters_are_tagged_in_batches()
+    test_failed_batches_back_off_and_give_up()
+    test_workers_resume_persisted_jobs()
+    print("SUCCESS: Matter tags are generated by a batched, rate-limited queue.")